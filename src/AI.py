@@ -1,7 +1,711 @@
+import atexit
+import multiprocessing
+import os
 import random
+import threading
+import time
+import Bitbases
+import ChessEngine
+import Evaluation
+import OpeningBook
+import TranspositionTable
+from TranspositionTable import EXACT, LOWER_BOUND, UPPER_BOUND
+
+HASH_SIZE_MB = 16 # memory budget of the transposition table
+SEARCH_WORKERS = 1 # processes findBestMove searches with; 1 searches in this process only (deterministic)
+# Polyglot opening book, played from while the position is in it (None or a missing file: no book)
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books", "book.bin")
+
+pieceScore = {'K': 0, 'Q': 900, 'R': 500, 'B': 330, 'N': 320, 'P': 100}
+CHECKMATE = 100000
+MATE_THRESHOLD = CHECKMATE - 1000 # scores beyond this are forced mates
+DRAW = 0
+INFINITY = CHECKMATE + 1
+MAX_DEPTH = 64
+ASPIRATION_WINDOW = 50 # half width of the window around the previous iteration's score
+CHECK_INTERVAL = 255 # the clock is read every 256 nodes
+KILLER_SLOTS = 2 # quiet moves per ply remembered for causing a beta cutoff
+MAX_QUIESCENCE_PLY = 12 # explosion guard: deeper quiescence nodes return their static evaluation
+DELTA_MARGIN = 200 # a capture that cannot lift the static evaluation to within this of alpha is not searched
+SEE_VALUE = dict(pieceScore, K=CHECKMATE // 10) # a king can only recapture on an undefended square
+
+transpositionTable = None
+openingBook = None
+
+# helper processes of the parallel search (see ParallelSearch)
+workerPool = None
+workerCount = 0
+stopEvent = None # set by the main search when it is done, helpers poll it
+nodeCounts = None # nodes searched so far by each helper, in shared memory
+
+'''
+returns the transposition table shared by all searches, it is only allocated once it is needed.
+shared=True moves it into shared memory so helper processes can use it too
+'''
+def getTranspositionTable(shared=False):
+    global transpositionTable
+    if transpositionTable is None or (shared and not transpositionTable.shared):
+        if transpositionTable is not None:
+            transpositionTable.close()
+        transpositionTable = TranspositionTable.TranspositionTable(HASH_SIZE_MB, shared=shared)
+    return transpositionTable
+
+'''
+changes the memory budget of the transposition table (clears it)
+'''
+def setHashSize(sizeMB):
+    global HASH_SIZE_MB
+    HASH_SIZE_MB = sizeMB
+    shutdownWorkers() # helpers are attached to the old table
+    getTranspositionTable().resize(sizeMB)
+
+'''
+returns the pool of workers - 1 helper processes, (re)started when the worker count changes
+'''
+def getWorkerPool(workers):
+    global workerPool, workerCount, stopEvent, nodeCounts
+    if workerPool is None or workerCount != workers:
+        shutdownWorkers()
+        tt = getTranspositionTable(shared=True)
+        context = multiprocessing.get_context("spawn")
+        stopEvent = context.Event()
+        nodeCounts = context.Array('q', workers, lock=False)
+        workerPool = context.Pool(workers - 1, initializer=initHelper,
+                                  initargs=(tt.name, tt.sizeMB, stopEvent, nodeCounts))
+        workerCount = workers
+    return workerPool
+
+def shutdownWorkers():
+    global workerPool, workerCount
+    if workerPool is not None:
+        workerPool.terminate()
+        workerPool.join()
+        workerPool = None
+        workerCount = 0
+
+'''
+returns the opening book of BOOK_FILE, opened once it is needed; None if there is no book
+'''
+def getOpeningBook():
+    global openingBook
+    if openingBook is None and BOOK_FILE is not None and os.path.exists(BOOK_FILE):
+        openingBook = OpeningBook.OpeningBook(BOOK_FILE)
+    return openingBook
+
+'''
+switches to another opening book file, None plays without a book
+'''
+def setOpeningBook(path):
+    global BOOK_FILE, openingBook
+    if openingBook is not None:
+        openingBook.close()
+        openingBook = None
+    BOOK_FILE = path
+
+'''
+a weighted random book move out of validMoves, or None once the game has left the book
+'''
+def findBookMove(gs, validMoves):
+    book = getOpeningBook()
+    return book.chooseMove(gs, validMoves) if book is not None else None
+
+'''
+stops the helper processes and frees the shared transposition table
+'''
+def shutdown():
+    shutdownWorkers()
+    if transpositionTable is not None:
+        transpositionTable.close()
+    if openingBook is not None:
+        openingBook.close()
+
+atexit.register(shutdown)
+
+'''
+runs once in every helper process: attach to the main process' transposition table
+'''
+def initHelper(tableName, sizeMB, event, counts):
+    global transpositionTable, stopEvent, nodeCounts
+    transpositionTable = TranspositionTable.TranspositionTable.attach(tableName, sizeMB)
+    stopEvent = event
+    nodeCounts = counts
+
+'''
+what a search needs to know about a game state: engine, position bytes (ChessEngine.encodePosition) and the keys
+of the positions played before
+'''
+def positionOf(gs):
+    return (gs.engineName, gs.toBytes(), list(gs.keyHistory))
+
+'''
+builds a new game state from positionOf(gs), without the move log
+'''
+def restorePosition(position):
+    engine, data, keyHistory = position
+    gs = ChessEngine.gameStateClass(engine).fromBytes(data)
+    # repetitions before the current position still count
+    gs.keyHistory = list(keyHistory)
+    gs.keyCounts = {}
+    for key in keyHistory:
+        gs.keyCounts[key] = gs.keyCounts.get(key, 0) + 1
+    return gs
+
+'''
+search of one helper process, returns the number of nodes it searched
+'''
+def helperSearch(position, maxDepth, maxTime, maxNodes, age, index):
+    gs = restorePosition(position)
+    transpositionTable.age = age
+    search = HelperSearch(gs, maxDepth, maxTime, maxNodes, transpositionTable, info=lambda info: None)
+    search.index = index
+    # half of the helpers skip the first iteration, so helpers are spread over two depths at a time
+    search.startDepth = 1 + index % 2
+    search.run(gs.getValidMoves(), newSearch=False)
+    nodeCounts[index] = search.nodes
+    return search.nodes
 
 def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves)-1)]
 
-def findBestMove(gs, validMoves, depth):
-    return 
\ No newline at end of file
+'''
+finds the best move with an iterative deepening alpha-beta search, limited by depth, by maxTime (seconds) and/or
+by maxNodes. info is called with a dict after every completed iteration (default: print it).
+workers > 1 runs a parallel search in that many processes (default SEARCH_WORKERS).
+While the position is in the opening book, a book move is played without searching
+'''
+def findBestMove(gs, validMoves, depth, maxTime=None, maxNodes=None, info=None, workers=None):
+    bookMove = findBookMove(gs, validMoves)
+    if bookMove is not None:
+        return bookMove
+    if workers is None:
+        workers = SEARCH_WORKERS
+    if workers > 1:
+        return ParallelSearch(gs, depth, maxTime, maxNodes, workers, info).run(validMoves)
+    return Search(gs, depth, maxTime, maxNodes, info=info).run(validMoves)
+
+'''
+score of the position from the endgame bitbases (side to move's view), None if they do not cover it. A win is the
+mate score of its distance to mate counted from the root (ply: the node's distance from the root), so the mate
+cutoff, the transposition table and the UCI output treat it like a mate the search found
+'''
+def bitbaseScore(gs, ply):
+    known = Bitbases.probe(gs)
+    if known is None:
+        return None
+    result, distance = known
+    if result == Bitbases.DRAW:
+        return DRAW
+    return (CHECKMATE - ply - distance) if result == Bitbases.WIN else -(CHECKMATE - ply - distance)
+
+'''
+mate scores are stored relative to the node instead of the root, so they stay correct when the position is
+reached again at a different ply
+'''
+def scoreToTT(score, ply):
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def scoreFromTT(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+'''
+sort key of captures and promotions: most valuable victim first, least valuable attacker among equal victims
+'''
+def mvvLva(move):
+    victim = pieceScore[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0
+    if move.isPawnPromotion:
+        victim += pieceScore[move.promotionChoice]
+    return -victim * 10 + pieceScore[move.pieceMoved[1]] // 100
+
+'''
+static exchange evaluation of a capture or promotion: the material (SEE_VALUE) the moving side ends up with when
+both sides keep recapturing on the target square with their least valuable attacker, each free to stop when that
+is better for it. Pins are ignored
+'''
+def see(gs, move):
+    board = gs.board
+    row, col = move.endRow, move.endCol
+    removed = {(move.startRow, move.startCol)}
+    if move.isEnPassantMove:
+        removed.add((move.startRow, move.endCol))
+    gain = [SEE_VALUE[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0]
+    attackerValue = SEE_VALUE[move.pieceMoved[1]]
+    if move.isPawnPromotion:
+        gain[0] += SEE_VALUE[move.promotionChoice] - SEE_VALUE['P']
+        attackerValue = SEE_VALUE[move.promotionChoice]
+    color = 'b' if move.pieceMoved[0] == 'w' else 'w'
+    while True:
+        attacker = gs.getSmallestAttacker(row, col, color, removed)
+        if attacker is None:
+            break
+        # gain of the side recapturing if the exchange stopped after its capture
+        gain.append(attackerValue - gain[-1])
+        attackerValue = SEE_VALUE[board[attacker[0]][attacker[1]][1]]
+        removed.add(attacker)
+        color = 'b' if color == 'w' else 'w'
+    # going back, every side either recaptures or stops, whichever is better for it
+    for d in range(len(gain) - 1, 0, -1):
+        gain[d - 1] = -max(-gain[d - 1], gain[d])
+    return gain[0]
+
+def printInfo(info):
+    print("depth %d score %d nodes %d nps %d time %.2fs pv %s" %
+          (info["depth"], info["score"], info["nodes"], info["nps"], info["time"], " ".join(info["pv"])))
+
+'''
+One search of one position. The limits are checked every CHECK_INTERVAL + 1 nodes; once one is hit the search
+unwinds without storing anything and run() returns the best move of the last completed iteration.
+stop() can be called from another thread.
+'''
+class Search():
+
+    def __init__(self, gs, maxDepth=MAX_DEPTH, maxTime=None, maxNodes=None, tt=None, info=None):
+        self.gs = gs
+        self.maxDepth = maxDepth if maxDepth else MAX_DEPTH
+        self.maxTime = maxTime
+        self.maxNodes = maxNodes
+        self.tt = tt if tt is not None else getTranspositionTable()
+        self.info = info if info is not None else printInfo
+        self.nodes = 0
+        self.qnodes = 0 # the part of nodes searched by quiescence
+        self.startDepth = 1
+        self.stopped = False
+        self.deadline = None
+        self.startTime = 0.0
+        self.bestMove = None
+        self.bestScore = 0
+        self.completedDepth = 0
+        self.pv = []
+        self.rootMoves = None # the root only searches these moves (UCI searchmoves), None: all of them
+        # move ordering: killers[ply] holds the moveIDs of quiet moves that caused a cutoff at that ply,
+        # history[color][moveID] grows with every cutoff a quiet move causes anywhere in the tree
+        self.killers = [[0] * KILLER_SLOTS for _ in range(MAX_DEPTH + 1)]
+        self.history = {'w': {}, 'b': {}}
+        # statistics: nodes whose moves were searched, how many of them failed high, how many on their first move
+        self.searchedNodes = 0
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.depthNodes = [] # depthNodes[d - 1]: nodes searched when iteration d was completed
+
+    def stop(self):
+        self.stopped = True
+
+    def checkLimits(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        if self.maxNodes is not None and self.nodes >= self.maxNodes:
+            self.stopped = True
+
+    def run(self, validMoves, newSearch=True):
+        gs = self.gs
+        if not validMoves:
+            return None
+        checkmate, stalemate = gs.checkmate, gs.stalemate
+        self.startTime = time.perf_counter()
+        if self.maxTime is not None:
+            self.deadline = self.startTime + self.maxTime
+        if newSearch:
+            self.tt.newSearch()
+        self.bestMove = validMoves[0]
+        rootKnown = bitbaseScore(gs, 0)
+        score = 0
+        for depth in range(self.startDepth, self.maxDepth + 1):
+            if depth >= 3:
+                alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+            else:
+                alpha, beta = -INFINITY, INFINITY
+            while True:
+                pv = []
+                result = self.negamax(depth, alpha, beta, 0, pv)
+                if self.stopped:
+                    break
+                if result <= alpha or result >= beta: # outside the aspiration window, search again with a full one
+                    alpha, beta = -INFINITY, INFINITY
+                    continue
+                break
+            if self.stopped:
+                break
+            score = result
+            self.completedDepth = depth
+            self.depthNodes.append(self.nodes)
+            self.bestScore = score
+            self.pv = pv
+            if pv:
+                for move in validMoves:
+                    if move == pv[0]:
+                        self.bestMove = move
+                        break
+            self.report()
+            if abs(score) > MATE_THRESHOLD and (CHECKMATE - abs(score) <= depth or score == rootKnown):
+                break # forced mate found within the full width part of the tree, or the bitbases' exact one
+        gs.checkmate, gs.stalemate = checkmate, stalemate
+        return self.bestMove
+
+    def totalNodes(self):
+        return self.nodes
+
+    '''
+    share of searched nodes that failed high
+    '''
+    def cutoffRate(self):
+        return self.cutoffs / self.searchedNodes if self.searchedNodes else 0.0
+
+    '''
+    share of the fail highs caused by the first move searched, a measure of the move ordering
+    '''
+    def firstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    '''
+    effective branching factor of the last completed iteration: nodes it took over nodes the one before took
+    '''
+    def branchingFactor(self):
+        if len(self.depthNodes) < 2:
+            return 0.0
+        previous = self.depthNodes[-2] - (self.depthNodes[-3] if len(self.depthNodes) > 2 else 0)
+        last = self.depthNodes[-1] - self.depthNodes[-2]
+        return last / previous if previous else 0.0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.startTime
+        nodes = self.totalNodes()
+        self.info({"depth": self.completedDepth, "score": self.bestScore, "nodes": nodes,
+                   "nps": int(nodes / elapsed) if elapsed > 0 else 0, "time": elapsed,
+                   "pv": [move.getChessNotation() for move in self.pv], "pvMoves": list(self.pv),
+                   "qnodes": self.qnodes, "cutoffRate": self.cutoffRate(),
+                   "firstMoveCutoffRate": self.firstMoveCutoffRate(), "branchingFactor": self.branchingFactor()})
+
+    '''
+    negamax alpha-beta, returns the score from the point of view of the side to move and fills pv
+    '''
+    def negamax(self, depth, alpha, beta, ply, pv):
+        gs = self.gs
+        self.nodes += 1
+        if self.nodes & CHECK_INTERVAL == 0:
+            self.checkLimits()
+        if self.stopped:
+            return 0
+
+        key = gs.zobristKey
+        if ply > 0:
+            if gs.keyCounts[key] > 1 or gs.fiftyMoveRule:
+                return DRAW # a repetition inside the tree is scored as a draw right away
+            known = bitbaseScore(gs, ply)
+            if known is not None:
+                return known
+
+        hashMove = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            entryDepth, entryScore, bound, hashMove = entry
+            if ply > 0 and entryDepth >= depth:
+                entryScore = scoreFromTT(entryScore, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and entryScore >= beta) or \
+                        (bound == UPPER_BOUND and entryScore <= alpha):
+                    return entryScore
+
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply, 0)
+
+        moves = gs.getValidMoves()
+        if not moves:
+            return -CHECKMATE + ply if gs.inCheck else DRAW
+        if ply == 0 and self.rootMoves is not None:
+            moves = [move for move in moves if move in self.rootMoves]
+
+        self.searchedNodes += 1
+        alphaOrig = alpha
+        bestScore = -INFINITY
+        bestMove = None
+        for i, move in enumerate(self.pickMoves(moves, hashMove, ply)):
+            gs.makeMove(move)
+            childPv = []
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1, childPv)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score > bestScore:
+                bestScore = score
+                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + childPv
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if i == 0:
+                            self.firstMoveCutoffs += 1
+                        if move.pieceCaptured == "--" and not move.isPawnPromotion:
+                            self.storeQuietCutoff(move, depth, ply)
+                        break
+
+        if bestScore <= alphaOrig:
+            bound = UPPER_BOUND
+        elif bestScore >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, scoreToTT(bestScore, ply), bound, bestMove.moveID)
+        return bestScore
+
+    '''
+    extends a leaf with captures and promotions until the position is quiet, so the search does not stop in the
+    middle of an exchange. The side to move may stand pat on the static evaluation; captures that lose material
+    by static exchange evaluation, or that cannot bring the score near alpha (delta pruning), are skipped.
+    In check every evasion is searched
+    '''
+    def quiescence(self, alpha, beta, ply, qply):
+        gs = self.gs
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes & CHECK_INTERVAL == 0:
+            self.checkLimits()
+        if self.stopped:
+            return 0
+
+        known = bitbaseScore(gs, ply)
+        if known is not None:
+            return known
+        standPat = Evaluation.evaluate(gs)
+        if qply >= MAX_QUIESCENCE_PLY:
+            return standPat
+
+        moves = gs.getValidMoves()
+        if not moves:
+            return -CHECKMATE + ply if gs.inCheck else DRAW
+        inCheck = gs.inCheck
+        if not inCheck:
+            if standPat >= beta:
+                return standPat
+            if standPat > alpha:
+                alpha = standPat
+            moves = [move for move in moves if move.pieceCaptured != "--" or move.isPawnPromotion]
+        moves.sort(key=mvvLva)
+
+        bestScore = -INFINITY if inCheck else standPat
+        for move in moves:
+            if not inCheck:
+                if not move.isPawnPromotion and \
+                        standPat + SEE_VALUE[move.pieceCaptured[1]] + DELTA_MARGIN <= alpha:
+                    continue
+                if see(gs, move) < 0:
+                    continue
+            gs.makeMove(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1, qply + 1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score > bestScore:
+                bestScore = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return bestScore
+
+    '''
+    yields the moves in stages: the hash move, captures and promotions (most valuable victim, then least valuable
+    attacker first), the killer moves of this ply, then the other quiet moves by history score. Each stage is only
+    sorted once the ones before it failed to cut off, so most nodes never sort their quiet moves
+    '''
+    def pickMoves(self, moves, hashMove, ply):
+        captures = []
+        quiets = []
+        for move in moves:
+            if move.moveID == hashMove:
+                yield move
+            elif move.pieceCaptured != "--" or move.isPawnPromotion:
+                captures.append(move)
+            else:
+                quiets.append(move)
+
+        if captures:
+            captures.sort(key=mvvLva)
+            yield from captures
+
+        if not quiets:
+            return
+        killers = self.killers[ply] if ply <= MAX_DEPTH else ()
+        for killer in killers:
+            for move in quiets:
+                if move.moveID == killer:
+                    yield move
+                    break
+        history = self.history[quiets[0].pieceMoved[0]]
+        quiets = [move for move in quiets if move.moveID not in killers]
+        quiets.sort(key=lambda move: history.get(move.moveID, 0), reverse=True)
+        yield from quiets
+
+    '''
+    remembers a quiet move that caused a beta cutoff as a killer of its ply and in the history table
+    '''
+    def storeQuietCutoff(self, move, depth, ply):
+        if ply <= MAX_DEPTH:
+            killers = self.killers[ply]
+            if killers[0] != move.moveID:
+                killers[1:] = killers[:-1]
+                killers[0] = move.moveID
+        history = self.history[move.pieceMoved[0]]
+        history[move.moveID] = history.get(move.moveID, 0) + depth * depth
+
+
+'''
+Search of a helper process: also stops when the main search is done, and publishes its node count
+'''
+class HelperSearch(Search):
+
+    index = 0
+
+    def checkLimits(self):
+        Search.checkLimits(self)
+        nodeCounts[self.index] = self.nodes
+        if stopEvent.is_set():
+            self.stopped = True
+
+'''
+Search of the main process while helpers search the same position (Lazy SMP): they fill the shared transposition
+table, which makes the main search faster; their own results are discarded. Reported nodes include the helpers.
+'''
+class MainSearch(Search):
+
+    def totalNodes(self):
+        return self.nodes + sum(nodeCounts[1:])
+
+'''
+Parallel search over `workers` processes: this process runs the search whose result is used, workers - 1 helper
+processes from a persistent pool run the same iterative deepening on the shared transposition table.
+'''
+class ParallelSearch():
+
+    def __init__(self, gs, maxDepth=MAX_DEPTH, maxTime=None, maxNodes=None, workers=2, info=None):
+        self.gs = gs
+        self.maxDepth = maxDepth
+        self.maxTime = maxTime
+        self.maxNodes = maxNodes
+        self.workers = workers
+        self.search = MainSearch(gs, maxDepth, maxTime, maxNodes, getTranspositionTable(shared=True), info)
+        self.helperNodes = 0
+
+    def stop(self):
+        self.search.stop()
+        if stopEvent is not None:
+            stopEvent.set()
+
+    @property
+    def nodes(self):
+        return self.search.nodes + self.helperNodes
+
+    def run(self, validMoves):
+        pool = getWorkerPool(self.workers)
+        tt = self.search.tt
+        tt.newSearch()
+        stopEvent.clear()
+        for i in range(self.workers):
+            nodeCounts[i] = 0
+        position = positionOf(self.gs)
+        helpers = [pool.apply_async(helperSearch, (position, self.maxDepth, self.maxTime, self.maxNodes, tt.age, i))
+                   for i in range(1, self.workers)]
+        try:
+            move = self.search.run(validMoves, newSearch=False)
+        finally:
+            stopEvent.set()
+        self.helperNodes = sum(helper.get() for helper in helpers)
+        return move
+
+
+'''
+Runs findBestMove in a background thread on a private copy of the game state, so the caller (the pygame loop)
+keeps handling events and drawing while the engine thinks. Poll done() every frame, then take result().
+
+With ponderMove the search is for the position after that move (the reply the engine expects) and runs without
+its time limit while the opponent thinks. If the opponent plays it, ponderhit() puts the time limit back, counted
+from the start of the search, and the search goes on as the engine's own; otherwise cancel() it; what it stored in
+the transposition table stays there.
+'''
+class BackgroundSearch():
+
+    def __init__(self, gs, depth, maxTime=None, maxNodes=None, info=None, workers=None, ponderMove=None):
+        self.gs = gs.clone()
+        self.ponderMove = ponderMove
+        self.maxTime = maxTime
+        if ponderMove is not None:
+            self.gs.makeMove(ponderMove)
+            maxTime = None # until ponderhit
+        self.key = self.gs.zobristKey # of the position searched (the search moves on self.gs while it runs)
+        if workers is None:
+            workers = SEARCH_WORKERS
+        if workers > 1:
+            self.search = ParallelSearch(self.gs, depth, maxTime, maxNodes, workers, info)
+        else:
+            self.search = Search(self.gs, depth, maxTime, maxNodes, info=info)
+        self.move = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        validMoves = self.gs.getValidMoves()
+        self.move = findBookMove(self.gs, validMoves)
+        if self.move is None:
+            self.move = self.search.run(validMoves)
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    '''
+    the move found, as the equal object out of the caller's validMoves
+    '''
+    def result(self, validMoves):
+        for move in validMoves:
+            if move == self.move:
+                return move
+        return None
+
+    '''
+    the opponent's reply the principal variation expects to the move found (the move to ponder on), or None
+    '''
+    def expectedReply(self):
+        pv = self.mainSearch().pv
+        if self.move is not None and len(pv) > 1 and pv[0] == self.move:
+            return pv[1]
+        return None
+
+    '''
+    the opponent has moved: if gs is the position pondered on, the search becomes the normal one (with its time
+    limit) and True is returned; False means the guess was wrong and the search should be cancelled
+    '''
+    def ponderhit(self, gs):
+        if self.ponderMove is None or gs.zobristKey != self.key:
+            return False
+        self.ponderMove = None
+        if self.maxTime is not None:
+            search = self.mainSearch()
+            search.maxTime = self.maxTime # in case run has not started yet
+            if search.startTime:
+                search.deadline = search.startTime + self.maxTime
+        return True
+
+    def mainSearch(self):
+        return self.search.search if isinstance(self.search, ParallelSearch) else self.search
+
+    '''
+    a snapshot of the running search for display: last completed depth, nodes, nodes/second and best move so far
+    (None while the first iteration runs)
+    '''
+    def progress(self):
+        search = self.mainSearch()
+        elapsed = time.perf_counter() - search.startTime if search.startTime else 0.0
+        nodes = search.totalNodes()
+        return {"depth": search.completedDepth, "nodes": nodes, "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+                "bestMove": search.bestMove if search.completedDepth else None}
+
+    '''
+    stops the search; the thread finishes on its own within CHECK_INTERVAL nodes
+    '''
+    def cancel(self):
+        self.search.stop()
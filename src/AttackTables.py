@@ -0,0 +1,66 @@
+"""
+Lookup tables for the move generators of ChessEngine.GameState, built once at import.
+
+Every table is indexed [row][col] like GameState.board and holds the target squares as (row, col) tuples, already
+clipped to the board, so the generators only iterate and never do bounds checks or coordinate arithmetic:
+
+    KNIGHT_TARGETS[r][c]      squares a knight on (r, c) jumps to
+    KING_TARGETS[r][c]        squares a king on (r, c) steps to
+    PAWN_ATTACKS[color][r][c] squares a pawn of color 'w' or 'b' on (r, c) attacks
+    PAWN_CAPTURES[color][r][c] the same as ((direction, square), ...), for checking the direction against a pin
+    PAWN_PUSHES[color][r][c]  the square a pawn on (r, c) pushes to, then the double step square from its start row
+    PAWN_PUSH_SOURCES[color][r][c] the squares a pawn pushing to (r, c) comes from, nearest first
+    RAYS[r][c]                ((direction, squares), ...) for the 8 DIRECTIONS, squares ordered outwards from (r, c)
+    ROOK_RAYS, BISHOP_RAYS    the orthogonal and diagonal part of RAYS
+"""
+
+# same order as the directions in GameState.checkForPinsAndChecks: the first four are orthogonal, the last four diagonal
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# one shared tuple per square
+SQUARES = tuple(tuple((r, c) for c in range(8)) for r in range(8))
+
+def onBoard(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+'''
+builds a [row][col] table of the squares reached by a single step of each given (row, col) step
+'''
+def stepTable(steps):
+    return tuple(tuple(tuple(SQUARES[r + dr][c + dc] for dr, dc in steps if onBoard(r + dr, c + dc))
+                       for c in range(8)) for r in range(8))
+
+'''
+squares from (r, c) in direction d, up to the edge of the board
+'''
+def ray(r, c, d):
+    squares = []
+    endRow, endCol = r + d[0], c + d[1]
+    while onBoard(endRow, endCol):
+        squares.append(SQUARES[endRow][endCol])
+        endRow += d[0]
+        endCol += d[1]
+    return tuple(squares)
+
+KNIGHT_TARGETS = stepTable(KNIGHT_STEPS)
+KING_TARGETS = stepTable(KING_STEPS)
+PAWN_ATTACKS = {'w': stepTable(((-1, -1), (-1, 1))), 'b': stepTable(((1, -1), (1, 1)))}
+PAWN_CAPTURES = {color: tuple(tuple(tuple(((end[0] - r, end[1] - c), end) for end in PAWN_ATTACKS[color][r][c])
+                                    for c in range(8)) for r in range(8)) for color in ('w', 'b')}
+
+'''
+[row][col] table of the squares reached by steps of `step` rows, two of them from `doubleRow`, one from other rows
+'''
+def pushTable(step, doubleRow):
+    return tuple(tuple(tuple(SQUARES[r + step * i][c] for i in ((1, 2) if r == doubleRow else (1,))
+                             if onBoard(r + step * i, c)) for c in range(8)) for r in range(8))
+
+PAWN_PUSHES = {'w': pushTable(-1, 6), 'b': pushTable(1, 1)}
+# walking back from the target: a white pawn reaches row 4 with a double step from row 6
+PAWN_PUSH_SOURCES = {'w': pushTable(1, 4), 'b': pushTable(-1, 3)}
+
+RAYS = tuple(tuple(tuple((d, ray(r, c, d)) for d in DIRECTIONS) for c in range(8)) for r in range(8))
+ROOK_RAYS = tuple(tuple(RAYS[r][c][:4] for c in range(8)) for r in range(8))
+BISHOP_RAYS = tuple(tuple(RAYS[r][c][4:] for c in range(8)) for r in range(8))
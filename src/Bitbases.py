@@ -0,0 +1,318 @@
+"""
+Endgame bitbases for king and one piece against king: KQK, KRK and KPK.
+
+A bitbase knows for every position of its endgame whether the side with the extra piece (the strong side) wins
+or it is a draw, plus the distance to mate. It is built offline by retrograde analysis: every position's legal
+moves are generated once with GameState.getValidMoves (in a process pool), then the wins are propagated backwards
+from the checkmates, one ply at a time, so the distance to mate comes out of the same pass.
+
+Positions are stored with the strong side as white (a position with a black extra piece is mirrored), indexed
+
+    index = stm * 64**3 + (whiteKing * 64 + blackKing) * 64 + piece      squares as r * 8 + c, stm 0: white to move
+
+File layout (BITBASE_DIR/<name>.bin): MAGIC, then one bit per index (1: the strong side wins), then one byte per
+index with the distance to mate in plies (0 for draws and illegal positions). The file is memory-mapped, a probe
+reads one bit and one byte.
+
+Usage (from the src folder):
+    python3 Bitbases.py                  # generate all bitbases (KQK and KRK first, KPK promotes into them)
+    python3 Bitbases.py --only KRK -w 4
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+
+import ChessEngine
+
+BITBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbases")
+ENDGAMES = ("KQK", "KRK", "KPK") # generation order, KPK needs the other two for promotions
+MAGIC = b"BITBASE1"
+POSITIONS = 64 * 64 * 64 # per side to move
+SIZE = 2 * POSITIONS
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# successor markers of the move lists: a move that leaves the bitbase (capture of the piece, promotion)
+EXTERNAL_DRAW = 0xFFFFFFFF
+EXTERNAL_WIN = 0x80000000 # | distance to mate of the position after the move
+
+tables = {} # name: Bitbase, or None if the file does not exist
+
+def index(whiteToMove, whiteKing, blackKing, piece):
+    return (0 if whiteToMove else POSITIONS) + (whiteKing * 64 + blackKing) * 64 + piece
+
+class Bitbase():
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a bitbase file" % path)
+        self.wdlOffset = len(MAGIC)
+        self.dtmOffset = self.wdlOffset + SIZE // 8
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    '''
+    returns (strong side wins, distance to mate in plies) of a position index
+    '''
+    def lookup(self, i):
+        if self.data[self.wdlOffset + (i >> 3)] >> (i & 7) & 1:
+            return True, self.data[self.dtmOffset + i]
+        return False, 0
+
+def getBitbase(name):
+    if name not in tables:
+        path = os.path.join(BITBASE_DIR, name + ".bin")
+        tables[name] = Bitbase(path) if os.path.exists(path) else None
+    return tables[name]
+
+'''
+looks the position up in the bitbases: returns (WIN, DRAW or LOSS for the side to move, distance to mate in plies),
+or None if the material is not covered (or its bitbase has not been generated). Two bare kings are a draw
+'''
+def probe(gs):
+    if gs.phase > 4 or gs.castleRights: # more than a queen of material on the board, or castling still possible
+        return None
+    pieces = []
+    for r in range(8):
+        row = gs.board[r]
+        for c in range(8):
+            if row[c] != "--":
+                pieces.append((row[c], r, c))
+                if len(pieces) > 3:
+                    return None
+    if len(pieces) == 2:
+        return DRAW, 0
+    if len(pieces) != 3:
+        return None
+    strong = None
+    kings = {}
+    for piece, r, c in pieces:
+        if piece[1] == 'K':
+            kings[piece[0]] = (r, c)
+        else:
+            strong = (piece, r, c)
+    if strong is None or len(kings) != 2:
+        return None
+    piece, r, c = strong
+    table = getBitbase("K" + piece[1] + "K")
+    if table is None:
+        return None
+    strongToMove = gs.whiteToMove == (piece[0] == 'w')
+    if piece[0] == 'w':
+        (wr, wc), (br, bc) = kings['w'], kings['b']
+        i = index(strongToMove, wr * 8 + wc, br * 8 + bc, r * 8 + c)
+    else: # mirror the board so the strong side is white
+        (wr, wc), (br, bc) = kings['b'], kings['w']
+        i = index(strongToMove, (7 - wr) * 8 + wc, (7 - br) * 8 + bc, (7 - r) * 8 + c)
+    won, distance = table.lookup(i)
+    if not won:
+        return DRAW, 0
+    return (WIN if strongToMove else LOSS), distance
+
+# ---- generation ----
+
+'''
+a GameState with an empty board, to set up the positions of a bitbase on
+'''
+def emptyGameState():
+    gs = ChessEngine.GameState()
+    gs.board = [["--"] * 8 for _ in range(8)]
+    gs.castleRights = 0
+    gs.enPassantPossible = ()
+    return gs
+
+'''
+generates the moves of all positions with the white king on the given squares (runs in the worker processes).
+returns (indices, info, offsets, successors): info per index 0 illegal, 1 legal, 2 legal and in check;
+the successors of indices[k] are successors[offsets[k]:offsets[k + 1]]
+'''
+def generateMoves(name, whiteKings):
+    pieceType = name[1]
+    gs = emptyGameState()
+    board = gs.board
+    promotionTables = {promoted: getBitbase("K" + promoted + "K") for promoted in "QR"} if pieceType == 'P' else {}
+    indices = array('I')
+    info = bytearray()
+    offsets = array('I', [0])
+    successors = array('I')
+    for wk in whiteKings:
+        wr, wc = divmod(wk, 8)
+        for bk in range(64):
+            br, bc = divmod(bk, 8)
+            for sq in range(64):
+                r, c = divmod(sq, 8)
+                for whiteToMove in (True, False):
+                    indices.append(index(whiteToMove, wk, bk, sq))
+                    if len({wk, bk, sq}) < 3 or (abs(wr - br) <= 1 and abs(wc - bc) <= 1) or \
+                            (pieceType == 'P' and r in (0, 7)):
+                        info.append(0)
+                        offsets.append(len(successors))
+                        continue
+                    board[wr][wc] = "wK"
+                    board[br][bc] = "bK"
+                    board[r][c] = "w" + pieceType
+                    gs.whiteKingLocation = (wr, wc)
+                    gs.blackKingLocation = (br, bc)
+                    # the side that has just moved must not be in check
+                    gs.whiteToMove = not whiteToMove
+                    kingRow, kingCol = gs.blackKingLocation if whiteToMove else gs.whiteKingLocation
+                    if gs.squareUnderAttack(kingRow, kingCol):
+                        info.append(0)
+                    else:
+                        gs.whiteToMove = whiteToMove
+                        moves = gs.getValidMoves()
+                        info.append(2 if gs.inCheck else 1)
+                        for move in moves:
+                            successors.append(successorOf(move, wk, bk, sq, promotionTables))
+                    board[wr][wc] = board[br][bc] = board[r][c] = "--"
+                    offsets.append(len(successors))
+    return indices, bytes(info), offsets, successors
+
+'''
+index of the position after the move, or an EXTERNAL_* marker when the move leaves the bitbase
+'''
+def successorOf(move, wk, bk, sq, promotionTables):
+    start = move.startRow * 8 + move.startCol
+    end = move.endRow * 8 + move.endCol
+    if move.pieceMoved == "bK":
+        if end == sq: # the lone king took the piece
+            return EXTERNAL_DRAW
+        return index(True, wk, end, sq)
+    if move.pieceMoved == "wK":
+        return index(False, end, bk, sq)
+    if move.isPawnPromotion:
+        table = promotionTables.get(move.promotionChoice)
+        if table is None: # bishop or knight: no mating material
+            return EXTERNAL_DRAW
+        won, distance = table.lookup(index(False, wk, bk, end))
+        return EXTERNAL_WIN | distance if won else EXTERNAL_DRAW # solve adds the promotion ply
+    return index(False, wk, bk, end)
+
+'''
+retrograde analysis of one endgame, returns (wins, distances) as bytearrays over all indices
+'''
+def solve(name, workers):
+    info = bytearray(SIZE)
+    offsets = array('I', bytes(4 * (SIZE + 1)))
+    successors = array('I')
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers) as pool:
+        chunks = pool.starmap(generateMoves, [(name, [wk]) for wk in range(64)])
+    # moves, in index order
+    moveLists = [None] * SIZE
+    for indices, chunkInfo, chunkOffsets, chunkSuccessors in chunks:
+        for k, i in enumerate(indices):
+            info[i] = chunkInfo[k]
+            moveLists[i] = chunkSuccessors[chunkOffsets[k]:chunkOffsets[k + 1]]
+    del chunks
+
+    # predecessors of every position, and how many moves of each black to move position are not lost yet
+    predecessorCount = array('I', bytes(4 * SIZE))
+    remaining = array('H', bytes(2 * SIZE))
+    for i in range(SIZE):
+        if info[i]:
+            remaining[i] = len(moveLists[i])
+            for j in moveLists[i]:
+                if j < SIZE:
+                    predecessorCount[j] += 1
+    predecessorOffsets = array('I', bytes(4 * (SIZE + 1)))
+    total = 0
+    for i in range(SIZE):
+        predecessorOffsets[i] = total
+        total += predecessorCount[i]
+    predecessorOffsets[SIZE] = total
+    predecessors = array('I', bytes(4 * total))
+    fill = array('I', predecessorOffsets)
+    for i in range(SIZE):
+        if info[i]:
+            for j in moveLists[i]:
+                if j < SIZE:
+                    predecessors[fill[j]] = i
+                    fill[j] += 1
+    del fill, predecessorCount
+
+    # buckets[d]: positions won in d plies, in the order they are found
+    buckets = [[]]
+    for i in range(POSITIONS, SIZE): # black to move and checkmated
+        if info[i] == 2 and not moveLists[i]:
+            buckets[0].append(i)
+    for i in range(POSITIONS): # white to move with a winning promotion
+        if info[i]:
+            for j in moveLists[i]:
+                if j != EXTERNAL_DRAW and j & EXTERNAL_WIN:
+                    distance = (j & ~EXTERNAL_WIN) + 1
+                    while len(buckets) <= distance:
+                        buckets.append([])
+                    buckets[distance].append(i)
+    del moveLists
+
+    wins = bytearray(SIZE)
+    distances = bytearray(SIZE)
+    distance = 0
+    while distance < len(buckets):
+        for i in buckets[distance]:
+            if wins[i]:
+                continue # white to move, already won faster
+            wins[i] = 1
+            distances[i] = min(distance, 255)
+            found = []
+            for k in range(predecessorOffsets[i], predecessorOffsets[i + 1]):
+                j = predecessors[k]
+                if wins[j]:
+                    continue
+                if j < POSITIONS: # white to move: one winning move is enough
+                    found.append(j)
+                else: # black to move: lost once every move is
+                    remaining[j] -= 1
+                    if remaining[j] == 0:
+                        found.append(j)
+            if found:
+                if len(buckets) == distance + 1:
+                    buckets.append([])
+                buckets[distance + 1].extend(found)
+        buckets[distance] = None
+        distance += 1
+    return wins, distances
+
+def writeBitbase(path, wins, distances):
+    bits = bytearray(SIZE // 8)
+    for i in range(SIZE):
+        if wins[i]:
+            bits[i >> 3] |= 1 << (i & 7)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(bits)
+        f.write(distances)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="generate the endgame bitbases")
+    parser.add_argument("--only", choices=ENDGAMES, help="generate just this endgame")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args(argv)
+
+    os.makedirs(BITBASE_DIR, exist_ok=True)
+    for name in ENDGAMES:
+        if args.only and name != args.only:
+            continue
+        start = time.perf_counter()
+        wins, distances = solve(name, args.workers)
+        path = os.path.join(BITBASE_DIR, name + ".bin")
+        writeBitbase(path, wins, distances)
+        tables.pop(name, None)
+        print("%s: %d won positions, longest win %d plies, %.1fs -> %s" %
+              (name, sum(wins), max(distances), time.perf_counter() - start, path))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,506 @@
+"""
+Alternative board engine with the same public interface as ChessEngine.GameState. The position is stored as 12
+piece bitboards (Python ints, bit r*8 + c is set if the piece stands on row r, column c) plus one occupancy board
+per color. Attacks are looked up in tables built once at import, sliding pieces use the classical ray approach
+(ray mask of the direction, cut off behind the first blocker found with a bit scan).
+
+An 8x8 `board` list is kept in sync with the bitboards, so ChessMain.BoardRenderer.draw and the Move class work unchanged.
+"""
+import copy
+
+import ChessEngine
+import Evaluation
+import Zobrist
+from ChessEngine import Move
+
+PIECES = ('wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+
+ALL_SQUARES = (1 << 64) - 1
+# (row, col) of every square index, so move generation does not need divmod
+COORDS = [divmod(sq, 8) for sq in range(64)]
+
+# the 8 ray directions as (row, col) steps; the first four are orthogonal, the last four diagonal
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ORTHOGONAL = (0, 1, 2, 3)
+DIAGONAL = (4, 5, 6, 7)
+ALL_DIRECTIONS = ORTHOGONAL + DIAGONAL
+# directions that go towards higher square numbers: their first blocker is the lowest set bit
+POSITIVE = tuple(dr > 0 or (dr == 0 and dc > 0) for dr, dc in DIRECTIONS)
+
+'''
+Lookup tables, built once at import
+'''
+def _onBoard(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _stepTable(steps):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        for dr, dc in steps:
+            if _onBoard(r + dr, c + dc):
+                bb |= 1 << ((r + dr) * 8 + c + dc)
+        table.append(bb)
+    return table
+
+KNIGHT_ATTACKS = _stepTable(((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+KING_ATTACKS = _stepTable(DIRECTIONS)
+# PAWN_ATTACKS[color][sq]: squares a pawn of that color on sq attacks
+PAWN_ATTACKS = (_stepTable(((-1, -1), (-1, 1))), _stepTable(((1, -1), (1, 1))))
+
+RAYS = []
+for _dr, _dc in DIRECTIONS:
+    _table = []
+    for _sq in range(64):
+        _r, _c = divmod(_sq, 8)
+        _bb = 0
+        _r += _dr
+        _c += _dc
+        while _onBoard(_r, _c):
+            _bb |= 1 << (_r * 8 + _c)
+            _r += _dr
+            _c += _dc
+        _table.append(_bb)
+    RAYS.append(_table)
+
+ROOK_RAYS = [RAYS[0][sq] | RAYS[1][sq] | RAYS[2][sq] | RAYS[3][sq] for sq in range(64)]
+BISHOP_RAYS = [RAYS[4][sq] | RAYS[5][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in range(64)]
+
+# BETWEEN[a][b]: squares strictly between a and b, LINE[a][b]: the whole line through a and b (0 if not aligned)
+BETWEEN = [[0] * 64 for _ in range(64)]
+LINE = [[0] * 64 for _ in range(64)]
+for _d in range(8):
+    _opposite = DIRECTIONS.index((-DIRECTIONS[_d][0], -DIRECTIONS[_d][1]))
+    for _a in range(64):
+        _ray = RAYS[_d][_a]
+        while _ray:
+            _bit = _ray & -_ray
+            _b = _bit.bit_length() - 1
+            _ray ^= _bit
+            BETWEEN[_a][_b] = RAYS[_d][_a] & RAYS[_opposite][_b]
+            LINE[_a][_b] = RAYS[_d][_a] | RAYS[_opposite][_a] | (1 << _a)
+
+del _d, _opposite, _a, _b, _ray, _bit, _dr, _dc, _table, _sq, _r, _c, _bb
+
+def slidingAttacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if POSITIVE[d]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[d][first]
+        attacks |= ray
+    return attacks
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ORTHOGONAL)
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, DIAGONAL)
+
+
+class BitboardGameState():
+
+    engineName = "bitboard"
+
+    def __init__(self, fen=None):
+        self.initState()
+        self.loadFEN(fen if fen is not None else ChessEngine.START_FEN)
+
+    '''
+    the state that does not depend on the position: move log and game end flags
+    '''
+    def initState(self):
+        self.moveLog = []
+        self.checkmate = False
+        self.stalemate = False
+        self.repetition = False
+        self.fiftyMoveRule = False
+        self.inCheck = False
+
+    '''
+    sets up a position (clears the move log), see ChessEngine.GameState.setPosition
+    '''
+    def setPosition(self, board, whiteToMove, castleRights, enPassantPossible, halfmoveClock, fullmoveNumber):
+        self.board = board
+        self.bitboards = [0] * 12
+        self.occupied = [0, 0]
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != "--":
+                    bit = 1 << (r * 8 + c)
+                    self.bitboards[PIECE_INDEX[piece]] |= bit
+                    self.occupied[WHITE if piece[0] == 'w' else BLACK] |= bit
+        self.whiteToMove = whiteToMove
+        self.castleRights = castleRights
+        self.enPassantPossible = enPassantPossible
+        self.halfmoveClock = halfmoveClock
+        self.undoLog = []
+        self.fullmoveNumber = fullmoveNumber
+        self.moveLog = []
+        self.checkmate = False
+        self.stalemate = False
+        self.resetPositionHistory()
+        self.resetEvaluation()
+
+    @classmethod
+    def fromBytes(cls, data):
+        gs = cls.__new__(cls)
+        gs.initState()
+        gs.setPosition(*ChessEngine.decodePosition(data))
+        return gs
+
+    def clone(self):
+        gs = copy.copy(self)
+        gs.board = [row[:] for row in self.board]
+        gs.bitboards = list(self.bitboards)
+        gs.occupied = list(self.occupied)
+        gs.moveLog = []
+        gs.undoLog = []
+        gs.keyHistory = list(self.keyHistory)
+        gs.keyCounts = dict(self.keyCounts)
+        return gs
+
+    loadFEN = ChessEngine.GameState.loadFEN
+    toBytes = ChessEngine.GameState.toBytes
+    getFEN = ChessEngine.GameState.getFEN
+    resetPositionHistory = ChessEngine.GameState.resetPositionHistory
+    resetEvaluation = ChessEngine.GameState.resetEvaluation
+    pushPositionKey = ChessEngine.GameState.pushPositionKey
+    popPositionKey = ChessEngine.GameState.popPositionKey
+    getSmallestAttacker = ChessEngine.GameState.getSmallestAttacker # works on the 8x8 board
+    whiteCastleKingside = ChessEngine.GameState.whiteCastleKingside
+    whiteCastleQueenside = ChessEngine.GameState.whiteCastleQueenside
+    blackCastleKingside = ChessEngine.GameState.blackCastleKingside
+    blackCastleQueenside = ChessEngine.GameState.blackCastleQueenside
+
+    @property
+    def whiteKingLocation(self):
+        return divmod(self.bitboards[5].bit_length() - 1, 8)
+
+    @property
+    def blackKingLocation(self):
+        return divmod(self.bitboards[11].bit_length() - 1, 8)
+
+    '''
+    takes a move as a parameter and executes it (including castling, en passant, promotion)
+    '''
+    def makeMove(self, move):
+        bitboards = self.bitboards
+        board = self.board
+        us = WHITE if self.whiteToMove else BLACK
+        them = us ^ 1
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        fromBit = 1 << start
+        toBit = 1 << end
+        pieceIndex = PIECE_INDEX[move.pieceMoved]
+        self.undoLog.append((self.castleRights, self.enPassantPossible, self.halfmoveClock))
+        pieceKeys = Zobrist.PIECE_KEYS
+        key = self.zobristKey ^ Zobrist.WHITE_TO_MOVE_KEY ^ Zobrist.CASTLE_KEYS[self.castleRights] ^ \
+              pieceKeys[move.pieceMoved][start]
+        if self.enPassantPossible:
+            key ^= Zobrist.enPassantKey(board, self.enPassantPossible, self.whiteToMove)
+        mg, eg, phase = Evaluation.moveDelta(move)
+        self.mgScore += mg
+        self.egScore += eg
+        self.phase += phase
+
+        if move.pieceCaptured != "--":
+            if move.isEnPassantMove:
+                capturedSq = move.startRow * 8 + move.endCol
+                board[move.startRow][move.endCol] = "--"
+            else:
+                capturedSq = move.endRow * 8 + move.endCol
+            capturedBit = 1 << capturedSq
+            bitboards[PIECE_INDEX[move.pieceCaptured]] ^= capturedBit
+            self.occupied[them] ^= capturedBit
+            key ^= pieceKeys[move.pieceCaptured][capturedSq]
+
+        bitboards[pieceIndex] ^= fromBit | toBit
+        self.occupied[us] ^= fromBit | toBit
+        board[move.startRow][move.startCol] = "--"
+        board[move.endRow][move.endCol] = move.pieceMoved
+
+        if move.isPawnPromotion:
+            promoted = move.pieceMoved[0] + move.promotionChoice
+            bitboards[pieceIndex] ^= toBit
+            bitboards[PIECE_INDEX[promoted]] |= toBit
+            board[move.endRow][move.endCol] = promoted
+        key ^= pieceKeys[board[move.endRow][move.endCol]][move.endRow * 8 + move.endCol]
+
+        if move.isCastleMove:
+            rookFrom, rookTo = ChessEngine.castleRookColumns(move)
+            rookBits = (1 << (move.endRow * 8 + rookFrom)) | (1 << (move.endRow * 8 + rookTo))
+            bitboards[pieceIndex - KING + ROOK] ^= rookBits
+            self.occupied[us] ^= rookBits
+            board[move.endRow][rookTo] = board[move.endRow][rookFrom]
+            board[move.endRow][rookFrom] = "--"
+            rookKeys = pieceKeys[PIECES[pieceIndex - KING + ROOK]]
+            key ^= rookKeys[move.endRow * 8 + rookFrom] ^ rookKeys[move.endRow * 8 + rookTo]
+
+        # update enPassantPossible
+        if move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2:
+            self.enPassantPossible = ((move.endRow + move.startRow) // 2, move.startCol)
+        else:
+            self.enPassantPossible = ()
+
+        # update castling rights
+        self.castleRights &= ChessEngine.CASTLE_RIGHTS_KEPT[start] & ChessEngine.CASTLE_RIGHTS_KEPT[end]
+
+        # fifty-move rule
+        if move.pieceMoved[1] == 'P' or move.pieceCaptured != "--":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if not self.whiteToMove:
+            self.fullmoveNumber += 1
+
+        self.whiteToMove = not self.whiteToMove
+        self.moveLog.append(move)
+        key ^= Zobrist.CASTLE_KEYS[self.castleRights]
+        if self.enPassantPossible:
+            key ^= Zobrist.enPassantKey(board, self.enPassantPossible, self.whiteToMove)
+        self.pushPositionKey(key)
+
+    '''
+    undo the last move made
+    '''
+    def undoMove(self):
+        if len(self.moveLog) == 0:
+            return
+        move = self.moveLog.pop()
+        self.whiteToMove = not self.whiteToMove
+        bitboards = self.bitboards
+        board = self.board
+        us = WHITE if self.whiteToMove else BLACK
+        them = us ^ 1
+        fromBit = 1 << (move.startRow * 8 + move.startCol)
+        toBit = 1 << (move.endRow * 8 + move.endCol)
+        pieceIndex = PIECE_INDEX[move.pieceMoved]
+
+        if move.isCastleMove:
+            rookFrom, rookTo = ChessEngine.castleRookColumns(move)
+            rookBits = (1 << (move.endRow * 8 + rookFrom)) | (1 << (move.endRow * 8 + rookTo))
+            bitboards[pieceIndex - KING + ROOK] ^= rookBits
+            self.occupied[us] ^= rookBits
+            board[move.endRow][rookFrom] = board[move.endRow][rookTo]
+            board[move.endRow][rookTo] = "--"
+
+        if move.isPawnPromotion:
+            bitboards[PIECE_INDEX[move.pieceMoved[0] + move.promotionChoice]] ^= toBit
+            bitboards[pieceIndex] |= toBit
+
+        bitboards[pieceIndex] ^= fromBit | toBit
+        self.occupied[us] ^= fromBit | toBit
+        board[move.startRow][move.startCol] = move.pieceMoved
+        board[move.endRow][move.endCol] = "--"
+
+        if move.pieceCaptured != "--":
+            if move.isEnPassantMove:
+                capturedBit = 1 << (move.startRow * 8 + move.endCol)
+                board[move.startRow][move.endCol] = move.pieceCaptured
+            else:
+                capturedBit = toBit
+                board[move.endRow][move.endCol] = move.pieceCaptured
+            bitboards[PIECE_INDEX[move.pieceCaptured]] |= capturedBit
+            self.occupied[them] |= capturedBit
+
+        self.castleRights, self.enPassantPossible, self.halfmoveClock = self.undoLog.pop()
+        if not self.whiteToMove:
+            self.fullmoveNumber -= 1
+        self.popPositionKey()
+        mg, eg, phase = Evaluation.moveDelta(move)
+        self.mgScore -= mg
+        self.egScore -= eg
+        self.phase -= phase
+        self.checkmate = False
+        self.stalemate = False
+
+    '''
+    returns a bitboard of the pieces of color `by` that attack sq, given the occupancy
+    '''
+    def attackersTo(self, sq, occupied, by):
+        bitboards = self.bitboards
+        base = 6 * by
+        queens = bitboards[base + QUEEN]
+        return (PAWN_ATTACKS[by ^ 1][sq] & bitboards[base + PAWN]) | \
+               (KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT]) | \
+               (KING_ATTACKS[sq] & bitboards[base + KING]) | \
+               (rookAttacks(sq, occupied) & (bitboards[base + ROOK] | queens)) | \
+               (bishopAttacks(sq, occupied) & (bitboards[base + BISHOP] | queens))
+
+    '''
+    checks if a square is attacked by the opponent of the side to move
+    '''
+    def squareUnderAttack(self, r, c):
+        us = WHITE if self.whiteToMove else BLACK
+        return self.attackersTo(r * 8 + c, self.occupied[0] | self.occupied[1], us ^ 1) != 0
+
+    '''
+    All legal moves: check evasions and pins are resolved with masks, so no move has to be made and undone
+    '''
+    def getValidMoves(self):
+        moves = []
+        board = self.board
+        bitboards = self.bitboards
+        us = WHITE if self.whiteToMove else BLACK
+        them = us ^ 1
+        base = 6 * us
+        enemyBase = 6 * them
+        own = self.occupied[us]
+        enemy = self.occupied[them]
+        occupied = own | enemy
+        kingSq = bitboards[base + KING].bit_length() - 1
+        kingRow, kingCol = COORDS[kingSq]
+
+        checkers = self.attackersTo(kingSq, occupied, them)
+        self.inCheck = checkers != 0
+
+        # king moves: the king must not stay on the ray of a slider it moves away from
+        withoutKing = occupied ^ (1 << kingSq)
+        targets = KING_ATTACKS[kingSq] & ~own
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            sq = bit.bit_length() - 1
+            if not self.attackersTo(sq, withoutKing, them):
+                moves.append(Move((kingRow, kingCol), COORDS[sq], board))
+
+        if checkers & (checkers - 1):  # double check: only the king can move
+            self._setGameOver(moves)
+            return moves
+
+        if checkers:
+            checkMask = checkers | BETWEEN[kingSq][checkers.bit_length() - 1]
+        else:
+            checkMask = ALL_SQUARES
+            self._getCastleMoves(kingSq, occupied, them, moves)
+
+        # pinned pieces may only move along the line between king and pinner
+        pinned = 0
+        pinLines = {}
+        snipers = (ROOK_RAYS[kingSq] & (bitboards[enemyBase + ROOK] | bitboards[enemyBase + QUEEN])) | \
+                  (BISHOP_RAYS[kingSq] & (bitboards[enemyBase + BISHOP] | bitboards[enemyBase + QUEEN]))
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            sniperSq = bit.bit_length() - 1
+            blockers = BETWEEN[kingSq][sniperSq] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pinLines[blockers.bit_length() - 1] = LINE[kingSq][sniperSq]
+
+        notOwn = ~own & checkMask
+        for offset, attacks in ((KNIGHT, None), (BISHOP, DIAGONAL), (ROOK, ORTHOGONAL), (QUEEN, None)):
+            pieces = bitboards[base + offset]
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                sq = bit.bit_length() - 1
+                if offset == KNIGHT:
+                    if bit & pinned:
+                        continue
+                    targets = KNIGHT_ATTACKS[sq] & notOwn
+                elif offset == QUEEN:
+                    targets = slidingAttacks(sq, occupied, ALL_DIRECTIONS) & notOwn
+                else:
+                    targets = slidingAttacks(sq, occupied, attacks) & notOwn
+                if bit & pinned:
+                    targets &= pinLines[sq]
+                start = COORDS[sq]
+                while targets:
+                    targetBit = targets & -targets
+                    targets ^= targetBit
+                    moves.append(Move(start, COORDS[targetBit.bit_length() - 1], board))
+
+        self._getPawnMoves(us, own, enemy, occupied, kingSq, checkMask, pinned, pinLines, moves)
+        self._setGameOver(moves)
+        return moves
+
+    def _setGameOver(self, moves):
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = False
+
+    def _getPawnMoves(self, us, own, enemy, occupied, kingSq, checkMask, pinned, pinLines, moves):
+        board = self.board
+        pawns = self.bitboards[6 * us + PAWN]
+        if us == WHITE:
+            step, startRow, lastRow = -8, 6, 0
+        else:
+            step, startRow, lastRow = 8, 1, 7
+        attackTable = PAWN_ATTACKS[us]
+        empty = ~occupied
+        epSq = -1
+        if self.enPassantPossible:
+            epSq = self.enPassantPossible[0] * 8 + self.enPassantPossible[1]
+
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            sq = bit.bit_length() - 1
+            r, c = COORDS[sq]
+            allowed = checkMask
+            if bit & pinned:
+                allowed &= pinLines[sq]
+
+            targets = 0
+            pushBit = 1 << (sq + step)
+            if pushBit & empty:
+                targets |= pushBit
+                if r == startRow:
+                    doubleBit = 1 << (sq + 2 * step)
+                    if doubleBit & empty:
+                        targets |= doubleBit
+            targets |= attackTable[sq] & enemy
+            targets &= allowed
+
+            while targets:
+                targetBit = targets & -targets
+                targets ^= targetBit
+                end = COORDS[targetBit.bit_length() - 1]
+                if end[0] == lastRow:
+                    for piece in Move.promotionPieces:
+                        moves.append(Move((r, c), end, board, promotionChoice=piece))
+                else:
+                    moves.append(Move((r, c), end, board))
+
+            if epSq >= 0 and attackTable[sq] & (1 << epSq):
+                # en passant removes two pieces from the board at once, verify it on the resulting occupancy
+                capturedSq = epSq - step
+                after = (occupied ^ bit ^ (1 << capturedSq)) | (1 << epSq)
+                enemyBase = 6 * (us ^ 1)
+                self.bitboards[enemyBase + PAWN] ^= 1 << capturedSq
+                exposed = self.attackersTo(kingSq, after, us ^ 1)
+                self.bitboards[enemyBase + PAWN] ^= 1 << capturedSq
+                if not exposed:
+                    moves.append(Move((r, c), COORDS[epSq], board, isEnPassantMove=True))
+
+    def _getCastleMoves(self, kingSq, occupied, them, moves):
+        board = self.board
+        if self.whiteToMove:
+            row, kingside, queenside = 7, self.whiteCastleKingside, self.whiteCastleQueenside
+        else:
+            row, kingside, queenside = 0, self.blackCastleKingside, self.blackCastleQueenside
+        base = row * 8
+        if kingside and not occupied & ((1 << (base + 5)) | (1 << (base + 6))) and \
+                not self.attackersTo(base + 5, occupied, them) and not self.attackersTo(base + 6, occupied, them):
+            moves.append(Move((row, 4), (row, 6), board, isCastleMove=True))
+        if queenside and not occupied & ((1 << (base + 1)) | (1 << (base + 2)) | (1 << (base + 3))) and \
+                not self.attackersTo(base + 2, occupied, them) and not self.attackersTo(base + 3, occupied, them):
+            moves.append(Move((row, 4), (row, 2), board, isCastleMove=True))
@@ -2,14 +2,131 @@
 This class is responsible for storing all the information about the current state of a chess game. It is responsible 
 for determining the valid moves at the current state. It will also keep a move log.
 """
+import copy
+import struct
+
+import Evaluation
+import Zobrist
+from AttackTables import SQUARES, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, PAWN_CAPTURES, PAWN_PUSHES, \
+    PAWN_PUSH_SOURCES, RAYS, ROOK_RAYS, BISHOP_RAYS
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# castling rights are kept as a 4-bit mask (the bit order of Zobrist.CASTLE_KEYS)
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLE_RIGHTS = 15
+# CASTLE_RIGHTS_KEPT[r * 8 + c]: the rights that survive a move from or to that square
+CASTLE_RIGHTS_KEPT = [ALL_CASTLE_RIGHTS] * 64
+CASTLE_RIGHTS_KEPT[7 * 8 + 4] = ALL_CASTLE_RIGHTS & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE) # e1
+CASTLE_RIGHTS_KEPT[7 * 8 + 0] = ALL_CASTLE_RIGHTS & ~WHITE_QUEENSIDE # a1
+CASTLE_RIGHTS_KEPT[7 * 8 + 7] = ALL_CASTLE_RIGHTS & ~WHITE_KINGSIDE # h1
+CASTLE_RIGHTS_KEPT[0 * 8 + 4] = ALL_CASTLE_RIGHTS & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE) # e8
+CASTLE_RIGHTS_KEPT[0 * 8 + 0] = ALL_CASTLE_RIGHTS & ~BLACK_QUEENSIDE # a8
+CASTLE_RIGHTS_KEPT[0 * 8 + 7] = ALL_CASTLE_RIGHTS & ~BLACK_KINGSIDE # h8
+
+'''
+returns the (from, to) columns of the rook in a castling move
+'''
+def castleRookColumns(move):
+    if move.endCol - move.startCol == 2: # kingside
+        return move.endCol + 1, move.endCol - 1
+    return move.endCol - 2, move.endCol + 1 # queenside
+
+# compact binary position (encodePosition): the board as 32 bytes of nibbles (row 0 first, two squares per byte, the
+# lower column in the high nibble), flags (bit 0: white to move, bits 1-4: castleRights), the en passant square
+# (r * 8 + c, or NO_EN_PASSANT), the halfmove clock (capped at 255) and the fullmove number; 37 bytes in all
+POSITION = struct.Struct(">32sBBBH")
+NO_EN_PASSANT = 0xFF
+PIECE_CODES = {"--": 0, "wP": 1, "wN": 2, "wB": 3, "wR": 4, "wQ": 5, "wK": 6,
+               "bP": 9, "bN": 10, "bB": 11, "bR": 12, "bQ": 13, "bK": 14}
+# PAIR_BYTES[a][b]: the byte of two neighbouring squares; BYTE_PAIRS[byte]: their pieces (None for unused codes)
+PAIR_BYTES = {a: {b: codeA << 4 | codeB for b, codeB in PIECE_CODES.items()} for a, codeA in PIECE_CODES.items()}
+_codePieces = {code: piece for piece, code in PIECE_CODES.items()}
+BYTE_PAIRS = tuple((_codePieces.get(byte >> 4), _codePieces.get(byte & 15)) for byte in range(256))
+del _codePieces
+
+'''
+parses a FEN string into (board, whiteToMove, castleRights, enPassantPossible, halfmoveClock, fullmoveNumber),
+the arguments of GameState.setPosition
+'''
+def parseFEN(fen):
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError("invalid FEN: " + fen)
+    placement, side, castling, enPassant = fields[:4]
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise ValueError("invalid FEN board: " + placement)
+    board = []
+    for rank in ranks:
+        row = []
+        for ch in rank:
+            if ch.isdigit():
+                row.extend(["--"] * int(ch))
+            elif ch.lower() in 'kqrbnp':
+                row.append(('w' if ch.isupper() else 'b') + ch.upper())
+            else:
+                raise ValueError("invalid FEN piece: " + ch)
+        if len(row) != 8:
+            raise ValueError("invalid FEN rank: " + rank)
+        board.append(row)
+    castleRights = (WHITE_KINGSIDE if 'K' in castling else 0) | (WHITE_QUEENSIDE if 'Q' in castling else 0) | \
+                   (BLACK_KINGSIDE if 'k' in castling else 0) | (BLACK_QUEENSIDE if 'q' in castling else 0)
+    if enPassant == '-':
+        enPassantPossible = ()
+    else:
+        enPassantPossible = (Move.ranksToRows[enPassant[1]], Move.filesToCols[enPassant[0]])
+    halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+    fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+    return board, side == 'w', castleRights, enPassantPossible, halfmoveClock, fullmoveNumber
+
+'''
+the POSITION bytes of a game state (either engine)
+'''
+def encodePosition(gs):
+    nibbles = bytes([PAIR_BYTES[row[c]][row[c + 1]] for row in gs.board for c in (0, 2, 4, 6)])
+    enPassant = gs.enPassantPossible
+    return POSITION.pack(nibbles, (1 if gs.whiteToMove else 0) | gs.castleRights << 1,
+                         enPassant[0] * 8 + enPassant[1] if enPassant else NO_EN_PASSANT,
+                         min(gs.halfmoveClock, 255), gs.fullmoveNumber)
+
+'''
+the inverse of encodePosition: returns the arguments of GameState.setPosition
+'''
+def decodePosition(data):
+    if len(data) != POSITION.size:
+        raise ValueError("a position has %d bytes, not %d" % (POSITION.size, len(data)))
+    nibbles, flags, enPassant, halfmoveClock, fullmoveNumber = POSITION.unpack(data)
+    board = []
+    for r in range(0, 32, 4):
+        row = []
+        for byte in nibbles[r:r + 4]:
+            row.extend(BYTE_PAIRS[byte])
+        board.append(row)
+    if None in board[0] + board[1] + board[2] + board[3] + board[4] + board[5] + board[6] + board[7]:
+        raise ValueError("invalid piece code in position")
+    if flags >> 5 or (enPassant != NO_EN_PASSANT and enPassant >= 64):
+        raise ValueError("invalid position flags")
+    enPassantPossible = divmod(enPassant, 8) if enPassant != NO_EN_PASSANT else ()
+    return board, flags & 1 == 1, flags >> 1, enPassantPossible, halfmoveClock, fullmoveNumber
+
 class GameState():
+
+    engineName = "mailbox"
     
-    def __init__(self):
+    def __init__(self, fen=None):
+        self.initState()
+        if fen is not None:
+            self.loadFEN(fen)
+            return
         #board is an 8x8 2d list, each element has 2 characters.
         #The first character represents the color of the piece, 'b'or 'w'
         #The second character represents the type of piece, 'K', 'Q', 'R', 'B', 'N', 'P'
         #"--" represents an empty space
-        self.board = [
+        board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
             ["--", "--", "--", "--", "--", "--", "--", "--"],
@@ -18,10 +135,13 @@ class GameState():
             ["--", "--", "--", "--", "--", "--", "--", "--"],
             ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
-        self.whiteToMove = True
+        self.setPosition(board, True, ALL_CASTLE_RIGHTS, (), 0, 1)
+
+    '''
+    the state that does not depend on the position: move log, check information and game end flags
+    '''
+    def initState(self):
         self.moveLog = []
-        self.moveFunctions = {'P': self.getPawnMoves, 'R': self.getRookMoves, 'N': self.getKnightMoves,
-                              'K': self.getKingMoves, 'Q': self.getQueenMoves, 'B': self.getBishopMoves}
         
         self.whiteKingLocation = (7, 4)
         self.blackKingLocation = (0, 4)
@@ -29,93 +149,231 @@ class GameState():
         self.inCheck = False
         self.pins = []
         self.checks = []
+        self.attackMap = [[False] * 8 for _ in range(8)] # squares attacked by the opponent
         
         self.checkmate = False 
         self.stalemate = False 
         self.repetition = False
-        
-        self.enPassantPossible = () #coordinates where an en passant capture is possible
+        self.fiftyMoveRule = False
+
+    '''
+    sets up a position (clears the move log): the board and the state a FEN string holds besides it
+    '''
+    def setPosition(self, board, whiteToMove, castleRights, enPassantPossible, halfmoveClock, fullmoveNumber):
+        self.board = board
+        for r, row in enumerate(board):
+            if "wK" in row:
+                self.whiteKingLocation = (r, row.index("wK"))
+            if "bK" in row:
+                self.blackKingLocation = (r, row.index("bK"))
+        self.whiteToMove = whiteToMove
+        self.enPassantPossible = enPassantPossible #coordinates where an en passant capture is possible
+        self.castleRights = castleRights
+        self.halfmoveClock = halfmoveClock # plies since the last capture or pawn move, for the fifty-move rule
+        self.fullmoveNumber = fullmoveNumber
+        self.undoLog = [] # (castleRights, enPassantPossible, halfmoveClock) before every move of the move log
+        self.moveLog = []
+        self.checkmate = False
+        self.stalemate = False
+        self.resetPositionHistory()
+        self.resetEvaluation()
 
-        self.whiteCastleKingside = True
-        self.whiteCastleQueenside = True
-        self.blackCastleKingside = True
-        self.blackCastleQueenside = True
+    '''
+    sets up the position described by a FEN string (clears the move log)
+    '''
+    def loadFEN(self, fen):
+        self.setPosition(*parseFEN(fen))
+
+    '''
+    the position as POSITION bytes (see encodePosition)
+    '''
+    def toBytes(self):
+        return encodePosition(self)
+
+    '''
+    a new game state of the position in data (from toBytes), with an empty move log
+    '''
+    @classmethod
+    def fromBytes(cls, data):
+        gs = cls.__new__(cls)
+        gs.initState()
+        gs.setPosition(*decodePosition(data))
+        return gs
+
+    '''
+    a copy of the current position without the move log, so its moves cannot be undone past this point; the
+    position history is kept, repetitions still count
+    '''
+    def clone(self):
+        gs = copy.copy(self)
+        gs.board = [row[:] for row in self.board]
+        gs.moveLog = []
+        gs.undoLog = []
+        gs.pins = list(self.pins)
+        gs.checks = list(self.checks)
+        gs.keyHistory = list(self.keyHistory)
+        gs.keyCounts = dict(self.keyCounts)
+        return gs
+
+    '''
+    recomputes the evaluation terms that makeMove/undoMove keep up to date (see Evaluation)
+    '''
+    def resetEvaluation(self):
+        self.mgScore, self.egScore, self.phase = Evaluation.computeScores(self)
+
+    '''
+    starts a new position history (zobrist key stack and repetition counts) at the current position
+    '''
+    def resetPositionHistory(self):
+        self.zobristKey = Zobrist.computeKey(self)
+        self.keyHistory = [self.zobristKey]
+        self.keyCounts = {self.zobristKey: 1}
+        self.repetition = False
+        self.fiftyMoveRule = self.halfmoveClock >= 100
+
+    '''
+    records the key of the position reached by a move and updates the draw flags, O(1) per ply
+    '''
+    def pushPositionKey(self, key):
+        self.zobristKey = key
+        self.keyHistory.append(key)
+        count = self.keyCounts.get(key, 0) + 1
+        self.keyCounts[key] = count
+        self.repetition = count >= 3
+        self.fiftyMoveRule = self.halfmoveClock >= 100
+
+    '''
+    drops the key of the position a move is taken back from
+    '''
+    def popPositionKey(self):
+        key = self.keyHistory.pop()
+        count = self.keyCounts[key] - 1
+        if count:
+            self.keyCounts[key] = count
+        else:
+            del self.keyCounts[key]
+        self.zobristKey = self.keyHistory[-1]
+        self.repetition = self.keyCounts[self.zobristKey] >= 3
+        self.fiftyMoveRule = self.halfmoveClock >= 100
+
+    @property
+    def whiteCastleKingside(self):
+        return self.castleRights & WHITE_KINGSIDE != 0
+
+    @property
+    def whiteCastleQueenside(self):
+        return self.castleRights & WHITE_QUEENSIDE != 0
+
+    @property
+    def blackCastleKingside(self):
+        return self.castleRights & BLACK_KINGSIDE != 0
+
+    @property
+    def blackCastleQueenside(self):
+        return self.castleRights & BLACK_QUEENSIDE != 0
+
+    '''
+    returns the FEN string of the current position
+    '''
+    def getFEN(self):
+        rows = []
+        for row in self.board:
+            text = ''
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += piece[1] if piece[0] == 'w' else piece[1].lower()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = ('K' if self.whiteCastleKingside else '') + ('Q' if self.whiteCastleQueenside else '') + \
+                   ('k' if self.blackCastleKingside else '') + ('q' if self.blackCastleQueenside else '')
+        enPassant = '-'
+        if self.enPassantPossible:
+            enPassant = Move.colsToFiles[self.enPassantPossible[1]] + Move.rowsToRanks[self.enPassantPossible[0]]
+        return '/'.join(rows) + (' w ' if self.whiteToMove else ' b ') + (castling or '-') + ' ' + enPassant + \
+               ' %d %d' % (self.halfmoveClock, self.fullmoveNumber)
           
     '''
-    takes a move as a parameter and executes it (excludes castling, en passant, promotion)    
+    takes a move as a parameter and executes it (including castling, en passant, promotion)    
     '''
     def makeMove(self, move):
-        # store castling rights
-        move.castleRightsBefore = {
-            'whiteKingside': self.whiteCastleKingside,
-            'whiteQueenside': self.whiteCastleQueenside,
-            'blackKingside': self.blackCastleKingside,
-            'blackQueenside': self.blackCastleQueenside
-        }
-
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        board = self.board
+        startRow, startCol, endRow, endCol = move.startRow, move.startCol, move.endRow, move.endCol
+        pieceMoved = move.pieceMoved
+        pieceCaptured = move.pieceCaptured
+        start = startRow * 8 + startCol
+        end = endRow * 8 + endCol
+        # everything undoMove can't derive from the move itself
+        self.undoLog.append((self.castleRights, self.enPassantPossible, self.halfmoveClock))
+
+        # take castling rights, en passant file and side to move out of the key, they are added back at the end
+        pieceKeys = Zobrist.PIECE_KEYS
+        key = self.zobristKey ^ Zobrist.WHITE_TO_MOVE_KEY ^ Zobrist.CASTLE_KEYS[self.castleRights] ^ \
+              pieceKeys[pieceMoved][start]
+        if self.enPassantPossible:
+            key ^= Zobrist.enPassantKey(board, self.enPassantPossible, self.whiteToMove)
+
+        # incremental evaluation
+        mg, eg, phase = Evaluation.moveDelta(move)
+        self.mgScore += mg
+        self.egScore += eg
+        self.phase += phase
+
+        board[startRow][startCol] = "--"
+        board[endRow][endCol] = pieceMoved
         self.whiteToMove = not self.whiteToMove
         self.moveLog.append(move)
-        if move.pieceMoved == "wK":
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingLocation = (move.endRow, move.endCol)
+        if pieceMoved == "wK":
+            self.whiteKingLocation = (endRow, endCol)
+        elif pieceMoved == "bK":
+            self.blackKingLocation = (endRow, endCol)
             
         #pawn promotion
         if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + 'Q'
+            board[endRow][endCol] = pieceMoved[0] + move.promotionChoice
+        key ^= pieceKeys[board[endRow][endCol]][end]
             
         #en passant
         if move.isEnPassantMove:
-            self.board[move.startRow][move.endCol] = '--' #capturing the pawn
+            board[startRow][endCol] = '--' #capturing the pawn
+            key ^= pieceKeys[pieceCaptured][startRow * 8 + endCol]
+        elif pieceCaptured != '--':
+            key ^= pieceKeys[pieceCaptured][end]
+
+        # fifty-move rule
+        if pieceMoved[1] == 'P' or pieceCaptured != '--':
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if self.whiteToMove: # black has just moved
+            self.fullmoveNumber += 1
             
         #update enPassantPossible
-        if move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2:
-            self.enPassantPossible = ((move.endRow + move.startRow) // 2, move.startCol) # // for integer division
-            
+        if pieceMoved[1] == 'P' and abs(startRow - endRow) == 2:
+            self.enPassantPossible = ((endRow + startRow) // 2, startCol) # // for integer division
+            key ^= Zobrist.enPassantKey(board, self.enPassantPossible, self.whiteToMove)
         else: 
             self.enPassantPossible = ()  
         
-        # update castling rights 
-        if move.pieceMoved == 'wK':
-            self.whiteCastleKingside = False
-            self.whiteCastleQueenside = False
-        elif move.pieceMoved == 'bK':
-            self.blackCastleKingside = False 
-            self.blackCastleQueenside = False
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7 and move.startCol == 0:
-                self.whiteCastleQueenside = False
-            elif move.startRow == 7 and move.startCol == 7:
-                self.whiteCastleKingside = False
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0 and move.startCol == 0:
-                self.blackCastleQueenside = False
-            elif move.startRow == 0 and move.startCol == 7:
-                self.blackCastleKingside = False
-        if move.pieceCaptured == 'wR':
-            if move.endRow == 7 and move.endCol == 0:
-                self.whiteCastleQueenside = False
-            elif move.endRow == 7 and move.endCol == 7:
-                self.whiteCastleKingside = False
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0 and move.endCol == 0:
-                self.blackCastleQueenside = False
-            elif move.endRow == 0 and move.endCol == 7:
-                self.blackCastleKingside = False
+        # update castling rights: moving from or to a king or rook square loses the rights tied to it
+        self.castleRights &= CASTLE_RIGHTS_KEPT[start] & CASTLE_RIGHTS_KEPT[end]
+        key ^= Zobrist.CASTLE_KEYS[self.castleRights]
 
         # castling 
         if move.isCastleMove:
-            # kingside 
-            if move.endCol - move.startCol == 2:
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]
-                self.board[move.endRow][move.endCol + 1] = '--'
-                move.originalRookPos = (move.endRow, move.endCol + 1)
-            else: # queenside 
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]
-                self.board[move.endRow][move.endCol - 2] = '--'
-                move.originalRookPos = (move.endRow, move.endCol - 2)
+            rookFrom, rookTo = castleRookColumns(move)
+            board[endRow][rookTo] = board[endRow][rookFrom]
+            board[endRow][rookFrom] = '--'
+            rookKeys = pieceKeys[pieceMoved[0] + 'R']
+            key ^= rookKeys[endRow * 8 + rookFrom] ^ rookKeys[endRow * 8 + rookTo]
+
+        self.pushPositionKey(key)
         
     '''
     undo the last move made
@@ -123,9 +381,15 @@ class GameState():
     def undoMove(self):
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            board = self.board
+            board[move.startRow][move.startCol] = move.pieceMoved
+            board[move.endRow][move.endCol] = move.pieceCaptured
             self.whiteToMove = not self.whiteToMove  # Switch turn back
+
+            mg, eg, phase = Evaluation.moveDelta(move)
+            self.mgScore -= mg
+            self.egScore -= eg
+            self.phase -= phase
             
             # Restore king position if necessary
             if move.pieceMoved == "wK":
@@ -136,43 +400,27 @@ class GameState():
             # **Undo en passant move**
             if move.isEnPassantMove:
                 # Reset the pawn that was captured (appears back on the correct row)
-                capturedPawnRow = move.endRow + (1 if move.pieceMoved[0] == 'w' else -1)
-                self.board[capturedPawnRow][move.endCol] = move.pieceCaptured
-                self.board[move.endRow][move.endCol] = "--"  # Clear the en passant capture square
-                self.enPassantPossible = (move.endRow, move.endCol)  # Restore en passant target square
-
-            # **Undo a two-square pawn advance**
-            elif move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2:
-                self.enPassantPossible = (move.endRow, move.endCol)  # Restore en passant square properly
-            else:
-                self.enPassantPossible = None  # Otherwise, clear en passant
+                board[move.endRow][move.endCol] = "--"  # Clear the en passant capture square
+                board[move.startRow][move.endCol] = move.pieceCaptured
 
-            # restore castling rights 
+            # restore castling rights, en passant square, clocks and the position key
+            self.castleRights, self.enPassantPossible, self.halfmoveClock = self.undoLog.pop()
+            if not self.whiteToMove: # the move taken back was black's
+                self.fullmoveNumber -= 1
+            self.popPositionKey()
 
-            self.whiteCastleKingside = move.castleRightsBefore['whiteKingside']
-            self.whiteCastleQueenside = move.castleRightsBefore['whiteQueenside']
-            self.blackCastleKingside = move.castleRightsBefore['blackKingside']
-            self.blackCastleQueenside = move.castleRightsBefore['blackQueenside']
-            # Undo castling move
+            # Undo castling move: move the rook back to its original position
             if move.isCastleMove:
-                # Move king back
-                self.board[move.startRow][move.startCol] = move.pieceMoved
-                # Move rook back to original position
-                rookRow, rookCol = move.originalRookPos
-                if move.endCol - move.startCol == 2:  # Kingside
-                    self.board[rookRow][rookCol] = self.board[move.endRow][move.endCol - 1]
-                    self.board[move.endRow][move.endCol - 1] = "--"
-                else:  # Queenside
-                    self.board[rookRow][rookCol] = self.board[move.endRow][move.endCol + 1]
-                    self.board[move.endRow][move.endCol + 1] = "--"
-                # Clear king's new position
-                self.board[move.endRow][move.endCol] = "--"        
+                rookFrom, rookTo = castleRookColumns(move)
+                board[move.endRow][rookFrom] = board[move.endRow][rookTo]
+                board[move.endRow][rookTo] = "--"
     '''
     All moves considering checks
     '''   
     def getValidMoves(self):
         moves = []
         self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.attackMap = self.getAttackMap()
         if self.whiteToMove:
             kingRow = self.whiteKingLocation[0]
             kingCol = self.whiteKingLocation[1]
@@ -180,16 +428,10 @@ class GameState():
             kingRow = self.blackKingLocation[0]
             kingCol = self.blackKingLocation[1]  
         if self.inCheck:
-            moves = self.getAllPossibleMoves()
-            # For each move, check if it leaves the king in check
-            for i in range(len(moves)-1, -1, -1):
-                self.makeMove(moves[i])
-                self.whiteToMove = not self.whiteToMove # Switch turn to check for opponent's check 
-                inCheck, _, _ = self.checkForPinsAndChecks()
-                self.whiteToMove = not self.whiteToMove # Switch back 
-                self.undoMove()
-                if inCheck:
-                    moves.remove(moves[i])
+            if len(self.checks) == 1:
+                self.getEvasionMoves(kingRow, kingCol, moves)
+            else: # double check, only the king can move
+                self.getKingMoves(kingRow, kingCol, moves)
         else:
             moves = self.getAllPossibleMoves()
             
@@ -204,6 +446,85 @@ class GameState():
 
         return moves
         
+    '''
+    the moves out of a single check: king moves, captures of the checking piece and, for a slider, moves onto the
+    squares between it and the king. A pinned piece can never do either, so only unpinned pieces are looked at
+    '''
+    def getEvasionMoves(self, kingRow, kingCol, moves):
+        self.getKingMoves(kingRow, kingCol, moves)
+        checkRow, checkCol, checkDirRow, checkDirCol = self.checks[0]
+        targets = [SQUARES[checkRow][checkCol]]
+        if self.board[checkRow][checkCol][1] != 'N':
+            for d, ray in RAYS[kingRow][kingCol]:
+                if d == (checkDirRow, checkDirCol):
+                    for square in ray:
+                        if square == targets[0]:
+                            break
+                        targets.append(square)
+                    break
+        pinned = {(pin[0], pin[1]) for pin in self.pins}
+        for endRow, endCol in targets:
+            self.getMovesTo(endRow, endCol, pinned, moves)
+        self.getEnPassantEvasions(checkRow, checkCol, targets, pinned, moves)
+
+    '''
+    moves of the side to move's unpinned pieces, other than the king, to (r, c): captures if an enemy piece stands
+    there, pushes of pawns if it is empty
+    '''
+    def getMovesTo(self, r, c, pinned, moves):
+        board = self.board
+        allyColor, enemyColor = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        end = SQUARES[r][c]
+        knight = allyColor + 'N'
+        for start in KNIGHT_TARGETS[r][c]:
+            if board[start[0]][start[1]] == knight and start not in pinned:
+                moves.append(Move(start, end, board))
+        # the first piece on every ray from (r, c) reaches it if it slides that way
+        for j, (_, ray) in enumerate(RAYS[r][c]):
+            for start in ray:
+                piece = board[start[0]][start[1]]
+                if piece == "--":
+                    continue
+                if piece[0] == allyColor and start not in pinned and \
+                        (piece[1] == 'Q' or piece[1] == ('R' if j < 4 else 'B')):
+                    moves.append(Move(start, end, board))
+                break
+        pawn = allyColor + 'P'
+        if board[r][c] != "--":
+            # our pawns capture on (r, c) from the squares an enemy pawn on (r, c) would attack
+            for start in PAWN_ATTACKS[enemyColor][r][c]:
+                if board[start[0]][start[1]] == pawn and start not in pinned:
+                    self.addPawnMove(Move(start, end, board), moves)
+            return
+        sources = PAWN_PUSH_SOURCES[allyColor][r][c]
+        if not sources:
+            return
+        startRow = sources[0][0]
+        if board[startRow][c] == pawn:
+            if sources[0] not in pinned:
+                self.addPawnMove(Move(sources[0], end, board), moves)
+        elif len(sources) == 2 and board[startRow][c] == "--" and board[sources[1][0]][c] == pawn and \
+                sources[1] not in pinned:
+            moves.append(Move(sources[1], end, board))
+
+    '''
+    en passant out of check: it takes a checking pawn that has just made a double step, or lands on a blocking square
+    '''
+    def getEnPassantEvasions(self, checkRow, checkCol, targets, pinned, moves):
+        if not self.enPassantPossible:
+            return
+        epRow, epCol = self.enPassantPossible
+        capturedRow = epRow + (1 if self.whiteToMove else -1)
+        if (capturedRow, epCol) != (checkRow, checkCol) and (epRow, epCol) not in targets:
+            return
+        board = self.board
+        allyColor, enemyColor = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        pawn = allyColor + 'P'
+        for start in PAWN_ATTACKS[enemyColor][epRow][epCol]:
+            if board[start[0]][start[1]] == pawn and start not in pinned and \
+                    not self.enPassantExposesKing(start[0], start[1], epCol):
+                moves.append(Move(start, (epRow, epCol), board, isEnPassantMove=True))
+
     '''
     returns if the player is in check, a list of pins, and a list of checks
     '''  
@@ -211,6 +532,7 @@ class GameState():
         pins = []
         checks = []
         inCheck = False
+        board = self.board
         if self.whiteToMove:
             enemyColor = "b"
             allyColor = "w"
@@ -220,46 +542,92 @@ class GameState():
             allyColor = "b"
             startRow, startCol = self.blackKingLocation
 
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for j, d in enumerate(directions):
+        for j, (d, ray) in enumerate(RAYS[startRow][startCol]):
             possiblePin = ()
-            for i in range(1, 8):
-                endRow = startRow + d[0] * i
-                endCol = startCol + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == allyColor and endPiece[1] != 'K':
-                        if possiblePin == ():
-                            possiblePin = (endRow, endCol, d[0], d[1])
-                        else:
+            for i, (endRow, endCol) in enumerate(ray, 1):
+                endPiece = board[endRow][endCol]
+                if endPiece[0] == allyColor and endPiece[1] != 'K':
+                    if possiblePin == ():
+                        possiblePin = (endRow, endCol, d[0], d[1])
+                    else:
+                        break
+                elif endPiece[0] == enemyColor:
+                    pieceType = endPiece[1]
+                    #1) orthogonal rook
+                    #2) diagonal bishop
+                    #3) pawn
+                    #4) every direction queen
+                    #5) king
+                    if (0 <= j <= 3 and pieceType == "R") or \
+                       (4 <= j <= 7 and pieceType == "B") or \
+                       (pieceType == "Q") or \
+                       (i == 1 and pieceType == "P" and ((enemyColor == "w" and 6 <= j <= 7) or
+                                                        (enemyColor == "b" and 4 <= j <= 5))) or \
+                       (i == 1 and pieceType == "K"):
+                        if possiblePin == ():  # No blocking piece
+                            inCheck = True
+                            checks.append((endRow, endCol, d[0], d[1]))
                             break
-                    elif endPiece[0] == enemyColor:
-                        pieceType = endPiece[1]
-                        #1) orthogonal rook
-                        #2) diagonal bishop
-                        #3) pawn
-                        #4) every direction queen
-                        #5) king
-                        if (0 <= j <= 3 and pieceType == "R") or \
-                           (4 <= j <= 7 and pieceType == "B") or \
-                           (pieceType == "Q") or \
-                           (i == 1 and pieceType == "P" and ((enemyColor == "w" and 6 <= j <= 7) or
-                                                            (enemyColor == "b" and 4 <= j <= 5))) or \
-                           (i == 1 and pieceType == "K"):
-                            if possiblePin == ():  # No blocking piece
-                                inCheck = True
-                                checks.append((endRow, endCol, d[0], d[1]))
-                                break
-                            else:  # Piece is pinned
-                                pins.append(possiblePin)
-                                break
-                        else:
+                        else:  # Piece is pinned
+                            pins.append(possiblePin)
                             break
-                else:
-                    break
+                    else:
+                        break
+
+        # knight checks
+        enemyKnight = enemyColor + 'N'
+        for endRow, endCol in KNIGHT_TARGETS[startRow][startCol]:
+            if board[endRow][endCol] == enemyKnight:
+                inCheck = True
+                checks.append((endRow, endCol, endRow - startRow, endCol - startCol))
         return inCheck, pins, checks
         
         
+    '''
+    returns the attack map of the opponent: attacked[r][c] is True for every square one of its pieces attacks. The
+    king of the side to move does not block, so it cannot step back along the ray of a checking slider
+    '''
+    def getAttackMap(self):
+        board = self.board
+        attacked = [[False] * 8 for _ in range(8)]
+        if self.whiteToMove:
+            enemyColor = 'b'
+            ownKing = 'wK'
+        else:
+            enemyColor = 'w'
+            ownKing = 'bK'
+        pawnAttacks = PAWN_ATTACKS[enemyColor]
+        for r in range(8):
+            row = board[r]
+            for c in range(8):
+                piece = row[c]
+                if piece[0] != enemyColor:
+                    continue
+                pieceType = piece[1]
+                if pieceType == 'P':
+                    targets = pawnAttacks[r][c]
+                elif pieceType == 'N':
+                    targets = KNIGHT_TARGETS[r][c]
+                elif pieceType == 'K':
+                    targets = KING_TARGETS[r][c]
+                else:
+                    if pieceType == 'R':
+                        rays = ROOK_RAYS[r][c]
+                    elif pieceType == 'B':
+                        rays = BISHOP_RAYS[r][c]
+                    else:
+                        rays = RAYS[r][c]
+                    for _, ray in rays:
+                        for endRow, endCol in ray:
+                            attacked[endRow][endCol] = True
+                            endPiece = board[endRow][endCol]
+                            if endPiece != "--" and endPiece != ownKing:
+                                break
+                    continue
+                for endRow, endCol in targets:
+                    attacked[endRow][endCol] = True
+        return attacked
+
     '''
     All moves without considering checks
     '''
@@ -270,7 +638,7 @@ class GameState():
                 turn = self.board[r][c][0]
                 if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
                     piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r, c, moves)
+                    self.moveFunctions[piece](self, r, c, moves)
         return moves
                         
     def getPawnMoves(self, r, c, moves):
@@ -283,62 +651,66 @@ class GameState():
                 self.pins.remove(self.pins[i])
                 break
         
-        if(self.whiteToMove):
-            if self.board[r-1][c] == "--":
-                if not piecePinned or pinDirection == (-1, 0):
-                    moves.append(Move((r, c), (r-1, c), self.board))
-                    if r == 6 and self.board[r-2][c] == "--":
-                        moves.append(Move((r, c), (r-2, c), self.board))
-            # Capture moves
-            for dc in [-1, 1]:  # Left (-1) and right (+1) capture
-                if 0 <= c + dc <= 7:  # Ensure within board
-                    if self.board[r-1][c+dc][0] == 'b':  # Capturing an opponent's piece
-                        if not piecePinned or pinDirection == (-1, dc):
-                            moves.append(Move((r, c), (r-1, c+dc), self.board))
-                
+        if self.whiteToMove:
+            allyColor, enemyColor = 'w', 'b'
+        else:
+            allyColor, enemyColor = 'b', 'w'
+        board = self.board
+        start = SQUARES[r][c]
+
+        pushes = PAWN_PUSHES[allyColor][r][c]
+        if pushes and board[pushes[0][0]][pushes[0][1]] == "--":
+            if not piecePinned or pinDirection[1] == 0: # pinned along the file it can still push
+                self.addPawnMove(Move(start, pushes[0], board), moves)
+                if len(pushes) == 2 and board[pushes[1][0]][pushes[1][1]] == "--":
+                    moves.append(Move(start, pushes[1], board))
+        # Capture moves
+        for d, end in PAWN_CAPTURES[allyColor][r][c]:
+            if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
+                if board[end[0]][end[1]][0] == enemyColor:  # Capturing an opponent's piece
+                    self.addPawnMove(Move(start, end, board), moves)
                 # **En Passant**
-                    if (r-1, c + dc) == self.enPassantPossible:  # Check if the square is en passant target
-                        if not piecePinned or pinDirection == (-1, dc):
-                            moves.append(Move((r, c), (r-1, c+dc), self.board, isEnPassantMove=True))
+                elif end == self.enPassantPossible and not self.enPassantExposesKing(r, c, end[1]):
+                    moves.append(Move(start, end, board, isEnPassantMove=True))
+
+    '''
+    adds a pawn move, or all four promotion moves if the pawn reaches the last rank
+    '''
+    def addPawnMove(self, move, moves):
+        if move.isPawnPromotion:
+            for piece in Move.promotionPieces:
+                moves.append(Move((move.startRow, move.startCol), (move.endRow, move.endCol), self.board,
+                                  promotionChoice=piece))
         else:
-            if self.board[r+1][c] == "--":
-                if not piecePinned or pinDirection == (1, 0):
-                    moves.append(Move((r, c), (r+1, c), self.board))
-                    if r == 1 and self.board[r+2][c] == "--":
-                        moves.append(Move((r, c), (r+2, c), self.board))
-            # Capture moves
-            for dc in [-1, 1]:  # Left (-1) and right (+1) capture
-                if 0 <= c + dc <= 7:  # Ensure within board
-                    if self.board[r+1][c+dc][0] == 'w':  # Capturing an opponent's piece
-                        if not piecePinned or pinDirection == (1, dc):
-                            moves.append(Move((r, c), (r+1, c+dc), self.board))
-                
-                    # **En Passant**
-                    if (r+1, c + dc) == self.enPassantPossible:  # Check if the square is en passant target
-                        if not piecePinned or pinDirection == (1, dc):
-                            moves.append(Move((r, c), (r+1, c+dc), self.board, isEnPassantMove=True))
+            moves.append(move)
+
+    '''
+    en passant removes two pawns from the same row at once, which can expose the king to a rook or queen on that
+    row even though neither pawn is pinned on its own
+    '''
+    def enPassantExposesKing(self, r, c, capturedCol):
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        if kingRow != r:
+            return False
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        board = self.board
+        _, ray = ROOK_RAYS[kingRow][kingCol][3 if capturedCol > kingCol else 1] # along the row, towards the pawns
+        for row, col in ray:
+            if col != c and col != capturedCol:
+                piece = board[row][col]
+                if piece != "--":
+                    return piece[0] == enemyColor and piece[1] in ('R', 'Q')
+        return False
 
     def getKingMoves(self, r, c, moves):
-        rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1) 
-        colMoves = (-1, 0, 1, -1, 1, -1, 0, 1)
         allyColor = 'w' if self.whiteToMove else 'b'
-        for i in range(8):
-            endRow = r + rowMoves[i]
-            endCol = c + colMoves[i]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    if allyColor == 'w':
-                        self.whiteKingLocation = (endRow, endCol)
-                    else:
-                        self.blackKingLocation = (endRow, endCol)
-                    inCheck, _, _ = self.checkForPinsAndChecks()
-                    if not inCheck:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                    if allyColor == 'w':
-                        self.whiteKingLocation = (r, c)
-                    else:
-                        self.blackKingLocation = (r, c)   
+        board = self.board
+        attacked = self.attackMap
+        start = SQUARES[r][c]
+        for end in KING_TARGETS[r][c]:
+            endRow, endCol = end
+            if board[endRow][endCol][0] != allyColor and not attacked[endRow][endCol]:
+                moves.append(Move(start, end, board))
 
          # Castling moves (only if not in check)
         if not self.inCheck:
@@ -347,7 +719,7 @@ class GameState():
                 if self.whiteCastleKingside and \
                     self.board[7][5] == "--" and self.board[7][6] == "--":
                     # Check if squares f1/g1 are safe
-                    if not self.squareUnderAttack(7, 5) and not self.squareUnderAttack(7, 6):
+                    if not attacked[7][5] and not attacked[7][6]:
                         moves.append(Move((7, 4), (7, 6), self.board, isCastleMove=True))
             
                 # White queenside (O-O-O)
@@ -355,14 +727,14 @@ class GameState():
                     self.board[7][1] == "--" and  # b1 must be empty (but can be under attack)
                     self.board[7][2] == "--" and  # c1 must be empty AND safe
                     self.board[7][3] == "--" and  # d1 must be empty AND safe
-                    not self.squareUnderAttack(7, 2) and  # c1 not attacked
-                    not self.squareUnderAttack(7, 3)):    # d1 not attacked
+                    not attacked[7][2] and  # c1 not attacked
+                    not attacked[7][3]):    # d1 not attacked
                     moves.append(Move((7, 4), (7, 2), self.board, isCastleMove=True))   
             else:
                 # Black kingside (O-O)
                 if self.blackCastleKingside and \
                     self.board[0][5] == "--" and self.board[0][6] == "--":
-                    if not self.squareUnderAttack(0, 5) and not self.squareUnderAttack(0, 6):
+                    if not attacked[0][5] and not attacked[0][6]:
                         moves.append(Move((0, 4), (0, 6), self.board, isCastleMove=True))
             
                 # Black queenside (O-O-O)
@@ -370,8 +742,8 @@ class GameState():
                     self.board[0][1] == "--" and  # b8 must be empty (but can be under attack)
                     self.board[0][2] == "--" and  # c8 must be empty AND safe
                     self.board[0][3] == "--" and  # d8 must be empty AND safe
-                    not self.squareUnderAttack(0, 2) and  # c8 not attacked
-                    not self.squareUnderAttack(0, 3)):    # d8 not attacked
+                    not attacked[0][2] and  # c8 not attacked
+                    not attacked[0][3]):    # d8 not attacked
                     moves.append(Move((0, 4), (0, 2), self.board, isCastleMove=True))  
 
     def getRookMoves(self, r, c, moves):
@@ -385,25 +757,21 @@ class GameState():
                     self.pins.remove(self.pins[i])
                 break
                
-        directions = ((1, 0), (-1, 0), (0, 1), (0, -1))
-        enemyColor = "b" if self.whiteToMove else "w" 
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--":
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor:
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break
-                        else:
-                            break
-                else:
-                    break          
-                   
+        enemyColor = "b" if self.whiteToMove else "w"
+        board = self.board
+        start = SQUARES[r][c]
+        for d, ray in ROOK_RAYS[r][c]:
+            if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
+                for end in ray:
+                    endPiece = board[end[0]][end[1]]
+                    if endPiece == "--":
+                        moves.append(Move(start, end, board))
+                    elif endPiece[0] == enemyColor:
+                        moves.append(Move(start, end, board))
+                        break
+                    else:
+                        break
+
     def getBishopMoves(self, r, c, moves):
         piecePinned = False
         pinDirection = ()
@@ -414,26 +782,21 @@ class GameState():
                 self.pins.remove(self.pins[i])
                 break
 
-        directions = [(-1, -1), (-1, 1), (1, 1), (1, -1)]  # Corrected directions
         enemyColor = "b" if self.whiteToMove else "w"
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:  # Inside board
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--":
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor:  # Capture enemy piece
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break
-                        else:  # Blocked by ally piece
-                            break
-                else:  # Out of bounds
-                    break
-  
-    
+        board = self.board
+        start = SQUARES[r][c]
+        for d, ray in BISHOP_RAYS[r][c]:
+            if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
+                for end in ray:
+                    endPiece = board[end[0]][end[1]]
+                    if endPiece == "--":
+                        moves.append(Move(start, end, board))
+                    elif endPiece[0] == enemyColor:  # Capture enemy piece
+                        moves.append(Move(start, end, board))
+                        break
+                    else:  # Blocked by ally piece
+                        break
+
     def getQueenMoves(self, r, c, moves):
         self.getRookMoves(r, c, moves)
         self.getBishopMoves(r, c, moves)
@@ -446,73 +809,104 @@ class GameState():
                 self.pins.remove(self.pins[i])
                 break
           
-        directions = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)] #array of tupels (row, column)
+        if piecePinned:
+            return
         allyColor = "w" if self.whiteToMove else "b"
-        for d in directions:
-            endRow = r + d[0]
-            endCol = c + d[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if not piecePinned:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != allyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
+        board = self.board
+        start = SQUARES[r][c]
+        for end in KNIGHT_TARGETS[r][c]:
+            if board[end[0]][end[1]][0] != allyColor:
+                moves.append(Move(start, end, board))
+
+    # move generator of each piece type, called as moveFunctions[piece](self, r, c, moves)
+    moveFunctions = {'P': getPawnMoves, 'R': getRookMoves, 'N': getKnightMoves,
+                     'K': getKingMoves, 'Q': getQueenMoves, 'B': getBishopMoves}
 
     '''
     Checks if a square is currently under attack
     '''
     def squareUnderAttack(self, r, c):
-        enemyColor = 'b' if self.whiteToMove else 'w'
+        board = self.board
+        allyColor, enemyColor = ('w', 'b') if self.whiteToMove else ('b', 'w')
     
         # Check knight attacks
-        knight_moves = [(-2,-1), (-2,1), (-1,-2), (-1,2),
-                        (1,-2), (1,2), (2,-1), (2,1)]
-        for m in knight_moves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if self.board[endRow][endCol] == enemyColor + 'N':
-                    return True
+        enemyKnight = enemyColor + 'N'
+        for endRow, endCol in KNIGHT_TARGETS[r][c]:
+            if board[endRow][endCol] == enemyKnight:
+                return True
     
         # Check straight lines (queen/rook)
-        directions = [(-1,0), (0,-1), (1,0), (0,1)]
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    piece = self.board[endRow][endCol]
-                    if piece[0] == enemyColor:
-                        if piece[1] in ['Q', 'R'] or (i == 1 and piece[1] == 'K'):
-                            return True
-                        break  # Blocked by any piece
-                    elif piece != "--":
-                        break
+        for _, ray in ROOK_RAYS[r][c]:
+            for i, (endRow, endCol) in enumerate(ray, 1):
+                piece = board[endRow][endCol]
+                if piece[0] == enemyColor:
+                    if piece[1] in ('Q', 'R') or (i == 1 and piece[1] == 'K'):
+                        return True
+                    break  # Blocked by any piece
+                elif piece != "--":
+                    break
     
         # Check diagonals (queen/bishop)
-        directions = [(-1,-1), (-1,1), (1,-1), (1,1)]
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    piece = self.board[endRow][endCol]
-                    if piece[0] == enemyColor:
-                        if piece[1] in ['Q', 'B'] or (i == 1 and piece[1] == 'K'):
-                            return True
-                        break
-                    elif piece != "--":
-                        break
+        for _, ray in BISHOP_RAYS[r][c]:
+            for i, (endRow, endCol) in enumerate(ray, 1):
+                piece = board[endRow][endCol]
+                if piece[0] == enemyColor:
+                    if piece[1] in ('Q', 'B') or (i == 1 and piece[1] == 'K'):
+                        return True
+                    break
+                elif piece != "--":
+                    break
     
-        # Check pawn attacks
-        pawn_dir = -1 if self.whiteToMove else 1
-        for dc in [-1, 1]:
-            endRow = r + pawn_dir
-            endCol = c + dc
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if self.board[endRow][endCol] == enemyColor + 'P':
-                    return True
+        # Check pawn attacks: an enemy pawn attacks (r, c) from the squares our own pawn would attack from (r, c)
+        enemyPawn = enemyColor + 'P'
+        for endRow, endCol in PAWN_ATTACKS[allyColor][r][c]:
+            if board[endRow][endCol] == enemyPawn:
+                return True
     
         return False            
+
+    '''
+    returns the (row, col) of the least valuable piece of `color` that attacks (r, c), or None. Squares in `removed`
+    count as empty, so pieces lined up behind an attacker that has already captured on (r, c) are found as well
+    '''
+    def getSmallestAttacker(self, r, c, color, removed=()):
+        board = self.board
+        otherColor = 'b' if color == 'w' else 'w'
+
+        # pawns of `color` attack (r, c) from the squares a pawn of the other color would attack from (r, c)
+        pawn = color + 'P'
+        for sq in PAWN_ATTACKS[otherColor][r][c]:
+            if board[sq[0]][sq[1]] == pawn and sq not in removed:
+                return sq
+
+        knight = color + 'N'
+        for sq in KNIGHT_TARGETS[r][c]:
+            if board[sq[0]][sq[1]] == knight and sq not in removed:
+                return sq
+
+        # the first piece on every ray, the cheapest bishop, rook or queen among them
+        best = None
+        bestType = 'K'
+        for j, (_, ray) in enumerate(RAYS[r][c]):
+            for sq in ray:
+                piece = board[sq[0]][sq[1]]
+                if piece == "--" or sq in removed:
+                    continue
+                if piece[0] == color:
+                    pieceType = piece[1]
+                    if (pieceType == 'B' and j >= 4) or (pieceType == 'R' and j < 4) or pieceType == 'Q':
+                        if best is None or "BRQ".index(pieceType) < "BRQ".index(bestType):
+                            best = sq
+                            bestType = pieceType
+                break
+        if best is not None:
+            return best
+
+        king = color + 'K'
+        for sq in KING_TARGETS[r][c]:
+            if board[sq[0]][sq[1]] == king and sq not in removed:
+                return sq
+        return None
  
 class Move():
     
@@ -524,26 +918,35 @@ class Move():
                    "e": 4, "f": 5, "g": 6, "h": 7,}
     colsToFiles = {v: k for k, v in filesToCols.items()}
         
-    def __init__(self, startSq, endSq, board, isEnPassantMove = False, isCastleMove = False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
+    promotionPieces = ('Q', 'R', 'B', 'N')
+    promotionIDs = {'Q': 0, 'R': 10000, 'B': 20000, 'N': 30000}
+
+    # no per-move __dict__: move generation creates thousands of these per node
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'pieceCaptured', 'isPawnPromotion',
+                 'promotionChoice', 'isEnPassantMove', 'isCastleMove', 'moveID')
         
-        # pawn promotoion
-        self.isPawnPromotion = (self.pieceMoved == "wP" and self.endRow == 0) or (self.pieceMoved == "bP" and self.endRow == 7)
+    def __init__(self, startSq, endSq, board, isEnPassantMove = False, isCastleMove = False, promotionChoice = 'Q'):
+        self.startRow = startRow = startSq[0]
+        self.startCol = startCol = startSq[1]
+        self.endRow = endRow = endSq[0]
+        self.endCol = endCol = endSq[1]
+        self.pieceMoved = pieceMoved = board[startRow][startCol]
         
         # en passant
         self.isEnPassantMove = isEnPassantMove
-        if self.isEnPassantMove:
-            self.pieceCaptured = 'bP' if self.pieceMoved == 'wP' else 'wP'
+        if isEnPassantMove:
+            self.pieceCaptured = 'bP' if pieceMoved == 'wP' else 'wP'
+        else:
+            self.pieceCaptured = board[endRow][endCol]
         
         self.isCastleMove = isCastleMove
-        self.castleRightsBefore = None
+        self.promotionChoice = promotionChoice
+        self.moveID = startRow * 1000 + startCol * 100 + endRow * 10 + endCol
 
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        # pawn promotoion
+        self.isPawnPromotion = pieceMoved[1] == 'P' and (endRow == 0 or endRow == 7)
+        if self.isPawnPromotion:
+            self.moveID += self.promotionIDs[promotionChoice]
                 
     '''
     Overriding the equals method
@@ -566,8 +969,29 @@ class Move():
         if self.pieceCaptured != '--':
             text += 'x'
         text += self.getRankFile(self.endRow, self.endCol)
+        if self.isPawnPromotion:
+            text += '=' + self.promotionChoice
         return text;
 
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
     
+
+
+'''
+the game state class of a board engine:
+"mailbox" (GameState, 8x8 list of strings) or "bitboard" (BitboardEngine.BitboardGameState)
+'''
+def gameStateClass(engine="mailbox"):
+    if engine == "mailbox":
+        return GameState
+    if engine == "bitboard":
+        import BitboardEngine
+        return BitboardEngine.BitboardGameState
+    raise ValueError("unknown board engine: " + engine)
+
+'''
+creates a game state with the selected board engine (see gameStateClass)
+'''
+def createGameState(fen=None, engine="mailbox"):
+    return gameStateClass(engine)(fen)
@@ -1,44 +1,107 @@
 """
 This is the main driver file. It is be responsible for handling user input and displaying the current GameState object.   
 """
+import time
+from collections import OrderedDict
 import pygame as p
-import ChessEngine, AI
+import ChessEngine, AI, Bitbases
 
-WIDTH = HEIGHT = 512 #400 is another good option
+WIDTH = HEIGHT = 512 #400 is another good option (initial window size, the window can be resized)
 DIMENSION = 8 
 SQ_SIZE = HEIGHT // DIMENSION
+MIN_SQ_SIZE = 24 # the board does not get smaller than this, however small the window is
+BOARD_X = BOARD_Y = 0 # top left corner of the board in the window (the board is centered)
 MAX_FPS = 15
-IMAGES = {}
+PIECES = ['wP','wK','wN', 'wB','wQ','wR','bP','bK','bB','bR', 'bN', 'bQ']
+SOURCE_IMAGES = {} # the decoded PNGs at their own size
+IMAGES = {} # the piece sprites at the current SQ_SIZE
+ATLAS_CACHE = OrderedDict() # square size: (atlas surface, {piece: sprite}), least recently used first
+ATLAS_CACHE_SIZE = 4
 COLORS = [(255, 255, 255), (186, 186, 180)] # colors for white and black
+MARGIN_COLOR = (64, 64, 64) # around the board when the window is not square
+BOARD_ENGINE = "mailbox" # "mailbox" (8x8 list) or "bitboard" (faster move generation)
+HUD_KEY = p.K_h # shows/hides the performance overlay
+HUD_INTERVAL = 0.25 # seconds between updates of the overlay text
 
 '''
-Initialize a global dictionaty of images. Called exactly once in main.
+Decodes the piece images, exactly once; the display mode must be set. The sprites for a square size come from
+spriteAtlas.
 '''
 def loadImages():
-    pieces = ['wP','wK','wN', 'wB','wQ','wR','bP','bK','bB','bR', 'bN', 'bQ']
-    for piece in pieces:    
-        IMAGES[piece] = p.transform.scale(p.image.load("images/" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+    for piece in PIECES:
+        if piece not in SOURCE_IMAGES:
+            SOURCE_IMAGES[piece] = p.image.load("images/" + piece + ".png").convert_alpha()
+    IMAGES.clear()
+    IMAGES.update(spriteAtlas(SQ_SIZE))
     #we can now access an image by saying 'IMAGES['wP']'
 
+'''
+the piece sprites at one square size: subsurfaces of one atlas surface with all 12 pieces scaled to that size.
+The atlases of the last ATLAS_CACHE_SIZE sizes are kept, so going back to a size does not scale again.
+'''
+def spriteAtlas(size):
+    if size in ATLAS_CACHE:
+        ATLAS_CACHE.move_to_end(size)
+        return ATLAS_CACHE[size][1]
+    atlas = p.Surface((size * len(PIECES), size), p.SRCALPHA)
+    sprites = {}
+    for i, piece in enumerate(PIECES):
+        area = p.Rect(i * size, 0, size, size)
+        atlas.blit(p.transform.smoothscale(SOURCE_IMAGES[piece], (size, size)), area)
+        sprites[piece] = atlas.subsurface(area)
+    ATLAS_CACHE[size] = (atlas, sprites)
+    while len(ATLAS_CACHE) > ATLAS_CACHE_SIZE:
+        ATLAS_CACHE.popitem(last=False)
+    return sprites
+
+'''
+fits the board into a window of width x height: sets WIDTH, HEIGHT, SQ_SIZE, the board position and the sprites.
+Returns True if the square size changed
+'''
+def layoutBoard(width, height):
+    global WIDTH, HEIGHT, SQ_SIZE, BOARD_X, BOARD_Y
+    size = max(min(width, height) // DIMENSION, MIN_SQ_SIZE)
+    changed = size != SQ_SIZE
+    WIDTH, HEIGHT, SQ_SIZE = width, height, size
+    BOARD_X = max((width - DIMENSION * size) // 2, 0)
+    BOARD_Y = max((height - DIMENSION * size) // 2, 0)
+    if changed:
+        IMAGES.clear()
+        IMAGES.update(spriteAtlas(size))
+    return changed
+
+'''
+the square (row, col) at a window position, None outside the board
+'''
+def squareAt(x, y):
+    col = (x - BOARD_X) // SQ_SIZE
+    row = (y - BOARD_Y) // SQ_SIZE
+    if 0 <= row < DIMENSION and 0 <= col < DIMENSION:
+        return row, col
+    return None
+
 '''
 The main driver of the code. It handles user input and updating the graphics
 '''
 def main():
     p.init()
-    screen = p.display.set_mode((WIDTH, HEIGHT))
+    screen = p.display.set_mode((WIDTH, HEIGHT), p.RESIZABLE)
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
+    loadImages()
     
     p.display.set_caption("Chess Engine")
-    p.display.set_icon(p.image.load("images/bP.png"))
+    p.display.set_icon(SOURCE_IMAGES['bP'])
     
-    gs = ChessEngine.GameState()
+    gs = ChessEngine.createGameState(engine=BOARD_ENGINE)
     validMoves = gs.getValidMoves()
     moveMade = False #flag variable for when a move is made  
     animate = False #flag variable for when we should animate
     messagePrinted = False # Flag to ensure message is only sent once
+    knownResult = None # (result, distance to mate) of the position if the endgame bitbases cover it
 
-    loadImages()
+    renderer = BoardRenderer()
+    hud = PerformanceHUD()
     running = True
     sqSelected = () #keeps track of the last click of the user (tupel: row, col)
     playerClicks = [] #two tuples
@@ -51,10 +114,18 @@ def main():
     playerWhite = 0
     playerBlack = 1
     
-    # depth of the AI (0 is random Move)
-    AI_depth = 0
+    # depth of the AI (0 is random Move; pondering needs a search, so a depth > 0)
+    AI_depth = 4
+    # seconds the AI may think per move (None: only limited by AI_depth)
+    AI_maxTime = 5
+    # think on the human's time about the reply the AI expects (the second move of its principal variation)
+    AI_ponder = True
+    AIThinking = None # background search while it is the AI's turn, or pondering while it is the human's
+    expectedReply = None # the reply to ponder on, once the AI's move is on the board
 
     while(running):
+        frameStart = time.perf_counter()
+        newSize = None
         
         humanTurn = (
             gs.whiteToMove and playerWhite == 0
@@ -65,13 +136,22 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+                if AIThinking:
+                    AIThinking.cancel()
+                    AIThinking = None
+            elif e.type == p.VIDEOEXPOSE: # the window content was lost, draw everything again
+                renderer.invalidate()
+            elif e.type == p.VIDEORESIZE:
+                newSize = (e.w, e.h) # only the last size of a drag is laid out, after the events
                 
             #mouse handlers
             elif e.type == p.MOUSEBUTTONDOWN:
                 if not gameOver and humanTurn:
                     location = p.mouse.get_pos() #x, y location of the mouse
-                    col = location[0] // SQ_SIZE
-                    row = location[1] // SQ_SIZE   
+                    square = squareAt(*location)
+                    if square is None:
+                        continue
+                    row, col = square
                     if sqSelected == (row, col):
                         sqSelected = () #deselect
                         playerClicks = []    
@@ -83,6 +163,9 @@ def main():
                         for i in range(len(validMoves)):
                             if move == validMoves[i]:
                                 gs.makeMove(validMoves[i])
+                                if AIThinking and not AIThinking.ponderhit(gs): # pondered on another move
+                                    AIThinking.cancel()
+                                    AIThinking = None
                                 moveMade = True
                                 animate = True
                                 print(move.getChessNotation())
@@ -92,37 +175,67 @@ def main():
                             playerClicks = [sqSelected]
             #keyboard handlers          
             elif e.type == p.KEYDOWN:
+                if e.key in (p.K_z, p.K_r) and AIThinking: # the search is for a position that is gone
+                    AIThinking.cancel()
+                    AIThinking = None
                 if e.key == p.K_z: #undo when 'z' is pressed
                     gs.undoMove()    
                     moveMade = True
                     animate = False
+                    gameOver = False
+                    messagePrinted = False
                 if e.key == p.K_r: # reset when 'r' is pressed 
-                    gs = ChessEngine.GameState()
-                    validMoves = gs.getValidMoves()
+                    gs = ChessEngine.createGameState(engine=BOARD_ENGINE)
+                    validMoves = hud.timeValidMoves(gs)
+                    knownResult = None
                     squareSelected = ()
                     playerClicks = []
                     moveMade = False
                     animate = False
                     messagePrinted = False
                     gameOver = False
+                if e.key == HUD_KEY:
+                    hud.toggle()
+
+        if newSize is not None:
+            screen = p.display.get_surface()
+            layoutBoard(*screen.get_size())
+            renderer.resize()
         
         # AI
-        if not gameOver and not humanTurn:
+        if running and not gameOver and not humanTurn and not moveMade:
+            AIMove = None
             if AI_depth == 0:
                 AIMove = AI.findRandomMove(validMoves)
-            else:
-                AIMove = AI.findBestMove(gs, validMoves, AI_depth)
-            gs.makeMove(AIMove)
-            moveMade = True
-            animate = True       
+            elif AIThinking is None:
+                AIThinking = AI.BackgroundSearch(gs, AI_depth, AI_maxTime, info=hud.searchInfo)
+            elif AIThinking.done():
+                AIMove = AIThinking.result(validMoves)
+                if AI_ponder:
+                    expectedReply = AIThinking.expectedReply()
+                AIThinking = None
+            if AIMove is not None:
+                gs.makeMove(AIMove)
+                moveMade = True
+                animate = True       
                                        
         if moveMade:
             if animate:
-                animateMove(gs.moveLog[-1], screen, gs.board, clock)
-            validMoves = gs.getValidMoves()
+                animateMove(gs.moveLog[-1], screen, renderer, gs.board, clock)
+            validMoves = hud.timeValidMoves(gs)
+            knownResult = Bitbases.probe(gs)
             moveMade = False
+            if expectedReply is not None: # the human is to move now
+                ponderMove = next((move for move in validMoves if move == expectedReply), None)
+                if ponderMove is not None and (playerWhite == 0 if gs.whiteToMove else playerBlack == 0):
+                    AIThinking = AI.BackgroundSearch(gs, AI_depth, AI_maxTime, info=hud.searchInfo,
+                                                    ponderMove=ponderMove)
+                expectedReply = None
                   
-        drawGameState(screen, gs, validMoves, sqSelected, gs.moveLog[-1] if gs.moveLog else '')
+        dirty = renderer.draw(screen, gs, validMoves, sqSelected, gs.moveLog[-1] if gs.moveLog else '')
+        dirty += hud.draw(screen, renderer, clock.get_fps(), AIThinking, dirty)
+        if dirty:
+            p.display.update(dirty)
 
         if not messagePrinted:
             if gs.checkmate:
@@ -140,84 +253,260 @@ def main():
                 gameOver = True
                 messagePrinted = True
                 print('Draw by repetition')
+            elif gs.fiftyMoveRule:
+                gameOver = True
+                messagePrinted = True
+                print('Draw by fifty-move rule')
+            elif knownResult is not None and knownResult[0] == Bitbases.DRAW:
+                gameOver = True
+                messagePrinted = True
+                print('Draw: the endgame bitbases know this position is drawn')
 
+        hud.frameTime = time.perf_counter() - frameStart
         clock.tick(MAX_FPS)
-        p.display.flip()
         
 '''
-Highlighting square selected and moves for piece selected 
+screen rectangle of a square
+'''
+def squareRect(r, c):
+    return p.Rect(BOARD_X + c * SQ_SIZE, BOARD_Y + r * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+
+'''
+a square sized, semi-transparent surface of one highlight color
+'''
+def highlightSurface(color):
+    s = p.Surface((SQ_SIZE, SQ_SIZE))
+    s.set_alpha(100)
+    s.fill(p.Color(color))
+    return s
+
 '''
-def highlightSquares(screen, gs, validMoves, squareSelected, lastMove):
+Highlighting square selected and moves for piece selected: returns {(row, col): highlight names, bottom first}
+'''
+def squareHighlights(gs, validMoves, squareSelected, lastMove):
+    highlights = {}
     # Highlight last move 
     if lastMove != '':
-        s = p.Surface((SQ_SIZE, SQ_SIZE))
-        s.set_alpha(100)
-        s.fill(p.Color('green'))
-        screen.blit(s, (lastMove.startCol * SQ_SIZE, lastMove.startRow * SQ_SIZE))
-        screen.blit(s, (lastMove.endCol * SQ_SIZE, lastMove.endRow * SQ_SIZE))
+        highlights[(lastMove.startRow, lastMove.startCol)] = ('lastMove',)
+        highlights[(lastMove.endRow, lastMove.endCol)] = ('lastMove',)
     
     # Highlight selected square and valid moves
     if squareSelected != ():
         r, c = squareSelected
         if gs.board[r][c][0] == ('w' if gs.whiteToMove else 'b'):
-            # highlight selected square
-            s = p.Surface((SQ_SIZE, SQ_SIZE))
-            s.set_alpha(100)
-            s.fill(p.Color('yellow'))
-            screen.blit(s, (c * SQ_SIZE, r * SQ_SIZE))
-            
-            # highlight valid moves
-            for move in validMoves:
-                if move.startRow == r and move.startCol == c:
-                    screen.blit(s, (move.endCol * SQ_SIZE, move.endRow * SQ_SIZE))
-
-'''
-Responsible for all the graphics within a current game state.
-'''  
-def drawGameState(screen, gs, validMoves, squareSelected, lastMove):
-    drawBoard(screen) #draw the squares on the board
-    highlightSquares(screen, gs, validMoves, squareSelected, lastMove)
-    drawPieces(screen, gs.board) #draw pieces on top of those squares
-  
-'''
-Draw the squares on the board.
-'''
-def drawBoard(screen):
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            color = COLORS[((r + c) % 2)]
-            p.draw.rect(screen, color, p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
-    
+            squares = [(r, c)] + [(move.endRow, move.endCol) for move in validMoves
+                                  if move.startRow == r and move.startCol == c]
+            for square in squares:
+                highlights[square] = highlights.get(square, ()) + ('selected',)
+    return highlights
+
+'''
+Draws the game state incrementally. The empty board is rendered once and the highlight surfaces are made once;
+every frame only the squares whose piece or highlights changed are redrawn, and draw() returns their rectangles
+for p.display.update. Nothing at all is done while the position, the last move and the selection stay the same.
+After a resize both are made again for the new window and square size.
+'''
+class BoardRenderer():
+
+    def __init__(self):
+        self.resize()
+
+    '''
+    renders the empty board (with the margin around it) and the highlights for the current window and square size
+    '''
+    def resize(self):
+        self.boardSurface = p.Surface((WIDTH, HEIGHT))
+        self.boardSurface.fill(MARGIN_COLOR)
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                p.draw.rect(self.boardSurface, COLORS[(r + c) % 2], squareRect(r, c))
+        self.highlights = {'lastMove': highlightSurface('green'), 'selected': highlightSurface('yellow')}
+        self.invalidate()
+
+    '''
+    forgets what is on the screen, the next draw redraws the whole window
+    '''
+    def invalidate(self):
+        self.shown = [[None] * DIMENSION for _ in range(DIMENSION)] # (piece, highlights) drawn on each square
+        self.stateKey = None
+        self.fullRedraw = True
+
+    def draw(self, screen, gs, validMoves, squareSelected, lastMove):
+        stateKey = (gs.zobristKey, len(gs.moveLog), squareSelected)
+        if stateKey == self.stateKey:
+            return []
+        self.stateKey = stateKey
+        highlights = squareHighlights(gs, validMoves, squareSelected, lastMove)
+        dirty = []
+        if self.fullRedraw: # the margin too
+            self.fullRedraw = False
+            dirty.append(screen.blit(self.boardSurface, (0, 0)))
+        for r in range(DIMENSION):
+            row = gs.board[r]
+            shownRow = self.shown[r]
+            for c in range(DIMENSION):
+                content = (row[c], highlights.get((r, c), ()))
+                if shownRow[c] != content:
+                    shownRow[c] = content
+                    dirty.append(self.drawSquare(screen, r, c, *content))
+        return dirty
+
+    '''
+    draws one square: board, highlights, piece; returns its rectangle
+    '''
+    def drawSquare(self, screen, r, c, piece, highlights=()):
+        rect = squareRect(r, c)
+        screen.blit(self.boardSurface, rect, rect)
+        for name in highlights:
+            screen.blit(self.highlights[name], rect)
+        if piece != "--":
+            screen.blit(IMAGES[piece], rect)
+        return rect
+
+    '''
+    draws the squares overlapping rect again as they were last drawn (after something was drawn over them)
+    '''
+    def redrawArea(self, screen, rect):
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                if self.shown[r][c] is not None and squareRect(r, c).colliderect(rect):
+                    self.drawSquare(screen, r, c, *self.shown[r][c])
+
+    '''
+    the board after the move, without the moving piece and with what stood on the end square before: the
+    background an animation of the move runs over
+    '''
+    def animationBackground(self, move, board):
+        background = self.boardSurface.copy()
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                if (r, c) == (move.endRow, move.endCol):
+                    piece = move.pieceCaptured if not move.isEnPassantMove else "--"
+                else:
+                    piece = board[r][c]
+                self.drawSquare(background, r, c, piece)
+        return background
+
 '''
-Draw the pieces pn the board using the current GameState.board
-'''  
-def drawPieces(screen, board):
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            piece = board[r][c]
-            if piece != "--":  # Check if there's a piece at this position
-                screen.blit(IMAGES[piece], p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))  
+Optional overlay (toggled with HUD_KEY) with the frame time, the actual FPS against MAX_FPS, the time of the last
+getValidMoves call and the progress of the AI while it thinks. The text is rendered at most every HUD_INTERVAL
+seconds and only when it changed; in between the panel is only blitted again when the board was redrawn under it.
+'''
+class PerformanceHUD():
+
+    def __init__(self):
+        self.visible = False
+        self.font = None # created when the overlay is first shown
+        self.surface = None
+        self.rect = None # where the panel is on the screen, None if it is not
+        self.lines = None
+        self.nextUpdate = 0.0
+        self.frameTime = 0.0 # seconds the last frame took, without waiting for the next one
+        self.validMovesTime = 0.0 # seconds the last getValidMoves call took
+        self.lastSearchInfo = None # info of the last completed iteration of the AI's search
+
+    '''
+    receives the info of every completed search iteration (called from the search thread), instead of printing it
+    '''
+    def searchInfo(self, info):
+        self.lastSearchInfo = info
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.lines = None
+        self.nextUpdate = 0.0
+
+    '''
+    calls gs.getValidMoves and records how long it took
+    '''
+    def timeValidMoves(self, gs):
+        start = time.perf_counter()
+        validMoves = gs.getValidMoves()
+        self.validMovesTime = time.perf_counter() - start
+        return validMoves
+
+    def textLines(self, fps, AIThinking):
+        lines = ["frame %.1f ms   fps %.1f / %d" % (1000 * self.frameTime, fps, MAX_FPS),
+                 "getValidMoves %.2f ms" % (1000 * self.validMovesTime)]
+        if AIThinking is not None:
+            progress = AIThinking.progress()
+            best = progress["bestMove"].getChessNotation() if progress["bestMove"] is not None else "-"
+            pondering = AIThinking.ponderMove
+            lines.append("AI %sdepth %d   nodes %d   nps %d   best %s" %
+                         ("pondering on " + pondering.getChessNotation() + "   " if pondering is not None else "",
+                          progress["depth"], progress["nodes"], progress["nps"], best))
+        info = self.lastSearchInfo
+        if info is not None:
+            pv = " ".join(move.getChessNotation() for move in info["pvMoves"][:6])
+            lines.append("last iteration: depth %d   score %d   pv %s" % (info["depth"], info["score"], pv))
+        return lines
+
+    def render(self, lines):
+        if self.font is None:
+            self.font = p.font.Font(None, 20)
+        texts = [self.font.render(line, True, p.Color("white")) for line in lines]
+        width = max(text.get_width() for text in texts) + 8
+        height = sum(text.get_height() for text in texts) + 8
+        self.surface = p.Surface((width, height), p.SRCALPHA)
+        self.surface.fill((0, 0, 0, 170))
+        y = 4
+        for text in texts:
+            self.surface.blit(text, (4, y))
+            y += text.get_height()
+
+    '''
+    brings the overlay on the screen up to date, returns the rectangles it changed. dirty: the rectangles the
+    renderer has redrawn this frame
+    '''
+    def draw(self, screen, renderer, fps, AIThinking, dirty):
+        if not self.visible:
+            if self.rect is None:
+                return []
+            cleared = self.rect
+            self.rect = None
+            renderer.redrawArea(screen, cleared)
+            return [cleared]
+        changed = False
+        now = time.perf_counter()
+        if now >= self.nextUpdate:
+            self.nextUpdate = now + HUD_INTERVAL
+            lines = self.textLines(fps, AIThinking)
+            if lines != self.lines:
+                self.lines = lines
+                self.render(lines)
+                changed = True
+        covered = self.rect is not None and self.rect.collidelist(dirty) != -1
+        if not changed and not covered:
+            return []
+        area = self.surface.get_rect()
+        if self.rect is not None:
+            area = area.union(self.rect)
+            renderer.redrawArea(screen, self.rect)
+        self.rect = self.surface.get_rect()
+        screen.blit(self.surface, self.rect)
+        return [area]
 
 '''
-animations and stuff
+animations and stuff: each frame only the area the piece moves over is restored and sent to the display
 '''
-def animateMove(move, screen, board, clock):
+def animateMove(move, screen, renderer, board, clock):
     dR = move.endRow - move.startRow
     dC = move.endCol - move.startCol
     framesPerSquare = 5 # frames to move one square
     frameCount = (abs(dR) + abs(dC)) * framesPerSquare
+    background = renderer.animationBackground(move, board)
+    screen.blit(background, (0, 0))
+    p.display.update()
+    previous = squareRect(move.startRow, move.startCol)
     for frame in range(frameCount + 1):
         r, c = (move.startRow + dR * frame / frameCount, move.startCol + dC * frame / frameCount)
-        drawBoard(screen)
-        drawPieces(screen, board)
-        color = COLORS[(move.endRow + move.endCol) % 2]
-        endSquare = p.Rect(move.endCol * SQ_SIZE, move.endRow * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-        p.draw.rect(screen, color, endSquare)
-        if move.pieceCaptured != '--':
-            screen.blit(IMAGES[move.pieceCaptured], endSquare)
-        screen.blit(IMAGES[move.pieceMoved], p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
-        p.display.flip()
+        current = p.Rect(BOARD_X + c * SQ_SIZE, BOARD_Y + r * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+        screen.blit(background, previous, previous)
+        screen.blit(IMAGES[move.pieceMoved], current)
+        p.display.update(previous.union(current))
+        previous = current
         clock.tick(60)
+    renderer.invalidate()
 
 if __name__ == "__main__":
     main()
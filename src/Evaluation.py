@@ -0,0 +1,160 @@
+"""
+Static evaluation: material plus piece-square tables, tapered between a middlegame and an endgame score by the
+material left on the board.
+
+GameState keeps mgScore, egScore (white minus black, material included) and phase up to date in makeMove and
+undoMove by adding moveDelta(move), so evaluate() is O(1). computeScores() is the full recomputation from the board,
+used when a position is set up and, with DEBUG = True, to check the incremental scores on every evaluate().
+"""
+DEBUG = False
+
+MG_VALUE = {'P': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+EG_VALUE = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+PHASE_WEIGHT = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24 # all minor and major pieces on the board
+
+# piece-square tables from white's point of view, laid out like GameState.board (first row is the 8th rank)
+PAWN_MG = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0]
+PAWN_EG = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     20,  20,  20,  20,  20,  20,  20,  20,
+     10,  10,  10,  10,  10,  10,  10,  10,
+     10,  10,  10,  10,  10,  10,  10,  10,
+      0,   0,   0,   0,   0,   0,   0,   0]
+KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0]
+QUEEN = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20]
+KING_MG = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20]
+KING_EG = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+
+PST_MG = {'P': PAWN_MG, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING_MG}
+PST_EG = {'P': PAWN_EG, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING_EG}
+
+'''
+MG[piece][r * 8 + c], EG[piece][r * 8 + c]: signed value (positive for white) of a piece on a square, material
+included. Black uses the white tables mirrored vertically.
+'''
+MG = {}
+EG = {}
+PHASE = {"--": 0}
+for _kind in 'PNBRQK':
+    MG['w' + _kind] = [MG_VALUE[_kind] + PST_MG[_kind][_sq] for _sq in range(64)]
+    EG['w' + _kind] = [EG_VALUE[_kind] + PST_EG[_kind][_sq] for _sq in range(64)]
+    MG['b' + _kind] = [-(MG_VALUE[_kind] + PST_MG[_kind][(7 - _sq // 8) * 8 + _sq % 8]) for _sq in range(64)]
+    EG['b' + _kind] = [-(EG_VALUE[_kind] + PST_EG[_kind][(7 - _sq // 8) * 8 + _sq % 8]) for _sq in range(64)]
+    PHASE['w' + _kind] = PHASE['b' + _kind] = PHASE_WEIGHT[_kind]
+del _kind
+
+'''
+returns (mgScore, egScore, phase) of the board, computed from scratch
+'''
+def computeScores(gs):
+    mg = eg = phase = 0
+    for r in range(8):
+        for c in range(8):
+            piece = gs.board[r][c]
+            if piece != "--":
+                mg += MG[piece][r * 8 + c]
+                eg += EG[piece][r * 8 + c]
+                phase += PHASE[piece]
+    return mg, eg, phase
+
+'''
+returns the change (mgScore, egScore, phase) caused by a move, covering captures, en passant, promotion and castling
+'''
+def moveDelta(move):
+    start = move.startRow * 8 + move.startCol
+    end = move.endRow * 8 + move.endCol
+    moved = move.pieceMoved
+    placed = moved[0] + move.promotionChoice if move.isPawnPromotion else moved
+    mg = MG[placed][end] - MG[moved][start]
+    eg = EG[placed][end] - EG[moved][start]
+    phase = PHASE[placed] - PHASE[moved]
+    captured = move.pieceCaptured
+    if captured != "--":
+        capturedSq = move.startRow * 8 + move.endCol if move.isEnPassantMove else end
+        mg -= MG[captured][capturedSq]
+        eg -= EG[captured][capturedSq]
+        phase -= PHASE[captured]
+    if move.isCastleMove:
+        rook = moved[0] + 'R'
+        if move.endCol - move.startCol == 2: # kingside
+            rookFrom, rookTo = end + 1, end - 1
+        else: # queenside
+            rookFrom, rookTo = end - 2, end + 1
+        mg += MG[rook][rookTo] - MG[rook][rookFrom]
+        eg += EG[rook][rookTo] - EG[rook][rookFrom]
+    return mg, eg, phase
+
+'''
+tapered score of the position from the point of view of the side to move, O(1)
+'''
+def evaluate(gs):
+    if DEBUG:
+        expected = computeScores(gs)
+        if expected != (gs.mgScore, gs.egScore, gs.phase):
+            raise AssertionError("incremental evaluation %s != recomputed %s in %s" %
+                                 ((gs.mgScore, gs.egScore, gs.phase), expected, gs.getFEN()))
+    phase = gs.phase if gs.phase < MAX_PHASE else MAX_PHASE
+    score = (gs.mgScore * phase + gs.egScore * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if gs.whiteToMove else -score
@@ -0,0 +1,190 @@
+"""
+Polyglot (.bin) opening book.
+
+A Polyglot book is a flat array of 16 byte big-endian entries (key, move, weight, learn), sorted by key. The key is
+the Polyglot Zobrist key of the position, which is exactly GameState.zobristKey. The file is memory-mapped and the
+entries of a position are found by binary search, so opening a book costs nothing and books of hundreds of MB work
+the same as small ones.
+
+Polyglot move encoding (16 bits):
+    bits  0-2   to file       bits  6-8   from file      bits 12-14  promotion (0 none, 1 N, 2 B, 3 R, 4 Q)
+    bits  3-5   to rank       bits  9-11  from rank
+ranks count from white's side (rank 0 is the first rank, GameState row 7); castling is written as the king
+capturing its own rook (e1h1, e1a1, e8h8, e8a8).
+
+Usage (from the src folder):
+    python3 OpeningBook.py --make-test-book books/test.bin   # write the small book of TEST_LINES
+    python3 OpeningBook.py --book books/test.bin               # list the book moves of the start position
+    python3 OpeningBook.py --book books/test.bin --fen "<fen>"
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+import ChessEngine
+
+ENTRY = struct.Struct(">QHHI") # key, move, weight, learn
+KEY = struct.Struct(">Q")
+PROMOTION_PIECES = ('', 'N', 'B', 'R', 'Q')
+
+# opening lines of the test book (UCI notation), a line listed twice counts twice in the weights
+TEST_LINES = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 c2c3 g8f6 d2d4",
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3",
+    "e2e4 c7c5 g1f3 b8c6 d2d4 c5d4 f3d4",
+    "e2e4 e7e6 d2d4 d7d5 b1c3 g8f6",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5",
+    "d2d4 g8f6 c2c4 e7e6 g1f3 b7b6",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7 e2e4 d7d6",
+    "c2c4 e7e5 b1c3 g8f6",
+]
+
+'''
+Polyglot encoding of a move (castling as king takes own rook)
+'''
+def encodeMove(move):
+    endCol = move.endCol
+    if move.isCastleMove:
+        endCol = 7 if move.endCol == 6 else 0
+    promotion = PROMOTION_PIECES.index(move.promotionChoice) if move.isPawnPromotion else 0
+    return endCol | ((7 - move.endRow) << 3) | (move.startCol << 6) | ((7 - move.startRow) << 9) | (promotion << 12)
+
+'''
+Move.moveID of a Polyglot move played in the position of board
+'''
+def moveIDOf(bookMove, board):
+    endCol = bookMove & 7
+    endRow = 7 - ((bookMove >> 3) & 7)
+    startCol = (bookMove >> 6) & 7
+    startRow = 7 - ((bookMove >> 9) & 7)
+    promotion = (bookMove >> 12) & 7
+    if board[startRow][startCol][1] == 'K' and startCol == 4 and endRow == startRow and endCol in (0, 7):
+        endCol = 6 if endCol == 7 else 2 # king takes own rook: castling
+    moveID = startRow * 1000 + startCol * 100 + endRow * 10 + endCol
+    if promotion:
+        moveID += ChessEngine.Move.promotionIDs[PROMOTION_PIECES[promotion]]
+    return moveID
+
+class OpeningBook():
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.entryCount = size // ENTRY.size
+        # mmap cannot map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    '''
+    returns [(move, weight, learn), ...] of every entry for the key
+    '''
+    def entries(self, key):
+        data = self.data
+        low = 0
+        high = self.entryCount
+        while low < high: # first entry with a key >= key
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        for i in range(low, self.entryCount):
+            entryKey, move, weight, learn = ENTRY.unpack_from(data, i * ENTRY.size)
+            if entryKey != key:
+                break
+            result.append((move, weight, learn))
+        return result
+
+    '''
+    returns [(Move, weight), ...] for the book moves of the position that are legal, as objects out of validMoves
+    '''
+    def probe(self, gs, validMoves):
+        byID = {move.moveID: move for move in validMoves}
+        result = []
+        for bookMove, weight, _ in self.entries(gs.zobristKey):
+            move = byID.get(moveIDOf(bookMove, gs.board))
+            if move is not None:
+                result.append((move, weight))
+        return result
+
+    '''
+    picks one of the book moves at random, with the chance of each move proportional to its weight.
+    returns None if the position is not in the book
+    '''
+    def chooseMove(self, gs, validMoves, rng=random):
+        candidates = self.probe(gs, validMoves)
+        if not candidates:
+            return None
+        total = sum(weight for _, weight in candidates)
+        if total == 0: # all weights zero: any of them
+            return rng.choice(candidates)[0]
+        pick = rng.randrange(total)
+        for move, weight in candidates:
+            if pick < weight:
+                return move
+            pick -= weight
+        return candidates[-1][0]
+
+'''
+writes a book file from {(key, polyglotMove): weight}
+'''
+def writeBook(path, weights):
+    # sorted by key, the most played move first
+    rows = sorted(weights.items(), key=lambda item: (item[0][0], -item[1]))
+    with open(path, "wb") as f:
+        for (key, move), weight in rows:
+            f.write(ENTRY.pack(key, move, min(weight, 0xFFFF), 0))
+
+'''
+collects the {(key, polyglotMove): weight} of opening lines given in UCI notation; each time a move is played in a
+line adds 1 to its weight
+'''
+def bookWeightsOf(lines):
+    from Perft import uciNotation
+    weights = {}
+    for line in lines:
+        gs = ChessEngine.GameState()
+        for uci in line.split():
+            move = next((m for m in gs.getValidMoves() if uciNotation(m) == uci), None)
+            if move is None:
+                raise ValueError("illegal move %s in book line %r" % (uci, line))
+            entry = (gs.zobristKey, encodeMove(move))
+            weights[entry] = weights.get(entry, 0) + 1
+            gs.makeMove(move)
+    return weights
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Polyglot opening book tools")
+    parser.add_argument("--book", help="book to list the moves of a position from")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN)
+    parser.add_argument("--make-test-book", metavar="PATH", help="write the small test book to PATH")
+    args = parser.parse_args(argv)
+
+    if args.make_test_book:
+        folder = os.path.dirname(args.make_test_book)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        weights = bookWeightsOf(TEST_LINES)
+        writeBook(args.make_test_book, weights)
+        print("%d entries written to %s" % (len(weights), args.make_test_book))
+    if args.book:
+        book = OpeningBook(args.book)
+        gs = ChessEngine.GameState(args.fen)
+        for move, weight in book.probe(gs, gs.getValidMoves()):
+            print("%-8s %d" % (move.getChessNotation(), weight))
+        book.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
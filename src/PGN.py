@@ -0,0 +1,338 @@
+"""
+Streaming PGN importer for large game databases.
+
+readGames() walks a PGN file with a buffered reader and yields one PGNGame at a time, so a multi-GB dump is never
+held in memory. A PGNGame keeps its tags and raw movetext; moves() replays the movetext on a GameState and
+resolves every SAN move (disambiguation, promotion, castling) to the Move out of getValidMoves.
+
+importGames() does the same with a process pool: the file is split into byte ranges at game boundaries
+("[Event " lines), every worker reads and replays the games of its ranges, and the results come back in file
+order.
+
+moveToSan() and gameText() go the other way, for writing games (see SelfPlay).
+
+Usage (from the src folder):
+    python3 PGN.py games.pgn              # games/second of a sequential import
+    python3 PGN.py games.pgn -w 4         # the same with 4 worker processes
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import ChessEngine
+from ChessEngine import Move
+
+CHUNK_SIZE = 1 << 20 # read buffer of the importer
+RANGE_BYTES = 4 << 20 # about this much of the file per task of the process pool
+
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN = re.compile(r"""
+    (?P<comment>\{[^}]*\}|;[^\n]*)
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<nag>\$\d+)
+  | (?P<result>1-0|0-1|1/2-1/2|\*)
+  | (?P<number>\d+\.(?:\.\.)?)
+  | (?P<san>[^\s{}();$]+)
+""", re.VERBOSE)
+SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]*[!?]*$")
+CASTLE = re.compile(r"^(O-O-O|0-0-0|O-O|0-0)[+#]*[!?]*$")
+
+class PGNGame():
+
+    def __init__(self, tags, movetext, offset=0):
+        self.tags = tags
+        self.movetext = movetext
+        self.offset = offset # byte offset of the game in the file
+
+    '''
+    the SAN moves of the main line (comments, variations, NAGs and move numbers removed) and the result token
+    '''
+    def parseMovetext(self):
+        sanMoves = []
+        result = self.tags.get("Result", "*")
+        depth = 0 # nesting of variations
+        for token in TOKEN.finditer(self.movetext):
+            kind = token.lastgroup
+            if kind == "open":
+                depth += 1
+            elif kind == "close":
+                depth = max(depth - 1, 0)
+            elif depth == 0:
+                if kind == "san":
+                    sanMoves.append(token.group())
+                elif kind == "result":
+                    result = token.group()
+        return sanMoves, result
+
+    @property
+    def sanMoves(self):
+        return self.parseMovetext()[0]
+
+    @property
+    def result(self):
+        return self.parseMovetext()[1]
+
+    '''
+    the FEN the game starts from
+    '''
+    def startFEN(self):
+        return self.tags.get("FEN", ChessEngine.START_FEN)
+
+    '''
+    replays the game and returns its moves as Move objects; raises ValueError at the first move that is illegal or
+    ambiguous
+    '''
+    def moves(self, engine="mailbox"):
+        gs = ChessEngine.createGameState(self.startFEN(), engine)
+        moves = []
+        for san in self.sanMoves:
+            move = sanToMove(gs, san, gs.getValidMoves())
+            gs.makeMove(move)
+            moves.append(move)
+        return moves
+
+'''
+the Move out of validMoves written as san in the position of gs
+'''
+def sanToMove(gs, san, validMoves):
+    castle = CASTLE.match(san)
+    if castle:
+        endCol = 2 if len(castle.group(1)) == 5 else 6
+        for move in validMoves:
+            if move.isCastleMove and move.endCol == endCol:
+                return move
+        raise ValueError("illegal castling %s in %s" % (san, gs.getFEN()))
+
+    match = SAN.match(san)
+    if match is None:
+        raise ValueError("cannot read move %r" % san)
+    pieceType, fromFile, fromRank, target, promotion = match.groups()
+    pieceType = pieceType or 'P'
+    endRow = Move.ranksToRows[target[1]]
+    if pieceType == 'P' and (endRow == 0 or endRow == 7) and promotion is None:
+        raise ValueError("promotion without a piece %s in %s" % (san, gs.getFEN()))
+    endCol = Move.filesToCols[target[0]]
+    candidates = []
+    for move in validMoves:
+        if move.endRow != endRow or move.endCol != endCol or move.pieceMoved[1] != pieceType:
+            continue
+        if fromFile is not None and move.startCol != Move.filesToCols[fromFile]:
+            continue
+        if fromRank is not None and move.startRow != Move.ranksToRows[fromRank]:
+            continue
+        if (move.promotionChoice if move.isPawnPromotion else None) != promotion:
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError("%s move %s in %s" % ("illegal" if not candidates else "ambiguous", san, gs.getFEN()))
+    return candidates[0]
+
+'''
+SAN of a move out of validMoves in the position of gs, with the check or mate suffix
+'''
+def moveToSan(gs, move, validMoves):
+    if move.isCastleMove:
+        san = "O-O" if move.endCol == 6 else "O-O-O"
+    else:
+        target = move.getRankFile(move.endRow, move.endCol)
+        capture = move.pieceCaptured != "--"
+        pieceType = move.pieceMoved[1]
+        if pieceType == 'P':
+            san = (Move.colsToFiles[move.startCol] + 'x' if capture else '') + target
+            if move.isPawnPromotion:
+                san += '=' + move.promotionChoice
+        else:
+            others = [m for m in validMoves if m.pieceMoved == move.pieceMoved and m.endRow == move.endRow and
+                      m.endCol == move.endCol and (m.startRow, m.startCol) != (move.startRow, move.startCol)]
+            disambiguation = ''
+            if others:
+                if all(m.startCol != move.startCol for m in others):
+                    disambiguation = Move.colsToFiles[move.startCol]
+                elif all(m.startRow != move.startRow for m in others):
+                    disambiguation = Move.rowsToRanks[move.startRow]
+                else:
+                    disambiguation = move.getRankFile(move.startRow, move.startCol)
+            san = pieceType + disambiguation + ('x' if capture else '') + target
+    gs.makeMove(move)
+    replies = gs.getValidMoves()
+    if gs.inCheck:
+        san += '#' if not replies else '+'
+    gs.undoMove()
+    return san
+
+'''
+PGN text of one game: tags is a list of (name, value) pairs in order (the seven tag roster first), sanMoves start
+with white's move unless the FEN tag says otherwise
+'''
+def gameText(tags, sanMoves, result, whiteToMove=True, fullmoveNumber=1):
+    lines = ['[%s "%s"]' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in tags]
+    tokens = []
+    for san in sanMoves:
+        if whiteToMove:
+            tokens.append("%d." % fullmoveNumber)
+        elif not tokens:
+            tokens.append("%d..." % fullmoveNumber)
+        tokens.append(san)
+        if not whiteToMove:
+            fullmoveNumber += 1
+        whiteToMove = not whiteToMove
+    tokens.append(result)
+    movetext = []
+    line = ""
+    for token in tokens: # lines of at most 80 characters
+        if line and len(line) + 1 + len(token) > 80:
+            movetext.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+'''
+whether a brace comment is still open at the end of a movetext line, given whether one was open at its start
+'''
+def commentOpenAfter(text, inComment):
+    for ch in text:
+        if inComment:
+            if ch == '}':
+                inComment = False
+        elif ch == '{':
+            inComment = True
+        elif ch == ';': # the rest of the line is a comment, braces in it do not count
+            break
+    return inComment
+
+'''
+yields the games of a PGN file (a path or a binary file object), lazily, one PGNGame at a time.
+start/end limit the import to the games whose first line starts in that byte range; start must be at the
+start of a line
+'''
+def readGames(source, start=0, end=None, chunkSize=CHUNK_SIZE):
+    f = open(source, "rb", buffering=chunkSize) if isinstance(source, (str, bytes, os.PathLike)) else source
+    try:
+        f.seek(start)
+        offset = start
+        gameOffset = start
+        tags = {}
+        movetext = []
+        inComment = False # inside a brace comment of the movetext, which can span lines
+        for line in f:
+            lineOffset = offset
+            offset += len(line)
+            text = line.decode("utf-8", errors="replace").strip()
+            if not inComment and (not text or text.startswith('%')): # blank line or escape
+                continue
+            # a '[' line inside a comment, or one that is no tag pair after movetext, belongs to the movetext
+            if text.startswith('[') and not inComment and (not movetext or TAG.match(text)):
+                if movetext: # the tags of the next game
+                    yield PGNGame(tags, " ".join(movetext), gameOffset)
+                    tags = {}
+                    movetext = []
+                if not tags:
+                    if end is not None and lineOffset >= end:
+                        return
+                    gameOffset = lineOffset
+                tag = TAG.match(text)
+                if tag:
+                    tags[tag.group(1)] = tag.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            else:
+                if not tags and not movetext:
+                    if end is not None and lineOffset >= end:
+                        return
+                    gameOffset = lineOffset
+                movetext.append(text)
+                inComment = commentOpenAfter(text, inComment)
+        if tags or movetext:
+            yield PGNGame(tags, " ".join(movetext), gameOffset)
+    finally:
+        if f is not source:
+            f.close()
+
+'''
+byte offsets that cut the file into about `parts` ranges, each cut at the start of an "[Event " line
+'''
+def splitFile(path, parts):
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, offsets[-1]))
+            if f.tell() > 0:
+                f.readline() # finish the line the cut fell into
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    position = size
+                    break
+                if line.startswith(b"[Event "):
+                    break
+            if offsets[-1] < position < size:
+                offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+'''
+replays one game for importGames: (game, moves, None) or (game, None, error message)
+'''
+def importGame(game, engine):
+    try:
+        return game, game.moves(engine), None
+    except ValueError as e:
+        return game, None, str(e)
+
+'''
+imports the games of one byte range (runs in the worker processes)
+'''
+def importRange(path, start, end, engine):
+    return [importGame(game, engine) for game in readGames(path, start, end)]
+
+'''
+yields (game, moves, error) for every game of the file in file order: moves is the list of Move objects, or None
+and error says why the game could not be replayed. workers > 1 imports in that many processes
+'''
+def importGames(path, workers=1, engine="mailbox"):
+    if workers <= 1:
+        for game in readGames(path):
+            yield importGame(game, engine)
+        return
+    parts = max(workers, os.path.getsize(path) // RANGE_BYTES)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers) as pool:
+        tasks = [(path, start, end, engine) for start, end in splitFile(path, parts)]
+        for results in pool.imap(importRangeTask, tasks):
+            yield from results
+
+def importRangeTask(task):
+    return importRange(*task)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="import a PGN file and measure games/second")
+    parser.add_argument("pgn", help="PGN file")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox")
+    args = parser.parse_args(argv)
+
+    games = 0
+    moves = 0
+    errors = 0
+    start = time.perf_counter()
+    for game, gameMoves, error in importGames(args.pgn, args.workers, args.engine):
+        games += 1
+        if error is not None:
+            errors += 1
+            print("game at byte %d: %s" % (game.offset, error))
+        else:
+            moves += len(gameMoves)
+    seconds = time.perf_counter() - start
+    print("%d games (%d with errors), %d moves in %.2fs: %.1f games/s, %.0f moves/s" %
+          (games, errors, moves, seconds, games / seconds if seconds > 0 else 0,
+           moves / seconds if seconds > 0 else 0))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
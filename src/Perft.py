@@ -0,0 +1,149 @@
+"""
+Perft (performance test) for the move generator. Walks the move tree of a position to a fixed depth with
+getValidMoves / makeMove / undoMove and counts the leaf nodes, which can be compared against the well known
+reference counts. Also reports nodes per second, so it doubles as the move generation benchmark.
+
+Usage (from the src folder):
+    python3 Perft.py                      # run the reference suite
+    python3 Perft.py --quick              # only the cheap depths of the suite
+    python3 Perft.py --fen "<fen>" -d 3   # perft of a single position
+    python3 Perft.py --fen "<fen>" -d 3 --divide
+    python3 Perft.py --engine bitboard    # run the suite on the bitboard engine
+    python3 Perft.py --quick --profile perft.json --profile-timing   # where the move generation time goes
+"""
+import argparse
+import sys
+import time
+
+import ChessEngine
+import Profiling
+
+# (name, fen, {depth: nodes}) reference positions from the chessprogramming wiki perft results
+POSITIONS = [
+    ("start", ChessEngine.START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+    ("enpassant-pin", "8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+     {1: 4, 2: 56, 3: 259}),
+    ("enpassant-discovered", "8/8/8/8/k2Pp2Q/8/8/3K4 b - d3 0 1",
+     {1: 6, 2: 136, 3: 863}),
+    ("castle-rights", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {1: 44, 2: 1494, 3: 50509}),
+    ("promotion", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {1: 11, 2: 133, 3: 1442}),
+    ("underpromotion", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {1: 9, 2: 40, 3: 472}),
+]
+
+'''
+counts the leaf nodes of the move tree below the current position
+'''
+def perft(gs, depth):
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+'''
+perft split up by root move, returns a dict {notation: nodes}
+'''
+def perftDivide(gs, depth):
+    result = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        result[uciNotation(move)] = perft(gs, depth - 1) if depth > 1 else 1
+        gs.undoMove()
+    return result
+
+def uciNotation(move):
+    text = move.getRankFile(move.startRow, move.startCol) + move.getRankFile(move.endRow, move.endCol)
+    if move.isPawnPromotion:
+        text += move.promotionChoice.lower()
+    return text
+
+'''
+runs perft on a FEN and returns (nodes, seconds)
+'''
+def timedPerft(fen, depth, engine="mailbox"):
+    gs = ChessEngine.createGameState(fen, engine)
+    start = time.perf_counter()
+    nodes = perft(gs, depth)
+    return nodes, time.perf_counter() - start
+
+'''
+runs every reference position up to maxDepth, prints the results and returns True if all counts match
+'''
+def runSuite(maxDepth=None, engine="mailbox", out=sys.stdout):
+    allPassed = True
+    totalNodes = 0
+    totalTime = 0.0
+    for name, fen, expected in POSITIONS:
+        for depth, expectedNodes in sorted(expected.items()):
+            if maxDepth is not None and depth > maxDepth:
+                break
+            nodes, seconds = timedPerft(fen, depth, engine)
+            totalNodes += nodes
+            totalTime += seconds
+            passed = nodes == expectedNodes
+            allPassed = allPassed and passed
+            nps = nodes / seconds if seconds > 0 else 0
+            print("%-22s depth %d  %10d nodes  %8.3fs  %9.0f nps  %s" %
+                  (name, depth, nodes, seconds, nps, "ok" if passed else "FAIL (expected %d)" % expectedNodes),
+                  file=out)
+    print("total %d nodes in %.3fs (%.0f nps)" % (totalNodes, totalTime, totalNodes / totalTime if totalTime else 0),
+          file=out)
+    return allPassed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="perft / perft-divide for ChessEngine.GameState")
+    parser.add_argument("--fen", help="position to test (default: run the reference suite)")
+    parser.add_argument("-d", "--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the node count below every root move")
+    parser.add_argument("--quick", action="store_true", help="limit the suite to depth 2")
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox", help="board engine to test")
+    parser.add_argument("--profile", metavar="PATH", help="count engine calls and write them as JSON to PATH")
+    parser.add_argument("--profile-timing", action="store_true", help="with --profile: also time the move generation")
+    args = parser.parse_args(argv)
+    if args.profile:
+        Profiling.enable(timing=args.profile_timing)
+        try:
+            return run(args)
+        finally:
+            Profiling.disable()
+            for line in Profiling.summary(Profiling.exportJSON(args.profile)):
+                print(line)
+    return run(args)
+
+def run(args):
+    if args.fen is None:
+        return 0 if runSuite(2 if args.quick else None, args.engine) else 1
+
+    if args.divide:
+        gs = ChessEngine.createGameState(args.fen, args.engine)
+        start = time.perf_counter()
+        result = perftDivide(gs, args.depth)
+        seconds = time.perf_counter() - start
+        for move, nodes in sorted(result.items()):
+            print("%s: %d" % (move, nodes))
+        nodes = sum(result.values())
+    else:
+        nodes, seconds = timedPerft(args.fen, args.depth, args.engine)
+    print("nodes %d  time %.3fs  nps %.0f" % (nodes, seconds, nodes / seconds if seconds > 0 else 0))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
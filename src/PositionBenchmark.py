@@ -0,0 +1,78 @@
+"""
+Benchmark of the ways to hand a position to another process: the compact binary encoding (GameState.toBytes and
+GameState.fromBytes), clone(), a FEN round trip and pickling the whole game state. Reports microseconds per
+round trip and the size of what has to be sent.
+
+The positions are taken from a few random games, each with its move log, as they would be in the UI.
+
+Usage (from the src folder):
+    python3 PositionBenchmark.py
+    python3 PositionBenchmark.py -n 2000 --engine bitboard
+"""
+import argparse
+import pickle
+import random
+import sys
+import time
+
+import ChessEngine
+
+'''
+game states (with their move logs) of random games, one per ply
+'''
+def samplePositions(count, engine="mailbox", seed=1):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        gs = ChessEngine.createGameState(None, engine)
+        for _ in range(80):
+            moves = gs.getValidMoves()
+            if not moves or len(positions) == count:
+                break
+            gs.makeMove(rng.choice(moves))
+            positions.append(ChessEngine.createGameState(None, engine))
+            for move in gs.moveLog:
+                positions[-1].makeMove(move)
+    return positions
+
+'''
+[(name, seconds per round trip, bytes per position or None)] of every method
+'''
+def benchmark(positions, engine="mailbox"):
+    cls = ChessEngine.gameStateClass(engine)
+    methods = [
+        ("toBytes/fromBytes", lambda gs: cls.fromBytes(gs.toBytes()), lambda gs: len(gs.toBytes())),
+        ("encode only", lambda gs: gs.toBytes(), None),
+        ("decode only", None, None),
+        ("clone", lambda gs: gs.clone(), None),
+        ("FEN round trip", lambda gs: ChessEngine.createGameState(gs.getFEN(), engine), lambda gs: len(gs.getFEN())),
+        ("pickle round trip", lambda gs: pickle.loads(pickle.dumps(gs)), lambda gs: len(pickle.dumps(gs))),
+    ]
+    encoded = [gs.toBytes() for gs in positions]
+    results = []
+    for name, roundTrip, size in methods:
+        start = time.perf_counter()
+        if roundTrip is None: # decode only
+            for data in encoded:
+                cls.fromBytes(data)
+        else:
+            for gs in positions:
+                roundTrip(gs)
+        seconds = (time.perf_counter() - start) / len(positions)
+        averageSize = sum(size(gs) for gs in positions) / len(positions) if size is not None else None
+        results.append((name, seconds, averageSize))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="speed of the position encodings")
+    parser.add_argument("-n", "--positions", type=int, default=1000, help="number of positions")
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox")
+    args = parser.parse_args(argv)
+
+    positions = samplePositions(args.positions, args.engine)
+    for name, seconds, size in benchmark(positions, args.engine):
+        print("%-20s %9.1f us%s" % (name, seconds * 1e6, "   %6.0f bytes" % size if size is not None else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
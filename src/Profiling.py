@@ -0,0 +1,178 @@
+"""
+Counters and optional timers for the engine core, for finding out where the time of a perft or a search goes
+without running cProfile over everything.
+
+enable() swaps instrumented wrappers in for the hot methods of both board engines and for Search.run; disable()
+puts the originals back. While disabled nothing is wrapped, so the engine runs at full speed: there are no checks
+in the hot loops.
+
+Counted: calls of makeMove, undoMove, getValidMoves, checkForPinsAndChecks and squareUnderAttack (attackersTo for
+the bitboard engine), the legal moves getValidMoves returned per piece type, and per search the nodes, quiescence
+nodes, transposition table probes and hits and beta cutoffs. enable(timing=True) also times every move generation
+phase (getValidMoves as a whole, pins and checks, the attack map, every piece generator).
+
+    Profiling.enable(timing=True)
+    ... perft or search ...
+    Profiling.exportJSON("profile.json")    # or Profiling.snapshot() for the dict
+    Profiling.disable()
+"""
+import json
+import time
+
+import ChessEngine
+
+# methods that are counted (and timed with timing=True) where the class has them
+COUNTED = ("makeMove", "undoMove", "getValidMoves", "checkForPinsAndChecks", "squareUnderAttack", "attackersTo")
+# move generation phases that are only wrapped for timing
+TIMED_PHASES = ("getAttackMap", "getAllPossibleMoves", "_getPawnMoves", "_getCastleMoves")
+SEARCH_COUNTERS = ("searches", "nodes", "qnodes", "ttProbes", "ttHits", "cutoffs", "firstMoveCutoffs")
+
+calls = {}
+generatedMoves = {}
+search = {}
+timers = {} # name: [calls, seconds]
+patches = [] # (owner, attribute, original value) to restore
+startTime = 0.0
+
+def enabled():
+    return bool(patches)
+
+'''
+zeroes all counters and timers
+'''
+def reset():
+    global startTime
+    calls.clear()
+    generatedMoves.clear()
+    search.clear()
+    search.update((name, 0) for name in SEARCH_COUNTERS)
+    timers.clear()
+    startTime = time.perf_counter()
+
+def patch(owner, attribute, value):
+    patches.append((owner, attribute, getattr(owner, attribute)))
+    setattr(owner, attribute, value)
+
+def countedMethod(name, method):
+    calls[name] = 0
+    def wrapper(*args):
+        calls[name] += 1
+        return method(*args)
+    return wrapper
+
+def timedMethod(name, method, counted):
+    if counted:
+        calls[name] = 0
+    timer = timers.setdefault(name, [0, 0.0])
+    def wrapper(*args):
+        if counted:
+            calls[name] += 1
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            timer[0] += 1
+            timer[1] += time.perf_counter() - start
+    return wrapper
+
+'''
+getValidMoves also counts the moves it returns per piece type
+'''
+def countingValidMoves(method):
+    def wrapper(self):
+        moves = method(self)
+        for move in moves:
+            pieceType = move.pieceMoved[1]
+            generatedMoves[pieceType] = generatedMoves.get(pieceType, 0) + 1
+        return moves
+    return wrapper
+
+def instrumentSearchRun(run):
+    def wrapper(self, validMoves, newSearch=True):
+        tt = self.tt
+        probes, hits = tt.probes, tt.hits
+        try:
+            return run(self, validMoves, newSearch)
+        finally:
+            search["searches"] += 1
+            search["nodes"] += self.nodes
+            search["qnodes"] += self.qnodes
+            search["ttProbes"] += tt.probes - probes
+            search["ttHits"] += tt.hits - hits
+            search["cutoffs"] += self.cutoffs
+            search["firstMoveCutoffs"] += self.firstMoveCutoffs
+    return wrapper
+
+'''
+swaps the instrumented methods in and resets the counters; timing=True also times the move generation phases
+'''
+def enable(timing=False):
+    import AI
+    import BitboardEngine
+    if patches:
+        disable()
+    reset()
+    for cls in (ChessEngine.GameState, BitboardEngine.BitboardGameState):
+        for name in COUNTED:
+            if name in cls.__dict__:
+                method = cls.__dict__[name]
+                if name == "getValidMoves":
+                    method = countingValidMoves(method)
+                patch(cls, name, timedMethod(name, method, True) if timing else countedMethod(name, method))
+        if timing:
+            for name in TIMED_PHASES:
+                if name in cls.__dict__:
+                    patch(cls, name, timedMethod(name, cls.__dict__[name], False))
+    if timing: # the piece generators of the mailbox engine are called through the moveFunctions table
+        patch(ChessEngine.GameState, "moveFunctions",
+              {piece: timedMethod("generate" + piece, function, False)
+               for piece, function in ChessEngine.GameState.moveFunctions.items()})
+    patch(AI.Search, "run", instrumentSearchRun(AI.Search.run))
+
+'''
+puts the original methods back, the counters keep their values
+'''
+def disable():
+    while patches:
+        owner, attribute, original = patches.pop()
+        setattr(owner, attribute, original)
+
+'''
+the counters as a dict that can be written as JSON
+'''
+def snapshot():
+    result = {"elapsed": time.perf_counter() - startTime, "calls": dict(calls),
+              "generatedMoves": dict(generatedMoves), "search": dict(search)}
+    if timers:
+        result["timing"] = {name: {"calls": count, "seconds": seconds,
+                                   "microsecondsPerCall": 1e6 * seconds / count if count else 0.0}
+                            for name, (count, seconds) in timers.items()}
+    return result
+
+'''
+writes snapshot() as JSON to a path or a text file object
+'''
+def exportJSON(target):
+    data = snapshot()
+    if hasattr(target, "write"):
+        json.dump(data, target, indent=2)
+    else:
+        with open(target, "w") as f:
+            json.dump(data, f, indent=2)
+    return data
+
+'''
+a few lines for the console: calls, moves per piece type, search statistics and the timed phases by total time
+'''
+def summary(data=None):
+    data = data if data is not None else snapshot()
+    lines = ["calls: " + ", ".join("%s %d" % item for item in data["calls"].items() if item[1])]
+    if data["generatedMoves"]:
+        lines.append("moves by piece: " + ", ".join("%s %d" % item for item in sorted(data["generatedMoves"].items())))
+    if data["search"]["searches"]:
+        lines.append("search: " + ", ".join("%s %d" % item for item in data["search"].items()))
+    for name, entry in sorted(data.get("timing", {}).items(), key=lambda item: -item[1]["seconds"]):
+        if entry["calls"]:
+            lines.append("  %-22s %9d calls %8.3fs %8.2f us/call" %
+                         (name, entry["calls"], entry["seconds"], entry["microsecondsPerCall"]))
+    return lines
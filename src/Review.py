@@ -0,0 +1,231 @@
+"""
+Headless batch review of PGN games.
+
+Every game is replayed through GameState; every position of it is searched to a fixed depth (in a pool of worker
+processes) and each move is compared with the best move of its position: the centipawns it loses decide whether it
+was the best move, good, an inaccuracy, a mistake or a blunder. The result is written as JSON lines, one object per
+move (or per game that could not be replayed).
+
+Search results are kept in an on-disk cache (SQLite) keyed by position key and depth, so positions that were
+already reviewed, like the common openings of a game collection, are not searched again. The repetition history of
+a position is not part of the key. Searches that did not complete depth 1 within maxTime are not cached.
+
+Usage (from the src folder):
+    python3 Review.py games.pgn -o review.jsonl -d 3 -w 4
+    python3 Review.py games.pgn --cache review-cache.sqlite   # cache somewhere else (default: the current directory)
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+import AI
+import ChessEngine
+import PGN
+from Perft import uciNotation
+
+BATCH_GAMES = 32 # games whose positions are searched together
+CACHE_FILE = "review-cache.sqlite" # in the current directory unless --cache says otherwise
+SCORE_CAP = 2000 # mate scores count as this much when the loss of a move is computed
+# loss in centipawns from which a move is classified as
+INACCURACY = 50
+MISTAKE = 100
+BLUNDER = 300
+
+'''
+On-disk results of earlier reviews: (score, best move) of a position searched to a depth, by position key. The key
+is the Zobrist key of the position only: the game history before it (repetitions, the fifty-move clock) is not part
+of it, so a position reached again in another game gets the score of the first search even if its history would
+make a repetition draw available
+'''
+class ReviewCache():
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS analysis (key INTEGER, depth INTEGER, score INTEGER, "
+                                "best TEXT, PRIMARY KEY (key, depth))")
+        self.lookups = 0
+        self.hits = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    '''
+    (score, best move) of the deepest result of at least depth, or None
+    '''
+    def get(self, key, depth):
+        self.lookups += 1
+        row = self.connection.execute("SELECT score, best FROM analysis WHERE key = ? AND depth >= ? "
+                                      "ORDER BY depth DESC LIMIT 1", (signed(key), depth)).fetchone()
+        if row is not None:
+            self.hits += 1
+        return row
+
+    def put(self, key, depth, score, best):
+        self.connection.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?)",
+                                (signed(key), depth, score, best))
+
+    def commit(self):
+        self.connection.commit()
+
+    def hitRate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+'''
+SQLite integers are signed 64 bit
+'''
+def signed(key):
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+'''
+searches one position (runs in the worker processes): returns (score for the side to move, best move in UCI
+notation or None, depth completed)
+'''
+def analysePosition(task):
+    position, depth, maxTime = task
+    gs = AI.restorePosition(position)
+    validMoves = gs.getValidMoves()
+    if not validMoves:
+        return (-AI.CHECKMATE if gs.inCheck else AI.DRAW), None, depth
+    search = AI.Search(gs, depth, maxTime, info=lambda info: None)
+    move = search.run(validMoves)
+    completedDepth = search.completedDepth
+    if abs(search.bestScore) > AI.MATE_THRESHOLD: # the search stops early at a forced mate, which no depth changes
+        completedDepth = max(completedDepth, depth)
+    return search.bestScore, uciNotation(move), completedDepth
+
+'''
+the class of a move by the centipawns it loses
+'''
+def classify(loss, played, best):
+    if played == best:
+        return "best"
+    if loss >= BLUNDER:
+        return "blunder"
+    if loss >= MISTAKE:
+        return "mistake"
+    if loss >= INACCURACY:
+        return "inaccuracy"
+    return "good"
+
+def capScore(score):
+    return max(-SCORE_CAP, min(SCORE_CAP, score))
+
+'''
+replays a game: returns [(san, uci, key, position, whiteToMove), ...] for every move with the position before it,
+and a last entry (None, None, ...) for the position after the game; raises ValueError if a move is illegal
+'''
+def replay(game, engine):
+    gs = ChessEngine.createGameState(game.startFEN(), engine)
+    plies = []
+    for san in game.sanMoves:
+        key, position = gs.zobristKey, AI.positionOf(gs)
+        move = PGN.sanToMove(gs, san, gs.getValidMoves())
+        plies.append((san, uciNotation(move), key, position, gs.whiteToMove))
+        gs.makeMove(move)
+    plies.append((None, None, gs.zobristKey, AI.positionOf(gs), gs.whiteToMove))
+    return plies
+
+'''
+reviews every game of a PGN file, writes the JSON lines to out and returns the statistics
+'''
+def reviewGames(path, out, depth=3, maxTime=None, workers=1, cachePath=CACHE_FILE, engine="mailbox"):
+    cache = ReviewCache(cachePath)
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 1 else None
+    stats = {"games": 0, "errors": 0, "positions": 0, "searched": 0}
+    start = time.perf_counter()
+    try:
+        batch = []
+        for gameIndex, game in enumerate(PGN.readGames(path)):
+            batch.append((gameIndex, game))
+            if len(batch) == BATCH_GAMES:
+                reviewBatch(batch, out, depth, maxTime, pool, cache, engine, stats)
+                batch = []
+        if batch:
+            reviewBatch(batch, out, depth, maxTime, pool, cache, engine, stats)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        cache.close()
+    stats["seconds"] = time.perf_counter() - start
+    stats["positionsPerSecond"] = stats["positions"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    stats["cacheHitRate"] = cache.hitRate()
+    return stats
+
+def reviewBatch(batch, out, depth, maxTime, pool, cache, engine, stats):
+    # replay the games and collect the positions that are not in the cache yet
+    replayed = []
+    results = {}
+    missing = {}
+    for gameIndex, game in batch:
+        try:
+            plies = replay(game, engine)
+        except ValueError as e:
+            replayed.append((gameIndex, game, None, str(e)))
+            continue
+        replayed.append((gameIndex, game, plies, None))
+        for _, _, key, position, _ in plies:
+            stats["positions"] += 1
+            if key in results or key in missing:
+                continue
+            cached = cache.get(key, depth)
+            if cached is not None:
+                results[key] = cached
+            else:
+                missing[key] = position
+
+    # search the new positions, in the pool if there is one
+    tasks = [(position, depth, maxTime) for position in missing.values()]
+    analyses = pool.imap(analysePosition, tasks, chunksize=4) if pool is not None else map(analysePosition, tasks)
+    for key, (score, best, completedDepth) in zip(missing, analyses):
+        results[key] = (score, best)
+        if completedDepth > 0: # a search stopped by maxTime inside depth 1 has no result worth keeping
+            cache.put(key, completedDepth, score, best)
+        stats["searched"] += 1
+    cache.commit()
+
+    for gameIndex, game, plies, error in replayed:
+        stats["games"] += 1
+        if error is not None:
+            stats["errors"] += 1
+            out.write(json.dumps({"game": gameIndex, "event": game.tags.get("Event"), "error": error}) + "\n")
+            continue
+        for ply in range(len(plies) - 1):
+            san, played, key, _, whiteToMove = plies[ply]
+            score, best = results[key]
+            after = -results[plies[ply + 1][2]][0] # the next position is scored for the opponent
+            loss = max(0, capScore(score) - capScore(after))
+            sign = 1 if whiteToMove else -1
+            out.write(json.dumps({"game": gameIndex, "ply": ply + 1, "move": san, "uci": played, "best": best,
+                                  "score": sign * score, "scoreAfter": sign * after, "loss": loss,
+                                  "class": classify(loss, played, best)}) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="review the moves of PGN games with the engine")
+    parser.add_argument("pgn", help="PGN file")
+    parser.add_argument("-o", "--output", help="JSON lines file (default: standard output)")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="search depth per position")
+    parser.add_argument("-t", "--time", type=float, help="seconds per position at most")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--cache", default=CACHE_FILE, help="SQLite file of the result cache")
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        stats = reviewGames(args.pgn, out, args.depth, args.time, args.workers, args.cache, args.engine)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    sys.stderr.write("%d games (%d not replayable), %d positions (%d searched) in %.2fs: %.1f positions/s, "
+                     "cache hit rate %.1f%%\n" % (stats["games"], stats["errors"], stats["positions"],
+                                                  stats["searched"], stats["seconds"], stats["positionsPerSecond"],
+                                                  100 * stats["cacheHitRate"]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
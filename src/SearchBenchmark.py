@@ -0,0 +1,110 @@
+"""
+Benchmark of the parallel search: searches a few positions for a fixed time with 1, 2, ... N worker processes and
+reports the total nodes per second of all processes and the speedup over a single process.
+
+With --depth it measures the move ordering instead: every position is searched to that depth by a single process,
+and the nodes needed for each depth, the effective branching factor and the cutoff rates are reported.
+
+Usage (from the src folder):
+    python3 SearchBenchmark.py                 # 1 .. cpu count workers, 5 seconds per position
+    python3 SearchBenchmark.py -w 4 -t 10
+    python3 SearchBenchmark.py -d 5             # nodes to depth 5
+    python3 SearchBenchmark.py -d 4 --profile search.json   # plus engine call counters as JSON
+"""
+import argparse
+import os
+import sys
+import time
+
+import AI
+import ChessEngine
+import Profiling
+
+POSITIONS = [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+'''
+searches every position for seconds with the given number of workers, returns (nodes, seconds)
+'''
+def benchmark(workers, seconds, engine="mailbox"):
+    if workers > 1:
+        # start the helper processes before the clock runs
+        pool = AI.getWorkerPool(workers)
+        pool.map(abs, range(workers - 1))
+    totalNodes = 0
+    totalTime = 0.0
+    for fen in POSITIONS:
+        AI.getTranspositionTable().clear()
+        gs = ChessEngine.createGameState(fen, engine)
+        validMoves = gs.getValidMoves()
+        if workers > 1:
+            search = AI.ParallelSearch(gs, AI.MAX_DEPTH, seconds, None, workers, info=lambda info: None)
+        else:
+            search = AI.Search(gs, AI.MAX_DEPTH, seconds, info=lambda info: None)
+        start = time.perf_counter()
+        search.run(validMoves)
+        totalTime += time.perf_counter() - start
+        totalNodes += search.nodes
+    return totalNodes, totalTime
+
+'''
+searches every position to a fixed depth, prints the nodes to each depth and the move ordering statistics
+'''
+def orderingBenchmark(depth, engine="mailbox", out=sys.stdout):
+    totalNodes = 0
+    for fen in POSITIONS:
+        AI.getTranspositionTable().clear()
+        gs = ChessEngine.createGameState(fen, engine)
+        search = AI.Search(gs, depth, info=lambda info: None)
+        start = time.perf_counter()
+        search.run(gs.getValidMoves())
+        elapsed = time.perf_counter() - start
+        totalNodes += search.nodes
+        out.write("%s\n" % fen)
+        out.write("  nodes to depth %s\n" % " ".join(str(nodes) for nodes in search.depthNodes))
+        out.write("  %d nodes (%d quiescence)  %.2fs  branching factor %.2f  cutoff rate %.2f  "
+                  "first move cutoffs %.2f\n" % (search.nodes, search.qnodes, elapsed, search.branchingFactor(),
+                                                  search.cutoffRate(), search.firstMoveCutoffRate()))
+    out.write("total %d nodes to depth %d\n" % (totalNodes, depth))
+    return totalNodes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="nodes/second of AI.findBestMove for 1 .. N worker processes")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="largest worker count")
+    parser.add_argument("-t", "--time", type=float, default=5.0, help="seconds per position")
+    parser.add_argument("-d", "--depth", type=int, help="search to this depth and report the move ordering")
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox")
+    parser.add_argument("--profile", metavar="PATH", help="count engine calls and write them as JSON to PATH")
+    parser.add_argument("--profile-timing", action="store_true", help="with --profile: also time the move generation")
+    args = parser.parse_args(argv)
+    if args.profile:
+        Profiling.enable(timing=args.profile_timing)
+        try:
+            return run(args)
+        finally:
+            Profiling.disable()
+            for line in Profiling.summary(Profiling.exportJSON(args.profile)):
+                print(line)
+    return run(args)
+
+def run(args):
+    if args.depth:
+        orderingBenchmark(args.depth, args.engine)
+        return 0
+
+    baseline = None
+    for workers in range(1, args.workers + 1):
+        nodes, seconds = benchmark(workers, args.time, args.engine)
+        nps = nodes / seconds if seconds > 0 else 0
+        if baseline is None:
+            baseline = nps
+        print("workers %2d  %10d nodes  %7.2fs  %9.0f nps  speedup %.2f" %
+              (workers, nodes, seconds, nps, nps / baseline if baseline else 0))
+    AI.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
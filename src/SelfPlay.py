@@ -0,0 +1,314 @@
+"""
+Self-play tournament between two engine configurations, for tuning: plays games in parallel in worker processes,
+writes them to a PGN file and stops early once a sequential probability ratio test (SPRT) decides between "the first
+configuration is not stronger" (elo0) and "it is at least elo1 stronger".
+
+A configuration is "random" (AI.findRandomMove) or comma separated limits of AI.Search:
+    depth=3            search depth
+    nodes=20000        node limit per move
+    time=0.1           seconds per move
+    hash=4             transposition table MB (each configuration has its own table)
+With --tc the players also have a game clock (base+increment seconds) and budget every move from it like UCI does;
+a player whose clock runs out loses on time.
+
+Every opening of the suite is played twice with colors swapped. A suite file has one opening per line, either a FEN
+or moves in UCI notation (# starts a comment); the default suite is the lines of the test opening book.
+Games are adjudicated by the draw rules (stalemate, threefold repetition, fifty-move rule), as drawn when the
+endgame bitbases know the position is, and as drawn after --max-plies plies.
+
+Usage (from the src folder):
+    python3 SelfPlay.py depth=3 random -n 100
+    python3 SelfPlay.py depth=3 depth=2 -w 4 --tc 10+0.1 --pgn games.pgn --elo0 0 --elo1 50
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import AI
+import Bitbases
+import ChessEngine
+import OpeningBook
+import PGN
+import TranspositionTable
+from Perft import uciNotation
+from UCI import timeBudget
+
+MAX_PLIES = 300 # games still going after this many plies are drawn
+DEFAULT_HASH_MB = 4
+
+'''
+One engine configuration, built from its spec string. Every search needs a limit: depth, nodes or time in the spec,
+or the game clock (clock=True)
+'''
+class Player():
+
+    def __init__(self, spec, clock=False):
+        self.spec = spec
+        self.random = spec == "random"
+        self.depth = None
+        self.maxNodes = None
+        self.moveTime = None
+        self.hashSizeMB = DEFAULT_HASH_MB
+        if not self.random:
+            for item in spec.split(','):
+                name, _, value = item.strip().partition('=')
+                if not name:
+                    raise ValueError("unknown engine setting (empty item) in %r" % spec)
+                if name == "depth":
+                    self.depth = int(value)
+                elif name == "nodes":
+                    self.maxNodes = int(value)
+                elif name == "time":
+                    self.moveTime = float(value)
+                elif name == "hash":
+                    self.hashSizeMB = int(value)
+                else:
+                    raise ValueError("unknown engine setting %r in %r" % (name, spec))
+            if self.depth is None and self.maxNodes is None and self.moveTime is None and not clock:
+                raise ValueError("engine %r has no depth, nodes or time limit and there is no --tc clock" % spec)
+        self.tt = None
+
+    '''
+    returns (move, nodes searched); clockTime is the budget from the game clock (None without a clock)
+    '''
+    def chooseMove(self, gs, validMoves, clockTime=None):
+        if self.random:
+            return AI.findRandomMove(validMoves), 0
+        if self.tt is None:
+            self.tt = TranspositionTable.TranspositionTable(self.hashSizeMB)
+        maxTime = self.moveTime
+        if clockTime is not None:
+            maxTime = clockTime if maxTime is None else min(maxTime, clockTime)
+        search = AI.Search(gs, self.depth, maxTime, self.maxNodes, self.tt, info=lambda info: None)
+        return search.run(validMoves), search.nodes
+
+'''
+the openings of a suite file: FEN strings, or lists of UCI moves from the start position
+'''
+def readOpenings(path):
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if line:
+                openings.append(line)
+    if not openings:
+        raise ValueError("no openings in " + path)
+    return openings
+
+'''
+a game state at the end of an opening, and the SAN of its moves
+'''
+def openingPosition(opening, engine):
+    if '/' in opening:
+        return ChessEngine.createGameState(opening, engine), []
+    gs = ChessEngine.createGameState(None, engine)
+    sanMoves = []
+    for uci in opening.split():
+        validMoves = gs.getValidMoves()
+        move = next((m for m in validMoves if uciNotation(m) == uci), None)
+        if move is None:
+            raise ValueError("illegal move %s in opening %r" % (uci, opening))
+        sanMoves.append(PGN.moveToSan(gs, move, validMoves))
+        gs.makeMove(move)
+    return gs, sanMoves
+
+'''
+plays one game (runs in the worker processes). Returns a dict with the result ("1-0", "0-1", "1/2-1/2"), the
+termination, the PGN text and the nodes and search seconds of both players
+'''
+def playGame(task):
+    number, opening, whiteSpec, blackSpec, timeControl, maxPlies, engine = task
+    clock = timeControl is not None
+    players = (Player(whiteSpec, clock), Player(blackSpec, clock)) # indexed by 0 white, 1 black
+    gs, sanMoves = openingPosition(opening, engine)
+    startFEN = gs.getFEN() if '/' in opening else None
+    startWhiteToMove, startMoveNumber = (gs.whiteToMove, gs.fullmoveNumber) if startFEN else (True, 1)
+    clocks = [timeControl[0], timeControl[0]] if timeControl else None
+    nodes = [0, 0]
+    seconds = [0.0, 0.0]
+    plies = 0
+    while True:
+        validMoves = gs.getValidMoves()
+        side = 0 if gs.whiteToMove else 1
+        known = Bitbases.probe(gs)
+        if gs.checkmate:
+            result, termination = ("0-1" if gs.whiteToMove else "1-0"), "checkmate"
+        elif gs.stalemate:
+            result, termination = "1/2-1/2", "stalemate"
+        elif gs.repetition:
+            result, termination = "1/2-1/2", "threefold repetition"
+        elif gs.fiftyMoveRule:
+            result, termination = "1/2-1/2", "fifty-move rule"
+        elif known is not None and known[0] == Bitbases.DRAW:
+            result, termination = "1/2-1/2", "bitbase draw"
+        elif plies >= maxPlies:
+            result, termination = "1/2-1/2", "maximum length"
+        else:
+            budget = timeBudget(clocks[side], timeControl[1]) if clocks else None
+            start = time.perf_counter()
+            move, moveNodes = players[side].chooseMove(gs, validMoves, budget)
+            used = time.perf_counter() - start
+            nodes[side] += moveNodes
+            seconds[side] += used
+            if clocks:
+                clocks[side] -= used
+                if clocks[side] < 0:
+                    result, termination = ("0-1" if side == 0 else "1-0"), "time forfeit"
+                    break
+                clocks[side] += timeControl[1]
+            sanMoves.append(PGN.moveToSan(gs, move, validMoves))
+            gs.makeMove(move)
+            plies += 1
+            continue
+        break
+
+    tags = [("Event", "SelfPlay"), ("Site", "local"), ("Date", time.strftime("%Y.%m.%d")), ("Round", number + 1),
+            ("White", whiteSpec), ("Black", blackSpec), ("Result", result)]
+    if startFEN:
+        tags += [("SetUp", "1"), ("FEN", startFEN)]
+    tags += [("PlyCount", len(sanMoves)), ("Termination", termination)]
+    if timeControl:
+        tags.append(("TimeControl", "%g+%g" % timeControl))
+    text = PGN.gameText(tags, sanMoves, result, startWhiteToMove, startMoveNumber)
+    return {"number": number, "white": whiteSpec, "black": blackSpec, "result": result, "termination": termination,
+            "pgn": text, "plies": plies, "nodes": nodes, "seconds": seconds}
+
+'''
+Elo difference and its 95% margin of a (wins, draws, losses) score, from the first player's view
+'''
+def eloDifference(wins, draws, losses):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return scoreToElo(score), (scoreToElo(min(score + margin, 1)) - scoreToElo(max(score - margin, 0))) / 2
+
+def scoreToElo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def eloToScore(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+'''
+log-likelihood ratio of elo1 against elo0 for a (wins, draws, losses) score (normal approximation of the
+trinomial model)
+'''
+def sprtLLR(wins, draws, losses, elo0, elo1):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance == 0: # only one kind of result so far: count half a game of each kind for the variance
+        variance = ((wins + 0.5) * (1 - score) ** 2 + (draws + 0.5) * (0.5 - score) ** 2 +
+                    (losses + 0.5) * score ** 2) / (games + 1.5)
+    score0, score1 = eloToScore(elo0), eloToScore(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+'''
+the (lower, upper) LLR bounds of an SPRT with error rates alpha and beta
+'''
+def sprtBounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+'''
+the game tasks: every opening twice, the first configuration playing white in the even games
+'''
+def gameTasks(games, openings, first, second, timeControl, maxPlies, engine):
+    for number in range(games):
+        opening = openings[number // 2 % len(openings)]
+        white, black = (first, second) if number % 2 == 0 else (second, first)
+        yield (number, opening, white, black, timeControl, maxPlies, engine)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="self-play match between two engine configurations with SPRT")
+    parser.add_argument("first", help='engine configuration, e.g. "depth=3" or "random"')
+    parser.add_argument("second", help="the configuration it plays against")
+    parser.add_argument("-n", "--games", type=int, default=200, help="games at most")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--tc", help="game clock as base+increment seconds, e.g. 10+0.1")
+    parser.add_argument("--openings", help="opening suite file (FENs or UCI move lines)")
+    parser.add_argument("--pgn", default="selfplay.pgn", help="PGN output file")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="adjudicate as a draw after this many plies")
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT H0: Elo difference at most this")
+    parser.add_argument("--elo1", type=float, default=20.0, help="SPRT H1: Elo difference at least this")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--engine", choices=("mailbox", "bitboard"), default="mailbox")
+    args = parser.parse_args(argv)
+
+    timeControl = None
+    if args.tc:
+        base, _, increment = args.tc.partition('+')
+        timeControl = (float(base), float(increment or 0))
+    try: # check the specs before starting the workers
+        Player(args.first, timeControl is not None), Player(args.second, timeControl is not None)
+    except ValueError as e:
+        parser.error(str(e))
+    openings = readOpenings(args.openings) if args.openings else OpeningBook.TEST_LINES
+    lower, upper = sprtBounds(args.alpha, args.beta)
+
+    tasks = gameTasks(args.games, openings, args.first, args.second, timeControl, args.max_plies, args.engine)
+    pool = multiprocessing.get_context("spawn").Pool(args.workers) if args.workers > 1 else None
+    results = pool.imap_unordered(playGame, tasks) if pool is not None else map(playGame, tasks)
+    wins = draws = losses = 0
+    npsSums = [0.0, 0.0] # per game nps of the first and the second configuration
+    npsGames = [0, 0]
+    decision = None
+    start = time.perf_counter()
+    try:
+        with open(args.pgn, "w") as pgn:
+            for game in results:
+                pgn.write(game["pgn"])
+                firstIsWhite = game["number"] % 2 == 0
+                if game["result"] == "1/2-1/2":
+                    draws += 1
+                elif (game["result"] == "1-0") == firstIsWhite:
+                    wins += 1
+                else:
+                    losses += 1
+                for side in (0, 1):
+                    if game["seconds"][side] > 0 and game["nodes"][side]:
+                        player = side if firstIsWhite else 1 - side
+                        npsSums[player] += game["nodes"][side] / game["seconds"][side]
+                        npsGames[player] += 1
+                llr = sprtLLR(wins, draws, losses, args.elo0, args.elo1)
+                print("game %d: %s - %s %s (%s, %d plies)  +%d =%d -%d  LLR %.2f" %
+                      (game["number"] + 1, game["white"], game["black"], game["result"], game["termination"],
+                       game["plies"], wins, draws, losses, llr))
+                if llr >= upper:
+                    decision = "H1 accepted: %s is at least %g Elo stronger" % (args.first, args.elo1)
+                elif llr <= lower:
+                    decision = "H0 accepted: %s is not %g Elo stronger" % (args.first, args.elo1)
+                if decision:
+                    break
+    finally:
+        if pool is not None:
+            pool.terminate()
+    seconds = time.perf_counter() - start
+
+    games = wins + draws + losses
+    elo, margin = eloDifference(wins, draws, losses)
+    print()
+    print("%s vs %s: %d games, +%d =%d -%d, score %.1f%%, Elo %+.1f +/- %.1f" %
+          (args.first, args.second, games, wins, draws, losses,
+           100 * (wins + draws / 2) / games if games else 0, elo, margin))
+    print("SPRT elo0 %g elo1 %g: LLR %.2f (%.2f, %.2f) -> %s" %
+          (args.elo0, args.elo1, sprtLLR(wins, draws, losses, args.elo0, args.elo1), lower, upper,
+           decision or "no decision yet"))
+    print("%.1f games/minute in %.1fs" % (60 * games / seconds if seconds > 0 else 0, seconds))
+    for player, spec in enumerate((args.first, args.second)):
+        if npsGames[player]:
+            print("%s: %.0f nps per game" % (spec, npsSums[player] / npsGames[player]))
+    print("games written to " + args.pgn)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Fixed size transposition table for the AI search, indexed by GameState.zobristKey.
+
+The table lives in two flat arrays of unsigned 64-bit ints (one for the keys, one for the packed entry data), so its
+memory use is fixed by the size given in MB and does not grow during long analysis sessions. Entries are grouped
+in buckets of BUCKET_SIZE slots; a store replaces the slot with the same key, or else the slot that is worth the
+least (shallow entries from old searches go first).
+
+With shared=True the two arrays are placed in a multiprocessing.shared_memory block, so search processes can attach
+to the same table by name (see attach). Processes write without locking; the key slot holds key ^ data, so an
+entry torn by two concurrent writers no longer matches its key and is simply treated as a miss.
+
+Packed entry data (64 bits):
+    bits  0-15  best move (Move.moveID, 0 = no move)
+    bits 16-23  depth
+    bits 24-25  bound type (EXACT, LOWER_BOUND, UPPER_BOUND)
+    bits 26-31  age (search generation)
+    bits 32-63  score + SCORE_OFFSET
+"""
+from array import array
+from multiprocessing import shared_memory
+
+EXACT = 1
+LOWER_BOUND = 2 # score is at least this (fail high)
+UPPER_BOUND = 3 # score is at most this (fail low)
+
+BUCKET_SIZE = 2
+ENTRY_BYTES = 16 # 8 bytes key + 8 bytes data
+SCORE_OFFSET = 1 << 31
+AGE_MASK = 63
+KEY_MASK = (1 << 64) - 1
+
+'''
+number of entries that fit into sizeMB, rounded down to whole buckets and a power of two number of buckets
+'''
+def entryCountFor(sizeMB):
+    entries = max(BUCKET_SIZE, int(sizeMB * 1024 * 1024) // ENTRY_BYTES)
+    buckets = 1
+    while buckets * 2 * BUCKET_SIZE <= entries:
+        buckets *= 2
+    return buckets * BUCKET_SIZE
+
+class TranspositionTable():
+
+    def __init__(self, sizeMB=16, shared=False):
+        self.shared = shared
+        self.sharedMemory = None
+        self.owner = True
+        self.resize(sizeMB)
+
+    '''
+    allocates a new, empty table using at most sizeMB megabytes
+    '''
+    def resize(self, sizeMB):
+        self.close()
+        self.sizeMB = sizeMB
+        self.entryCount = entryCountFor(sizeMB)
+        self.bucketMask = self.entryCount // BUCKET_SIZE - 1
+        if self.shared:
+            self.sharedMemory = shared_memory.SharedMemory(create=True, size=ENTRY_BYTES * self.entryCount)
+            self.owner = True
+            self.mapSharedMemory()
+        else:
+            self.keys = array('Q', bytes(8 * self.entryCount))
+            self.data = array('Q', bytes(8 * self.entryCount))
+        self.age = 0
+        self.resetStats()
+
+    '''
+    opens the shared table created by another process under the given name
+    '''
+    @classmethod
+    def attach(cls, name, sizeMB):
+        table = cls.__new__(cls)
+        table.shared = True
+        table.owner = False
+        table.sizeMB = sizeMB
+        table.entryCount = entryCountFor(sizeMB)
+        table.bucketMask = table.entryCount // BUCKET_SIZE - 1
+        table.sharedMemory = shared_memory.SharedMemory(name=name)
+        table.mapSharedMemory()
+        table.age = 0
+        table.resetStats()
+        return table
+
+    def mapSharedMemory(self):
+        half = 8 * self.entryCount
+        buffer = self.sharedMemory.buf
+        keyBytes = buffer[:half]
+        dataBytes = buffer[half:2 * half]
+        self.keys = keyBytes.cast('Q')
+        self.data = dataBytes.cast('Q')
+        # every view on the block has to be released before it can be closed
+        self.views = [self.keys, self.data, keyBytes, dataBytes]
+
+    @property
+    def name(self):
+        return self.sharedMemory.name if self.sharedMemory is not None else None
+
+    '''
+    releases the shared memory block (and removes it if this table created it)
+    '''
+    def close(self):
+        if self.sharedMemory is None:
+            return
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.sharedMemory.close()
+        if self.owner:
+            self.sharedMemory.unlink()
+        self.sharedMemory = None
+
+    def clear(self):
+        if self.shared:
+            # other processes are attached to this block, wipe it in place instead of reallocating
+            self.keys[:] = array('Q', bytes(8 * self.entryCount))
+            self.data[:] = array('Q', bytes(8 * self.entryCount))
+            self.resetStats()
+        else:
+            self.resize(self.sizeMB)
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0 # stores that evicted a different position
+
+    '''
+    called at the start of every search, entries of older searches become the first to be replaced
+    '''
+    def newSearch(self):
+        self.age = (self.age + 1) & AGE_MASK
+
+    '''
+    returns (depth, score, bound, moveID) of the stored entry for the key, or None
+    '''
+    def probe(self, key):
+        self.probes += 1
+        key &= KEY_MASK
+        index = (key & self.bucketMask) * BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+        for i in range(index, index + BUCKET_SIZE):
+            value = data[i]
+            if keys[i] ^ value == key:
+                if value:
+                    self.hits += 1
+                    return ((value >> 16) & 0xFF, (value >> 32) - SCORE_OFFSET, (value >> 24) & 3, value & 0xFFFF)
+        return None
+
+    '''
+    stores a search result; an entry for the same position keeps its best move if the new result has none
+    '''
+    def store(self, key, depth, score, bound, moveID=0):
+        self.stores += 1
+        key &= KEY_MASK
+        index = (key & self.bucketMask) * BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+        age = self.age
+        replace = -1
+        worstValue = None
+        for i in range(index, index + BUCKET_SIZE):
+            value = data[i]
+            if keys[i] ^ value == key or value == 0:
+                replace = i
+                if value and moveID == 0:
+                    moveID = value & 0xFFFF
+                break
+            # older generations count as shallower
+            entryAge = (value >> 26) & AGE_MASK
+            worth = ((value >> 16) & 0xFF) - 4 * ((age - entryAge) & AGE_MASK)
+            if worstValue is None or worth < worstValue:
+                worstValue = worth
+                replace = i
+        else:
+            self.overwrites += 1
+        value = (moveID & 0xFFFF) | (min(max(depth, 0), 255) << 16) | (bound << 24) | (age << 26) | \
+                ((score + SCORE_OFFSET) << 32)
+        data[replace] = value
+        keys[replace] = key ^ value
+
+    '''
+    share of probes that found their position
+    '''
+    def hitRate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    '''
+    share of used entries, estimated from the first 1000 slots like the UCI hashfull value
+    '''
+    def fill(self):
+        sample = min(1000, self.entryCount)
+        used = 0
+        for i in range(sample):
+            if self.data[i]:
+                used += 1
+        return used / sample
+
+    def stats(self):
+        return {"sizeMB": self.sizeMB, "entries": self.entryCount, "probes": self.probes, "hits": self.hits,
+                "hitRate": self.hitRate(), "stores": self.stores, "overwrites": self.overwrites, "fill": self.fill()}
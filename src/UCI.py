@@ -0,0 +1,312 @@
+"""
+Headless UCI front-end: plays through ChessEngine and AI over stdin/stdout, for chess GUIs, tournament managers
+and batch jobs. It does not import pygame.
+
+Supported: uci, isready, ucinewgame, setoption (Hash, Threads, OwnBook, Engine), position startpos|fen ... moves
+..., go (searchmoves, depth, nodes, mate, movetime, wtime, btime, winc, binc, movestogo, infinite, ponder), stop,
+ponderhit, quit.
+While searching, an info line (depth, score, nodes, nps, time, pv) is sent after every completed iteration.
+
+The engine modules are only imported once the first command after uci needs them, so uciok comes back right after
+the interpreter has started; --startup measures that time.
+
+Usage (from the src folder):
+    python3 -m UCI                   # speak UCI on stdin/stdout
+    python3 -m UCI --startup 10      # time from process start to uciok, best of 10 runs
+"""
+import sys
+import threading
+import time
+
+NAME = "Chess Engine in Python"
+AUTHOR = "the Chess Engine in Python authors"
+HASH_SIZE_MB = 16 # default of the Hash option (AI.HASH_SIZE_MB), kept here so uci does not import AI
+MOVE_OVERHEAD = 0.05 # seconds kept back from every move for the GUI and the process pipes
+MOVES_TO_GO = 30 # moves the remaining time is divided over when the GUI does not say
+OPTIONS = [
+    "option name Hash type spin default %d min 1 max 4096" % HASH_SIZE_MB,
+    "option name Threads type spin default 1 min 1 max 64",
+    "option name OwnBook type check default true",
+    "option name Ponder type check default false",
+    "option name Engine type combo default mailbox var mailbox var bitboard",
+]
+
+'''
+seconds to spend on a move with remaining seconds on the clock, increment seconds per move and movesToGo moves until
+the next time control (None: unknown)
+'''
+def timeBudget(remaining, increment=0.0, movesToGo=None):
+    budget = remaining / (movesToGo or MOVES_TO_GO) + increment * 0.75
+    budget = min(budget, remaining / 2) - MOVE_OVERHEAD
+    return max(budget, 0.01)
+
+'''
+UCI score of a search score: "cp <centipawns>" or "mate <moves>" (negative when the engine gets mated)
+'''
+def scoreText(score, checkmate, mateThreshold):
+    if score > mateThreshold:
+        return "mate %d" % ((checkmate - score + 1) // 2)
+    if score < -mateThreshold:
+        return "mate %d" % -((checkmate + score) // 2)
+    return "cp %d" % score
+
+GO_FLAGS = ("infinite", "ponder")
+GO_VALUES = ("wtime", "btime", "winc", "binc", "movestogo", "depth", "nodes", "mate", "movetime")
+
+'''
+the parameters of a go command: True for the flags, an int for the keywords with a value, the list of moves after
+searchmoves (up to the next keyword). Unknown tokens and values that are not numbers are skipped
+'''
+def parseGo(args):
+    params = {}
+    i = 0
+    while i < len(args):
+        token = args[i]
+        i += 1
+        if token in GO_FLAGS:
+            params[token] = True
+        elif token in GO_VALUES:
+            if i < len(args) and args[i].lstrip('-').isdigit():
+                params[token] = int(args[i])
+                i += 1
+        elif token == "searchmoves":
+            moves = params.setdefault("searchmoves", [])
+            while i < len(args) and args[i] not in GO_FLAGS and args[i] not in GO_VALUES:
+                moves.append(args[i])
+                i += 1
+    return params
+
+class UCIEngine():
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.outputLock = threading.Lock()
+        self.engineName = "mailbox"
+        self.hashSizeMB = HASH_SIZE_MB
+        self.threads = 1
+        self.ownBook = True
+        self.gs = None
+        self.search = None
+        self.thread = None
+        self.release = threading.Event() # set when the search may send its bestmove (not pondering or infinite)
+        self.ponderTime = None # time budget applied at ponderhit
+        self.commands = {"uci": self.uci, "isready": self.isready, "ucinewgame": self.ucinewgame,
+                         "setoption": self.setoption, "position": self.position, "go": self.go, "stop": self.stop,
+                         "ponderhit": self.ponderhit}
+
+    def send(self, line):
+        with self.outputLock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    '''
+    handles one command line, returns False on quit
+    '''
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        if tokens[0] == "quit":
+            self.stop([])
+            return False
+        command = self.commands.get(tokens[0])
+        if command is not None:
+            command(tokens[1:])
+        return True
+
+    def loop(self, source=sys.stdin):
+        for line in source:
+            if not self.handle(line):
+                break
+        self.stop([])
+
+    def uci(self, args):
+        self.send("id name " + NAME)
+        self.send("id author " + AUTHOR)
+        for option in OPTIONS:
+            self.send(option)
+        self.send("uciok")
+
+    '''
+    imports the engine and sets up the start position the first time it is needed
+    '''
+    def loadEngine(self):
+        if self.gs is None:
+            import ChessEngine
+            self.gs = ChessEngine.createGameState(None, self.engineName)
+
+    def isready(self, args):
+        self.loadEngine()
+        self.send("readyok")
+
+    def ucinewgame(self, args):
+        import AI
+        self.stop([])
+        AI.getTranspositionTable().clear()
+        self.gs = None
+
+    def setoption(self, args):
+        # setoption name <name> [value <value>], names and values may contain spaces
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.replace("name", "", 1).strip().lower()
+        value = value.strip()
+        if name == "hash":
+            self.hashSizeMB = max(1, int(value))
+            import AI
+            AI.setHashSize(self.hashSizeMB)
+        elif name == "threads":
+            self.threads = max(1, int(value))
+        elif name == "ownbook":
+            self.ownBook = value.lower() == "true"
+        elif name == "engine" and value in ("mailbox", "bitboard"):
+            self.engineName = value
+            self.gs = None
+
+    def position(self, args):
+        import ChessEngine
+        from Perft import uciNotation
+        self.stop([])
+        if args and args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            gs = ChessEngine.createGameState(" ".join(args[1:end]), self.engineName)
+        else:
+            end = 1
+            gs = ChessEngine.createGameState(None, self.engineName)
+        for text in args[end + 1:]:
+            move = next((m for m in gs.getValidMoves() if uciNotation(m) == text), None)
+            if move is None:
+                self.send("info string illegal move " + text)
+                break
+            gs.makeMove(move)
+        self.gs = gs
+
+    def go(self, args):
+        import AI
+        self.stop([])
+        self.loadEngine()
+        params = parseGo(args)
+        gs = self.gs
+        depth = params.get("depth")
+        if depth is None and "mate" in params: # a mate in n moves is found by a search of 2n - 1 plies
+            depth = max(2 * params["mate"] - 1, 1)
+        maxNodes = params.get("nodes")
+        maxTime = None
+        if "movetime" in params:
+            maxTime = max(params["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+        else:
+            clock, increment = ("wtime", "winc") if gs.whiteToMove else ("btime", "binc")
+            if clock in params:
+                maxTime = timeBudget(params[clock] / 1000, params.get(increment, 0) / 1000, params.get("movestogo"))
+        waiting = params.get("infinite", False) or params.get("ponder", False)
+        if params.get("ponder"): # think on the opponent's time, the clock starts at ponderhit
+            self.ponderTime = maxTime
+            maxTime = None
+        if waiting:
+            self.release.clear()
+        else:
+            self.release.set()
+
+        gs = gs.clone()
+        if self.threads > 1:
+            search = AI.ParallelSearch(gs, depth, maxTime, maxNodes, self.threads, self.info)
+        else:
+            search = AI.Search(gs, depth, maxTime, maxNodes, info=self.info)
+        self.search = search
+        self.thread = threading.Thread(target=self.think, args=(gs, search, not waiting, params.get("searchmoves")),
+                                       daemon=True)
+        self.thread.start()
+
+    '''
+    runs in the search thread: searches (only searchMoves at the root if given), waits for stop or ponderhit if it
+    has to, and sends bestmove
+    '''
+    def think(self, gs, search, useBook, searchMoves=None):
+        import AI
+        from Perft import uciNotation
+        mainSearch = search.search if isinstance(search, AI.ParallelSearch) else search
+        validMoves = gs.getValidMoves()
+        if searchMoves:
+            allowed = [move for move in validMoves if uciNotation(move) in searchMoves]
+            if allowed: # none of them legal: search everything rather than nothing
+                validMoves = allowed
+                mainSearch.rootMoves = allowed
+        move = AI.findBookMove(gs, validMoves) if self.ownBook and useBook else None
+        if move is None:
+            move = search.run(validMoves)
+        self.release.wait()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        pv = mainSearch.pv
+        if len(pv) > 1 and pv[0] == move:
+            self.send("bestmove %s ponder %s" % (uciNotation(move), uciNotation(pv[1])))
+        else:
+            self.send("bestmove " + uciNotation(move))
+
+    def info(self, info):
+        import AI
+        from Perft import uciNotation
+        self.send("info depth %d score %s nodes %d nps %d time %d pv %s" %
+                  (info["depth"], scoreText(info["score"], AI.CHECKMATE, AI.MATE_THRESHOLD), info["nodes"],
+                   info["nps"], int(info["time"] * 1000), " ".join(uciNotation(move) for move in info["pvMoves"])))
+
+    '''
+    the opponent played the move pondered on: from now on the search runs on the normal clock
+    '''
+    def ponderhit(self, args):
+        search = self.search
+        if search is None:
+            return
+        import AI
+        mainSearch = search.search if isinstance(search, AI.ParallelSearch) else search
+        if self.ponderTime is not None:
+            mainSearch.deadline = time.perf_counter() + self.ponderTime
+        self.release.set() # if the search has already finished, bestmove goes out right away
+
+    def stop(self, args):
+        if self.search is not None:
+            self.search.stop()
+            self.release.set()
+            self.thread.join()
+            self.search = None
+            self.thread = None
+
+'''
+seconds from starting "python -m UCI" until it answers uciok, the best of runs
+'''
+def startupTime(runs):
+    import subprocess
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-m", "UCI"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   text=True)
+        process.stdin.write("uci\n")
+        process.stdin.flush()
+        for line in process.stdout:
+            if line.strip() == "uciok":
+                break
+        seconds = time.perf_counter() - start
+        process.stdin.write("quit\n")
+        process.stdin.flush()
+        process.wait()
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv: # a GUI starts the engine without arguments, skip the argparse import on that path
+        UCIEngine().loop()
+        return 0
+    import argparse
+    parser = argparse.ArgumentParser(description="UCI front-end of the engine")
+    parser.add_argument("--startup", type=int, metavar="RUNS", help="measure the time from process start to uciok")
+    args = parser.parse_args(argv)
+    if args.startup:
+        print("start to uciok: %.1f ms (best of %d)" % (1000 * startupTime(args.startup), args.startup))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Tests of Bitbases.probe against known results of KQK, KRK and KPK positions. The bitbases are generated files
+(python3 Bitbases.py); the tests of an endgame whose bitbase is missing are skipped.
+
+Usage (from the src folder):
+    python3 -m pytest test_bitbases.py
+"""
+import pytest
+
+import AI
+import Bitbases
+import ChessEngine
+from Bitbases import WIN, DRAW, LOSS
+
+def probe(fen):
+    name = "K" + next(ch for ch in fen.split()[0].upper() if ch in "QRP") + "K"
+    if Bitbases.getBitbase(name) is None:
+        pytest.skip("%s bitbase not generated" % name)
+    return Bitbases.probe(ChessEngine.GameState(fen))
+
+@pytest.mark.parametrize("fen, result, distance", [
+    ("7k/8/6K1/8/8/8/8/1Q6 w - - 0 1", WIN, 1), # Qb8#
+    ("Q6k/8/6K1/8/8/8/8/8 b - - 0 1", LOSS, 0), # mated
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", DRAW, 0), # stalemate
+    ("8/8/8/8/8/8/1Q6/k6K b - - 0 1", DRAW, 0), # Kxb2
+    ("7k/8/6K1/8/8/8/8/R7 w - - 0 1", WIN, 1), # Ra8#
+    ("r7/8/8/8/8/6k1/8/7K b - - 0 1", WIN, 1), # black rook: Ra1#
+    ("8/4P3/8/8/8/8/k7/4K3 w - - 0 1", WIN, None), # promotes
+    ("7k/8/8/8/P7/8/8/K7 w - - 0 1", WIN, None), # the black king is outside the square of the pawn
+    ("k7/8/8/8/8/8/P7/7K w - - 0 1", DRAW, 0), # rook pawn, the black king holds the corner
+    ("8/8/8/8/8/8/kP6/7K b - - 0 1", DRAW, 0), # Kxb2
+])
+def test_probe(fen, result, distance):
+    probed = probe(fen)
+    assert probed[0] == result
+    if distance is not None:
+        assert probed[1] == distance
+
+'''
+the longest mates: KQK in 10 moves, KRK in 16, so every won position with the strong side to move is mated within
+19 and 31 plies
+'''
+@pytest.mark.parametrize("fen, maxDistance", [
+    ("8/8/3k4/8/8/8/8/K6Q w - - 0 1", 19),
+    ("8/8/3k4/8/8/8/8/K6R w - - 0 1", 31),
+])
+def test_distance_bound(fen, maxDistance):
+    result, distance = probe(fen)
+    assert result == WIN
+    assert distance % 2 == 1 and distance <= maxDistance
+
+@pytest.mark.parametrize("fen", [
+    ChessEngine.START_FEN,
+    "4k3/8/8/8/8/8/8/4K2R w K - 0 1", # castling rights
+    "4k3/8/8/8/8/8/8/2B1KN2 w - - 0 1", # two pieces
+    "4k3/8/8/8/8/8/8/4KN2 w - - 0 1", # no bitbase for KNK
+])
+def test_probe_not_covered(fen):
+    assert Bitbases.probe(ChessEngine.GameState(fen)) is None
+
+def test_bare_kings():
+    assert Bitbases.probe(ChessEngine.GameState("4k3/8/8/8/8/8/8/4K3 w - - 0 1")) == (DRAW, 0)
+
+def test_bitbase_score():
+    fen = "7k/8/6K1/8/8/8/8/1Q6 w - - 0 1"
+    probe(fen)
+    assert AI.bitbaseScore(ChessEngine.GameState(fen), 3) == AI.CHECKMATE - 3 - 1
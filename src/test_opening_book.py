@@ -0,0 +1,115 @@
+"""
+Tests of the Polyglot book reader and writer on the small test book of OpeningBook.TEST_LINES.
+
+Usage (from the src folder):
+    python3 -m pytest test_opening_book.py
+"""
+import random
+
+import pytest
+
+import ChessEngine
+import OpeningBook
+from Perft import uciNotation
+
+START_KEY = 0x463B96181691FC9C # Polyglot key of the start position
+
+@pytest.fixture(scope="module")
+def book(tmp_path_factory):
+    path = tmp_path_factory.mktemp("books") / "test.bin"
+    OpeningBook.writeBook(str(path), OpeningBook.bookWeightsOf(OpeningBook.TEST_LINES))
+    book = OpeningBook.OpeningBook(str(path))
+    yield book
+    book.close()
+
+def movesOf(gs):
+    return {uciNotation(move): move for move in gs.getValidMoves()}
+
+def play(gs, line):
+    for uci in line.split():
+        gs.makeMove(movesOf(gs)[uci])
+    return gs
+
+'''
+every legal move of a few positions survives encodeMove -> moveIDOf
+'''
+@pytest.mark.parametrize("fen", [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 0 1",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+])
+def test_move_encoding_round_trip(fen):
+    gs = ChessEngine.GameState(fen)
+    for move in gs.getValidMoves():
+        assert OpeningBook.moveIDOf(OpeningBook.encodeMove(move), gs.board) == move.moveID
+
+def test_move_encoding():
+    moves = movesOf(ChessEngine.GameState())
+    assert OpeningBook.encodeMove(moves["e2e4"]) == 4 | 3 << 3 | 4 << 6 | 1 << 9
+    assert OpeningBook.encodeMove(moves["g1f3"]) == 5 | 2 << 3 | 6 << 6
+
+'''
+castling is written as the king taking its own rook: e1g1 as e1h1, e1c1 as e1a1, e8g8 as e8h8
+'''
+def test_castling_encoding():
+    gs = ChessEngine.GameState("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    moves = movesOf(gs)
+    assert OpeningBook.encodeMove(moves["e1g1"]) == 7 | 4 << 6
+    assert OpeningBook.encodeMove(moves["e1c1"]) == 0 | 4 << 6
+    gs = ChessEngine.GameState("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1")
+    moves = movesOf(gs)
+    assert OpeningBook.encodeMove(moves["e8g8"]) == 7 | 7 << 3 | 4 << 6 | 7 << 9
+    assert OpeningBook.moveIDOf(7 | 7 << 3 | 4 << 6 | 7 << 9, gs.board) == moves["e8g8"].moveID
+
+'''
+the promotion piece goes into bits 12-14 (1 N, 2 B, 3 R, 4 Q)
+'''
+def test_promotion_encoding():
+    gs = ChessEngine.GameState("8/4P3/8/8/8/8/k7/4K3 w - - 0 1")
+    moves = movesOf(gs)
+    base = 4 | 7 << 3 | 4 << 6 | 6 << 9
+    for piece, code in (("n", 1), ("b", 2), ("r", 3), ("q", 4)):
+        move = moves["e7e8" + piece]
+        assert OpeningBook.encodeMove(move) == base | code << 12
+        assert OpeningBook.moveIDOf(base | code << 12, gs.board) == move.moveID
+
+def test_probe_start_position(book):
+    gs = ChessEngine.GameState()
+    assert gs.zobristKey == START_KEY
+    weights = {uciNotation(move): weight for move, weight in book.probe(gs, gs.getValidMoves())}
+    assert weights == {"e2e4": 6, "d2d4": 3, "c2c4": 1}
+
+def test_probe_castling(book):
+    gs = play(ChessEngine.GameState(), "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6")
+    probed = book.probe(gs, gs.getValidMoves())
+    assert [(uciNotation(move), weight) for move, weight in probed] == [("e1g1", 2)]
+    assert probed[0][0].isCastleMove
+
+'''
+weighted choice only ever returns book moves of the position, about in proportion to their weights
+'''
+def test_choose_move_weighted(book):
+    gs = ChessEngine.GameState()
+    validMoves = gs.getValidMoves()
+    rng = random.Random(1)
+    counts = {}
+    for _ in range(2000):
+        move = book.chooseMove(gs, validMoves, rng)
+        assert move in validMoves
+        counts[uciNotation(move)] = counts.get(uciNotation(move), 0) + 1
+    assert set(counts) == {"e2e4", "d2d4", "c2c4"}
+    assert counts["e2e4"] > counts["d2d4"] > counts["c2c4"]
+
+def test_choose_move_miss(book):
+    gs = play(ChessEngine.GameState(), "a2a3")
+    assert book.entries(gs.zobristKey) == []
+    assert book.chooseMove(gs, gs.getValidMoves()) is None
+
+def test_empty_book(tmp_path):
+    path = tmp_path / "empty.bin"
+    OpeningBook.writeBook(str(path), {})
+    book = OpeningBook.OpeningBook(str(path))
+    gs = ChessEngine.GameState()
+    assert book.chooseMove(gs, gs.getValidMoves()) is None
+    book.close()
@@ -0,0 +1,48 @@
+"""
+Perft regression tests: the reference positions of Perft.POSITIONS at their cheap depths, on both board engines.
+
+Usage (from the src folder):
+    python3 -m pytest test_perft.py
+"""
+import pytest
+
+import ChessEngine
+from Perft import POSITIONS, perft, perftDivide
+
+ENGINES = ("mailbox", "bitboard")
+MAX_NODES = 100000 # deeper counts than this are left to python3 Perft.py
+
+CASES = [(name, fen, depth, nodes) for name, fen, counts in POSITIONS
+         for depth, nodes in sorted(counts.items()) if nodes <= MAX_NODES]
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("name, fen, depth, nodes", CASES, ids=["%s-d%d" % (case[0], case[2]) for case in CASES])
+def test_perft(engine, name, fen, depth, nodes):
+    gs = ChessEngine.createGameState(fen, engine)
+    assert perft(gs, depth) == nodes
+
+'''
+the walk leaves the position as it found it
+'''
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("name, fen", [(name, fen) for name, fen, _ in POSITIONS], ids=[p[0] for p in POSITIONS])
+def test_perft_restores_position(engine, name, fen):
+    gs = ChessEngine.createGameState(fen, engine)
+    key = gs.zobristKey
+    perft(gs, 2)
+    assert gs.getFEN() == fen
+    assert gs.zobristKey == key
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_divide_sums_to_perft(engine):
+    name, fen, counts = POSITIONS[1] # kiwipete
+    gs = ChessEngine.createGameState(fen, engine)
+    divide = perftDivide(gs, 2)
+    assert len(divide) == counts[1]
+    assert sum(divide.values()) == counts[2]
+
+def test_engines_agree_on_moves():
+    for name, fen, _ in POSITIONS:
+        mailbox = ChessEngine.createGameState(fen, "mailbox")
+        bitboard = ChessEngine.createGameState(fen, "bitboard")
+        assert sorted(perftDivide(mailbox, 1)) == sorted(perftDivide(bitboard, 1)), name
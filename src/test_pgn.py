@@ -0,0 +1,56 @@
+"""
+Tests of SAN reading and writing and of the game reader in PGN.
+
+Usage (from the src folder):
+    python3 -m pytest test_pgn.py
+"""
+import io
+
+import pytest
+
+import ChessEngine
+import PGN
+
+PROMOTION_FEN = "8/4P3/8/8/8/8/k7/4K3 w - - 0 1"
+
+@pytest.mark.parametrize("san, piece", [("e8=Q", 'Q'), ("e8N", 'N'), ("e8=R+", 'R'), ("e8=B", 'B')])
+def test_promotion(san, piece):
+    gs = ChessEngine.GameState(PROMOTION_FEN)
+    move = PGN.sanToMove(gs, san, gs.getValidMoves())
+    assert move.isPawnPromotion and move.promotionChoice == piece
+
+'''
+a promotion without a piece letter is an error, not a queen promotion
+'''
+def test_promotion_without_piece():
+    gs = ChessEngine.GameState(PROMOTION_FEN)
+    with pytest.raises(ValueError):
+        PGN.sanToMove(gs, "e8", gs.getValidMoves())
+
+def test_promotion_piece_on_other_move():
+    gs = ChessEngine.GameState(PROMOTION_FEN)
+    with pytest.raises(ValueError):
+        PGN.sanToMove(gs, "Kd2=Q", gs.getValidMoves())
+
+@pytest.mark.parametrize("fen", [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+    "8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+])
+def test_san_round_trip(fen):
+    gs = ChessEngine.GameState(fen)
+    validMoves = gs.getValidMoves()
+    for move in validMoves:
+        assert PGN.sanToMove(gs, PGN.moveToSan(gs, move, validMoves), validMoves) is move
+
+'''
+a '[' line inside a brace comment that spans lines is movetext, not the tags of a new game
+'''
+def test_read_games_multiline_comment():
+    pgn = (b'[Event "one"]\n[Result "*"]\n\n1. e4 { a long\n[%clk 0:05:00]\ncomment } e5 2. Nf3 *\n\n'
+           b'[Event "two"]\n\n1. d4 *\n')
+    games = list(PGN.readGames(io.BytesIO(pgn)))
+    assert [game.tags["Event"] for game in games] == ["one", "two"]
+    assert games[0].sanMoves == ["e4", "e5", "Nf3"]
+    assert games[1].offset == pgn.index(b'[Event "two"]')
@@ -0,0 +1,90 @@
+"""
+Tests of the 37-byte position encoding (encodePosition/decodePosition, toBytes/fromBytes) and of GameState.clone,
+on both board engines.
+
+Usage (from the src folder):
+    python3 -m pytest test_position_encoding.py
+"""
+import pytest
+
+import ChessEngine
+from Perft import uciNotation
+
+ENGINES = ("mailbox", "bitboard")
+FENS = [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/8/8/8/8/8/8/R3K2R b Kq - 3 17", # some castling rights
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", # en passant by white
+    "8/8/8/8/1pP5/8/8/4K2k b - c3 0 40", # en passant by black
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 99 300",
+]
+
+def play(gs, line):
+    for uci in line.split():
+        gs.makeMove({uciNotation(move): move for move in gs.getValidMoves()}[uci])
+    return gs
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("fen", FENS)
+def test_round_trip(engine, fen):
+    gs = ChessEngine.createGameState(fen, engine)
+    data = gs.toBytes()
+    assert len(data) == ChessEngine.POSITION.size == 37
+    restored = type(gs).fromBytes(data)
+    assert restored.getFEN() == fen
+    assert restored.zobristKey == gs.zobristKey
+    assert sorted(map(uciNotation, restored.getValidMoves())) == sorted(map(uciNotation, gs.getValidMoves()))
+
+'''
+the bytes do not depend on the engine that wrote them
+'''
+@pytest.mark.parametrize("fen", FENS)
+def test_engines_agree(fen):
+    mailbox = ChessEngine.createGameState(fen, "mailbox")
+    bitboard = ChessEngine.createGameState(fen, "bitboard")
+    assert mailbox.toBytes() == bitboard.toBytes()
+    assert type(bitboard).fromBytes(mailbox.toBytes()).getFEN() == fen
+
+def test_decode():
+    board, whiteToMove, castleRights, enPassant, halfmoveClock, fullmoveNumber = \
+        ChessEngine.decodePosition(ChessEngine.GameState(FENS[3]).toBytes())
+    assert board[3][4] == "wP" and board[3][5] == "bP" and board[0][4] == "bK"
+    assert whiteToMove
+    assert castleRights == ChessEngine.WHITE_KINGSIDE | ChessEngine.WHITE_QUEENSIDE | \
+        ChessEngine.BLACK_KINGSIDE | ChessEngine.BLACK_QUEENSIDE
+    assert enPassant == (2, 5)
+    assert (halfmoveClock, fullmoveNumber) == (0, 3)
+
+def test_halfmove_clock_capped():
+    gs = ChessEngine.GameState("4k3/8/8/8/8/8/8/4K3 w - - 300 400")
+    assert ChessEngine.decodePosition(gs.toBytes())[4:] == (255, 400)
+
+@pytest.mark.parametrize("data", [
+    bytes(36),
+    bytes([0x77] + [0] * 36), # piece code 7 is unused
+    bytes(32) + bytes([1 << 5, ChessEngine.NO_EN_PASSANT, 0, 0, 1]), # castling bits out of range
+    bytes(32) + bytes([1, 64, 0, 0, 1]), # en passant square off the board
+])
+def test_decode_invalid(data):
+    with pytest.raises(ValueError):
+        ChessEngine.decodePosition(data)
+
+'''
+a clone plays and takes back its own moves without touching the original, and keeps its repetition history
+'''
+@pytest.mark.parametrize("engine", ENGINES)
+def test_clone(engine):
+    gs = play(ChessEngine.createGameState(ChessEngine.START_FEN, engine), "g1f3 g8f6 f3g1 f6g8")
+    fen, key = gs.getFEN(), gs.zobristKey
+    clone = gs.clone()
+    assert clone.getFEN() == fen and clone.zobristKey == key
+    assert clone.moveLog == []
+    play(clone, "e2e4 e7e5")
+    assert gs.getFEN() == fen and gs.zobristKey == key
+    clone.undoMove()
+    clone.undoMove()
+    assert clone.getFEN() == fen and clone.zobristKey == key
+    play(clone, "g1f3 g8f6 f3g1 f6g8") # the start position for the third time
+    assert clone.keyCounts[key] == 3 and clone.repetition
+    assert gs.keyCounts[key] == 2 and not gs.repetition
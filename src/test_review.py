@@ -0,0 +1,76 @@
+"""
+Tests of the move classes and the result cache of Review, and of a small review run.
+
+Usage (from the src folder):
+    python3 -m pytest test_review.py
+"""
+import io
+import json
+
+import pytest
+
+import Review
+
+GAMES = b"""[Event "scholar"]
+[Result "1-0"]
+
+1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0
+
+[Event "illegal"]
+[Result "*"]
+
+1. e4 e4 *
+"""
+
+@pytest.mark.parametrize("loss, played, best, result", [
+    (0, "e2e4", "e2e4", "best"),
+    (400, "e2e4", "e2e4", "best"), # the best move loses nothing, whatever a shallow search says
+    (0, "d2d4", "e2e4", "good"),
+    (Review.INACCURACY - 1, "d2d4", "e2e4", "good"),
+    (Review.INACCURACY, "d2d4", "e2e4", "inaccuracy"),
+    (Review.MISTAKE, "d2d4", "e2e4", "mistake"),
+    (Review.BLUNDER - 1, "d2d4", "e2e4", "mistake"),
+    (Review.BLUNDER, "d2d4", "e2e4", "blunder"),
+])
+def test_classify(loss, played, best, result):
+    assert Review.classify(loss, played, best) == result
+
+def test_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    key = (1 << 64) - 5 # above the signed 64 bit range of SQLite
+    cache = Review.ReviewCache(path)
+    assert cache.get(key, 2) is None
+    cache.put(key, 2, 35, "e2e4")
+    cache.put(key, 4, 20, "d2d4")
+    assert cache.get(key, 3) == (20, "d2d4") # the deepest result of at least the depth
+    assert cache.get(key, 5) is None
+    assert cache.get(key - 1, 1) is None
+    assert cache.hitRate() == 0.25
+    cache.close()
+    cache = Review.ReviewCache(path) # kept on disk
+    assert cache.get(key, 1) == (20, "d2d4")
+    cache.close()
+
+def review(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_bytes(GAMES)
+    out = io.StringIO()
+    stats = Review.reviewGames(str(pgn), out, depth=1, cachePath=str(tmp_path / "cache.sqlite"))
+    return stats, [json.loads(line) for line in out.getvalue().splitlines()]
+
+'''
+a second review of the same games finds every position in the cache and writes the same lines
+'''
+def test_review_games(tmp_path):
+    stats, lines = review(tmp_path)
+    assert (stats["games"], stats["errors"], stats["positions"]) == (2, 1, 8)
+    assert stats["searched"] == 8
+    moves = [line for line in lines if "error" not in line]
+    assert [line["move"] for line in moves] == ["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7#"]
+    assert moves[-1]["class"] == "best" and moves[-1]["scoreAfter"] > Review.SCORE_CAP
+    assert [line["event"] for line in lines if "error" in line] == ["illegal"]
+
+    statsAgain, linesAgain = review(tmp_path)
+    assert statsAgain["searched"] == 0
+    assert statsAgain["cacheHitRate"] == 1.0
+    assert linesAgain == lines
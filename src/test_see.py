@@ -0,0 +1,30 @@
+"""
+Tests of the static exchange evaluation AI.see on known exchanges, on both board engines.
+
+Usage (from the src folder):
+    python3 -m pytest test_see.py
+"""
+import pytest
+
+import AI
+import ChessEngine
+from Perft import uciNotation
+
+ENGINES = ("mailbox", "bitboard")
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("fen, uci, score", [
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100), # undefended pawn
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -220), # knight for a pawn
+    ("4k3/8/3p4/4n3/3P4/8/8/4K3 w - - 0 1", "d4e5", 220), # pawn takes a defended knight
+    ("4k3/8/3p4/4p3/8/8/4Q3/4K3 w - - 0 1", "e2e5", -800), # queen takes a defended pawn
+    ("4k3/3p4/8/8/8/8/8/3RK3 w - - 0 1", "d1d7", -400), # the king recaptures
+    ("3r3k/3p4/8/8/8/8/3R4/3RK3 w - - 0 1", "d2d7", 100), # the second rook x-rays through the first
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 100), # en passant
+    ("k7/4P3/8/8/8/8/8/4K3 w - - 0 1", "e7e8q", 800), # promotion
+    ("k3r3/3P4/8/8/8/8/8/4K3 w - - 0 1", "d7e8q", 1300), # capturing promotion
+])
+def test_see(engine, fen, uci, score):
+    gs = ChessEngine.createGameState(fen, engine)
+    move = {uciNotation(move): move for move in gs.getValidMoves()}[uci]
+    assert AI.see(gs, move) == score
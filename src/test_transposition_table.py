@@ -0,0 +1,115 @@
+"""
+Tests of storing, probing and replacing entries in the TranspositionTable.
+
+Usage (from the src folder):
+    python3 -m pytest test_transposition_table.py
+"""
+import pytest
+
+from TranspositionTable import EXACT, LOWER_BOUND, UPPER_BOUND, BUCKET_SIZE, TranspositionTable
+
+KEY = 0x463B96181691FC9C
+
+@pytest.fixture
+def table():
+    table = TranspositionTable(0.001) # 64 entries
+    yield table
+    table.close()
+
+'''
+keys that all land in the bucket of KEY
+'''
+def bucketKeys(table, count):
+    buckets = table.bucketMask + 1
+    return [KEY + i * buckets for i in range(count)]
+
+def slotsOf(table, key):
+    index = (key & table.bucketMask) * BUCKET_SIZE
+    return range(index, index + BUCKET_SIZE)
+
+@pytest.mark.parametrize("depth, score, bound, moveID", [
+    (5, 37, EXACT, 1234),
+    (0, -250, UPPER_BOUND, 0),
+    (255, 99990, LOWER_BOUND, 0xFFFF),
+    (12, -99990, EXACT, 7),
+])
+def test_store_probe(table, depth, score, bound, moveID):
+    table.store(KEY, depth, score, bound, moveID)
+    assert table.probe(KEY) == (depth, score, bound, moveID)
+    assert (table.probes, table.hits, table.stores) == (1, 1, 1)
+
+def test_probe_miss(table):
+    assert table.probe(KEY) is None
+    table.store(KEY, 3, 10, EXACT, 5)
+    assert table.probe(bucketKeys(table, 2)[1]) is None # same bucket, other position
+    assert table.hitRate() == 0.0
+
+def test_depth_is_clamped(table):
+    table.store(KEY, 300, 0, EXACT)
+    assert table.probe(KEY)[0] == 255
+    table.store(KEY, -2, 0, EXACT)
+    assert table.probe(KEY)[0] == 0
+
+'''
+a new result for the same position replaces it in place and keeps the old best move if it has none
+'''
+def test_overwrite_same_position(table):
+    table.store(KEY, 4, 10, LOWER_BOUND, 321)
+    table.store(KEY, 6, -20, UPPER_BOUND)
+    assert table.probe(KEY) == (6, -20, UPPER_BOUND, 321)
+    table.store(KEY, 7, 5, EXACT, 99)
+    assert table.probe(KEY) == (7, 5, EXACT, 99)
+    assert table.overwrites == 0
+    assert sum(1 for i in slotsOf(table, KEY) if table.data[i]) == 1
+
+'''
+the key slot holds key ^ data: an entry whose data was changed under it (a torn write) no longer matches
+'''
+def test_key_data_verification(table):
+    table.store(KEY, 5, 37, EXACT, 1234)
+    slot = next(i for i in slotsOf(table, KEY) if table.data[i])
+    assert table.keys[slot] == KEY ^ table.data[slot]
+    table.data[slot] ^= 1 << 40 # a score written by another process
+    assert table.probe(KEY) is None
+
+'''
+a full bucket gives up its shallowest entry
+'''
+def test_replace_shallowest(table):
+    shallow, deep, new = bucketKeys(table, 3)
+    table.store(shallow, 2, 0, EXACT)
+    table.store(deep, 8, 0, EXACT)
+    table.store(new, 5, 0, EXACT)
+    assert table.overwrites == 1
+    assert table.probe(shallow) is None
+    assert table.probe(deep)[0] == 8
+    assert table.probe(new)[0] == 5
+
+'''
+entries of older searches count as shallower and go first
+'''
+def test_replace_old_search(table):
+    old, fresh, new = bucketKeys(table, 3)
+    table.store(old, 8, 0, EXACT)
+    for _ in range(2):
+        table.newSearch()
+    table.store(fresh, 2, 0, EXACT)
+    table.store(new, 3, 0, EXACT)
+    assert table.probe(old) is None
+    assert table.probe(fresh)[0] == 2
+
+def test_clear(table):
+    table.store(KEY, 5, 37, EXACT, 1234)
+    table.clear()
+    assert table.probe(KEY) is None
+    assert table.fill() == 0.0
+
+def test_shared_table():
+    table = TranspositionTable(0.001, shared=True)
+    other = TranspositionTable.attach(table.name, 0.001)
+    try:
+        table.store(KEY, 5, 37, EXACT, 1234)
+        assert other.probe(KEY) == (5, 37, EXACT, 1234)
+    finally:
+        other.close()
+        table.close()
@@ -0,0 +1,67 @@
+"""
+Tests of the UCI front-end: go parameters, time budgets, score output and a short session.
+
+Usage (from the src folder):
+    python3 -m pytest test_uci.py
+"""
+import io
+
+import pytest
+
+import AI
+import UCI
+
+@pytest.mark.parametrize("line, params", [
+    ("wtime 60000 btime 55000 winc 1000 binc 1000 movestogo 20",
+     {"wtime": 60000, "btime": 55000, "winc": 1000, "binc": 1000, "movestogo": 20}),
+    ("searchmoves e2e4 d2d4 depth 5", {"searchmoves": ["e2e4", "d2d4"], "depth": 5}),
+    ("wtime 1000 searchmoves g1f3 btime 2000", {"wtime": 1000, "searchmoves": ["g1f3"], "btime": 2000}),
+    ("searchmoves e7e8q infinite", {"searchmoves": ["e7e8q"], "infinite": True}),
+    ("ponder wtime 30000 btime 30000", {"ponder": True, "wtime": 30000, "btime": 30000}),
+    ("movetime 500 nodes 10000 mate 3", {"movetime": 500, "nodes": 10000, "mate": 3}),
+    ("wtime -20 btime 100", {"wtime": -20, "btime": 100}), # some GUIs send a negative time when the flag fell
+    ("depth x wtime 100 unknown 7", {"wtime": 100}), # no number, unknown keyword
+    ("movestogo", {}),
+    ("", {}),
+])
+def test_parse_go(line, params):
+    assert UCI.parseGo(line.split()) == params
+
+def test_time_budget():
+    assert UCI.timeBudget(60.0, 0.0, 20) == pytest.approx(3.0 - UCI.MOVE_OVERHEAD)
+    assert UCI.timeBudget(60.0) == pytest.approx(60.0 / UCI.MOVES_TO_GO - UCI.MOVE_OVERHEAD)
+    assert UCI.timeBudget(10.0, 2.0, 1) == pytest.approx(5.0 - UCI.MOVE_OVERHEAD) # at most half the clock
+    assert UCI.timeBudget(0.0) == 0.01
+
+@pytest.mark.parametrize("score, text", [
+    (35, "cp 35"),
+    (-120, "cp -120"),
+    (AI.CHECKMATE - 1, "mate 1"),
+    (AI.CHECKMATE - 3, "mate 2"),
+    (-(AI.CHECKMATE - 2), "mate -1"),
+])
+def test_score_text(score, text):
+    assert UCI.scoreText(score, AI.CHECKMATE, AI.MATE_THRESHOLD) == text
+
+def session(lines):
+    out = io.StringIO()
+    engine = UCI.UCIEngine(out)
+    for line in lines:
+        engine.handle(line)
+        if line.startswith("go") and engine.thread is not None:
+            engine.thread.join()
+    engine.handle("quit")
+    return out.getvalue().splitlines()
+
+def test_session():
+    lines = session(["uci", "setoption name OwnBook value false", "isready", "position startpos moves e2e4",
+                     "go depth 2 searchmoves a7a6 h7h6"])
+    assert lines[lines.index("uciok") + 1] == "readyok"
+    assert any(line.startswith("info depth 2 ") for line in lines)
+    assert lines[-1].split()[:2] in (["bestmove", "a7a6"], ["bestmove", "h7h6"])
+
+def test_session_mate():
+    lines = session(["setoption name OwnBook value false", "position fen 7k/8/6K1/8/8/8/8/R7 w - - 0 1",
+                     "go mate 1"])
+    assert "score mate 1" in lines[-2]
+    assert lines[-1] == "bestmove a1a8"